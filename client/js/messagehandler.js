@@ -1,11 +1,21 @@
 // js/messageHandler.js
 import { addLogMessage } from './utils.js';
 import * as state from './state.js';
-import { updateUI, handleShowdownReveal, handlePotAwarded, hideWinnerDisplay } from './ui.js';
+import { updateUI, handleShowdownReveal, handlePotAwarded, hideWinnerDisplay, clearTable } from './ui.js';
 import { enableActions, disableAllActions } from './actions.js';
 import { Elements } from './config.js'; // For the game_state check
+import { sendMessage } from './websocket.js';
 
 
+function renderGameState() {
+    updateUI(state.gameState); // Delegate UI update
+    // Disable actions if it's not our turn based on this state update
+    if (Elements.actionArea.style.display === 'flex' && state.gameState.current_player_id !== state.myPlayerId) {
+         console.log("GameState update: Disabling actions as it's not my turn.");
+         disableAllActions();
+    }
+}
+
 /** Handles messages received from the server */
 export function handleServerMessage(data) {
     // Hide winner display on most messages, show it specifically on pot awarded
@@ -15,16 +25,57 @@ export function handleServerMessage(data) {
 
     switch (data.type) {
         case 'assign_id':
+            if (data.payload.resumed) {
+                addLogMessage("System: Back in your seat.", "system");
+            } else if (state.resumeToken !== null) {
+                // The seat was not held any more: start over as a new player
+                addLogMessage("System: Your seat was given up. Please enter your name.", "system");
+                state.setGameState(null);
+                Elements.nameModal.style.display = 'flex';
+                Elements.nameInput.focus();
+            }
+            state.setResumeToken(data.payload.resumeToken ?? null);
             state.setMyPlayerId(data.payload.playerId);
-            addLogMessage(`System: Assigned Player ID: ${state.myPlayerId}.`, "system");
+            state.setMyTableId(data.payload.tableId ?? null);
+            addLogMessage(`System: Assigned Player ID: ${state.myPlayerId} at ${data.payload.tableName || 'the table'}.`, "system");
+            break;
+        case 'spectating':
+            state.setMyTableId(data.payload.tableId);
+            state.setMyPlayerId(null);
+            disableAllActions();
+            addLogMessage(`System: Watching ${data.payload.tableName}.`, "system");
+            break;
+        case 'table_list':
+            addLogMessage(`System: ${data.payload.tables.length} table(s) open.`, "system");
+            data.payload.tables.forEach(t => {
+                addLogMessage(`System: #${t.tableId} ${t.name} - ${t.players}/${t.maxPlayers} players (${t.stage})`, "system");
+            });
+            break;
+        case 'left_table':
+            state.setResumeToken(null);
+            state.setMyTableId(null);
+            state.setMyPlayerId(null);
+            state.setPlayerMap({});
+            state.setGameState(null);
+            clearTable();
+            disableAllActions();
+            addLogMessage(`System: Left table #${data.payload.tableId}.`, "system");
             break;
         case 'game_state':
-            updateUI(data.payload); // Delegate UI update
-            // Disable actions if it's not our turn based on this state update
-            if (Elements.actionArea.style.display === 'flex' && data.payload.current_player_id !== state.myPlayerId) {
-                 console.log("GameState update: Disabling actions as it's not my turn.");
-                 disableAllActions();
+            state.setGameState(data.payload);
+            renderGameState();
+            break;
+        case 'game_state_delta':
+            if (state.resyncPending) {
+                break; // A full snapshot is on its way
+            }
+            if (!state.applyGameStateDelta(data.payload)) {
+                console.warn(`Missed game_state version (have ${state.gameState?.version}, delta from ${data.payload.base}). Resyncing.`);
+                state.setResyncPending(true);
+                sendMessage('resync', {});
+                break;
             }
+            renderGameState();
             break;
         case 'player_turn':
             console.log(`Player turn message for P${data.payload.playerId}. My ID: ${state.myPlayerId}.`);
@@ -39,6 +90,17 @@ export function handleServerMessage(data) {
                 addLogMessage(`Game: Waiting for ${playerName}...`, "game");
             }
             break;
+        case 'turn_timer': {
+            // Seconds left on the acting player's clock, sent when it starts and when their time bank kicks in
+            const { playerId, seconds, timeBank } = data.payload;
+            if (timeBank) {
+                const who = playerId === state.myPlayerId ? "You are" : `${state.playerMap[playerId]?.name || `Player ${playerId}`} is`;
+                addLogMessage(`Game: ${who} on the time bank (${Math.round(seconds)}s).`, "game");
+            } else if (playerId === state.myPlayerId) {
+                addLogMessage(`Game: You have ${Math.round(seconds)}s to act.`, "game");
+            }
+            break;
+        }
         case 'game_message':
             addLogMessage(`Game: ${data.payload.message}`, "game");
             break;
@@ -54,6 +116,13 @@ export function handleServerMessage(data) {
          case 'pot_awarded':
              handlePotAwarded(data.payload); // Delegate
              break;
+        case 'equity':
+             Object.entries(data.payload.players).forEach(([playerId, eq]) => {
+                 const player = state.playerMap[playerId];
+                 const playerName = player?.name || `Player ${playerId}`;
+                 addLogMessage(`Equity (${data.payload.stage}): ${playerName} ${(eq.equity * 100).toFixed(1)}% (win ${(eq.win * 100).toFixed(1)}%, tie ${(eq.tie * 100).toFixed(1)}%)`, "game");
+             });
+             break;
         case 'showdown':
              handleShowdownReveal(data.payload); // Delegate
              break;
@@ -2,7 +2,11 @@
 
 export let websocket = null;
 export let myPlayerId = null;
+export let myTableId = null;
 export let playerMap = {}; // Stores player data received from server { id: { name, stack, ... } }
+export let gameState = null; // Last full game_state (with its version), kept current by applying deltas
+export let resyncPending = false;
+export let resumeToken = null; // From assign_id; reconnecting with it takes our seat back
 export let currentTurnOptions = null; // Stores actions available for the current player
 export let winnerDisplayTimeout = null;
 
@@ -13,9 +17,36 @@ export function setWebSocket(ws) {
 export function setMyPlayerId(id) {
     myPlayerId = id;
 }
+export function setMyTableId(id) {
+    myTableId = id;
+}
 export function setPlayerMap(map) {
     playerMap = map;
 }
+export function setGameState(snapshot) {
+    gameState = snapshot;
+    resyncPending = false;
+}
+export function setResyncPending(pending) {
+    resyncPending = pending;
+}
+export function setResumeToken(token) {
+    resumeToken = token;
+}
+/** Applies a game_state_delta to gameState. Returns false if it doesn't follow our version (resync needed). */
+export function applyGameStateDelta(delta) {
+    if (!gameState || delta.base !== gameState.version) {
+        return false;
+    }
+    const { players, removed, base, ...table } = delta;
+    const merged = { ...gameState.players };
+    Object.entries(players).forEach(([playerId, changes]) => {
+        merged[playerId] = { ...merged[playerId], ...changes };
+    });
+    removed.forEach(playerId => delete merged[playerId]);
+    gameState = { ...gameState, ...table, players: merged };
+    return true;
+}
 export function setCurrentTurnOptions(options) {
     currentTurnOptions = options;
 }
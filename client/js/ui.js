@@ -46,7 +46,9 @@ export function updateUI(serverState) {
     });
 
     updateCommunityCards(serverState.community_cards, serverState.game_stage);
-    Elements.potArea.textContent = `Pot: $${serverState.pot || 0}`;
+    const pots = serverState.pots || [];
+    const sidePots = pots.length > 1 ? ` (Main $${pots[0].amount}, ${pots.slice(1).map((pot, i) => `Side ${i + 1} $${pot.amount}`).join(', ')})` : '';
+    Elements.potArea.textContent = `Pot: $${serverState.pot || 0}${sidePots}`;
 
     // Ensure actions are hidden if game state dictates (e.g., showdown, hand_over)
     // or if it's not the player's turn
@@ -12,9 +12,15 @@ export function connectWebSocket() {
         return;
     }
 
-    const ws = new WebSocket(WS_URL);
+    // With a resume token the server gives our seat back and catches us up from the state version we have
+    const resuming = state.resumeToken !== null;
+    const ws = new WebSocket(resuming ? `${WS_URL}/?resume=${encodeURIComponent(state.resumeToken)}&version=${state.gameState?.version ?? ''}` : WS_URL);
 
     ws.onopen = () => {
+        if (resuming) {
+            addLogMessage("System: Reconnected. Resuming your seat...", "system");
+            return; // assign_id says whether it worked
+        }
         addLogMessage("System: Connected! Please enter your name.", "system");
         Elements.nameModal.style.display = 'flex';
         Elements.nameInput.focus();
@@ -23,7 +29,8 @@ export function connectWebSocket() {
     ws.onmessage = (event) => {
         try {
             const data = JSON.parse(event.data);
-            handleServerMessage(data); // Delegate message handling
+            // The server batches messages produced together into one array frame
+            (Array.isArray(data) ? data : [data]).forEach(handleServerMessage); // Delegate message handling
         } catch (e) {
             console.error("Failed to parse message or handle:", e);
             addLogMessage("System: Error processing server message.", "error");
@@ -38,11 +45,19 @@ export function connectWebSocket() {
         const { clearTable } = await import('./ui.js');
 
         const reason = event.reason ? ` Reason: ${event.reason}` : '';
-        addLogMessage(`System: Disconnected.${reason} Retrying in 5s...`, "system");
         disableAllActions();
+        if (state.resumeToken !== null) {
+            // The server holds our seat for a while: keep the table on screen and come straight back
+            state.setWebSocket(null);
+            addLogMessage(`System: Disconnected.${reason} Reconnecting...`, "system");
+            setTimeout(connectWebSocket, 1000);
+            return;
+        }
+        addLogMessage(`System: Disconnected.${reason} Retrying in 5s...`, "system");
         clearTable();
         state.setMyPlayerId(null);
         state.setPlayerMap({});
+        state.setGameState(null);
         state.setWebSocket(null); // Clear the state's reference
         setTimeout(connectWebSocket, 5000);
     };
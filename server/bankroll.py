@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from engine import STARTING_STACK
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.05  # seconds a settled delta may wait before its batch is committed
+BUSY_TIMEOUT = 5.0  # seconds to wait on another process's write lock (workers share the file)
+
+BUY_IN, HAND = 1, 2  # journal reasons
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bankrolls (name TEXT PRIMARY KEY, balance INTEGER NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS journal (id INTEGER PRIMARY KEY, name TEXT NOT NULL, delta INTEGER NOT NULL, reason INTEGER NOT NULL,
+                                    table_id INTEGER NOT NULL, hand_id INTEGER NOT NULL, time REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS journal_name ON journal (name);
+CREATE TABLE IF NOT EXISTS seated (name TEXT PRIMARY KEY, pid INTEGER NOT NULL, since REAL NOT NULL);
+"""
+
+Delta = Tuple[str, int, int, int, int, float]  # name, delta, reason, table ID, hand ID, time
+
+class BankrollStore:
+    """Player bankrolls in SQLite, keyed by player name.
+
+    journal() only queues a stack delta, so the event loop never waits on the disk. A writer
+    thread commits everything queued in the last `flush_interval` seconds as one transaction
+    that appends the deltas to the journal and applies them to the balances; a batch is either
+    all on disk or not at all. Deltas are settled at hand boundaries, so a crash loses at most
+    the last unflushed batch and voids the hand in progress (everyone keeps the bankroll they
+    had before it). On open, balances are checked against the journal and rebuilt from it if
+    they disagree.
+
+    A name can be seated once across every process sharing the database, so that no one plays
+    (and spends) a bankroll twice: seat() claims it in the `seated` table, whose primary key
+    turns a second claim down. Claims are released as players leave and when the store closes;
+    those of a process that died are cleared by the next store to open the database.
+    """
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL, starting_stack: int = STARTING_STACK):
+        self.path = path; self.flush_interval = flush_interval; self.starting_stack = starting_stack
+        self.pid = os.getpid()  # owner of this store's claims in `seated`
+        self.commits = 0; self.deltas = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue(); self._closed = False
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(SCHEMA)
+        self.recover(); self._clear_stale_claims()
+        self._thread = threading.Thread(target=self._write_loop, name="bankroll", daemon=True); self._thread.start()
+
+    def recover(self) -> int:
+        """Rebuilds any balance that doesn't match the sum of its journal; returns how many were wrong."""
+        wrong = self._db.execute("SELECT j.name, j.total, b.balance FROM (SELECT name, SUM(delta) AS total FROM journal GROUP BY name) j "
+                                 "LEFT JOIN bankrolls b ON b.name = j.name WHERE b.balance IS NOT j.total").fetchall()
+        if wrong:
+            log.warning(f"{len(wrong)} bankroll(s) in {self.path} disagree with the journal; rebuilding them from it.")
+            with self._transaction():
+                self._db.executemany("INSERT INTO bankrolls (name, balance, updated) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET balance = excluded.balance",
+                                     [(name, total, time.time()) for name, total, _ in wrong])
+        return len(wrong)
+
+    def _clear_stale_claims(self):
+        # Names claimed by processes that are gone (a crashed worker, or whatever had our PID before) would stay unplayable.
+        stale = [pid for (pid,) in self._db.execute("SELECT DISTINCT pid FROM seated").fetchall() if pid == self.pid or not _alive(pid)]
+        if stale:
+            with self._transaction(): self._db.executemany("DELETE FROM seated WHERE pid = ?", [(pid,) for pid in stale])
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so a busy database is waited on (BUSY_TIMEOUT) rather than failing mid-transaction.
+        self._db.execute("BEGIN IMMEDIATE")
+        try: yield
+        except BaseException: self._db.execute("ROLLBACK"); raise
+        self._db.execute("COMMIT")
+
+    async def load(self, name: str) -> int:
+        """The player's balance, after everything already queued for them. A new or empty
+        bankroll is bought in for `starting_stack` first."""
+        future: Future = Future(); self._queue.put(("load", name, future))
+        return await asyncio.wrap_future(future)
+
+    async def seat(self, name: str) -> Optional[int]:
+        """Claims `name` for a player sitting down here and returns their balance, as load() does;
+        None if the name is already seated, on this process or any other sharing the database."""
+        future: Future = Future(); self._queue.put(("seat", name, future))
+        return await asyncio.wrap_future(future)
+
+    def claim(self, name: str):
+        """Takes over the claim on `name` without waiting, for a seat restored from a snapshot."""
+        self._queue.put(("claim", name))
+
+    def release(self, name: str):
+        """Gives up this process's claim on `name` (with the next batch)."""
+        if not self._closed: self._queue.put(("release", name))
+
+    def journal(self, name: str, delta: int, table_id: int = 0, hand_id: int = 0, reason: int = HAND):
+        if self._closed: log.error(f"Bankroll store closed; dropped {delta:+} for '{name}'."); return
+        self._queue.put(("delta", (name, delta, reason, table_id, hand_id, time.time())))
+
+    def sync(self) -> Future:
+        """Resolves once everything queued before it is committed."""
+        future: Future = Future(); self._queue.put(("sync", None, future))
+        return future
+
+    def balance(self, name: str) -> Optional[int]:
+        """The committed balance (None for an unknown name). Blocks on the database; for tools, not the event loop."""
+        db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        try: row = db.execute("SELECT balance FROM bankrolls WHERE name = ?", (name,)).fetchone()
+        finally: db.close()
+        return row[0] if row else None
+
+    def _write_loop(self):
+        pending: List[Delta] = []; claims: List[Tuple[str, str]] = []; waiting: List[Tuple[str, Optional[str], Future]] = []; stop = False
+        while not stop:
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None: stop = True
+                elif item[0] == "delta": pending.append(item[1])
+                elif item[0] in ("claim", "release"): claims.append(item)
+                else: waiting.append(item)
+                if stop or waiting: break  # a load or sync is awaited: commit now rather than at the deadline
+                timeout = deadline - time.monotonic()
+                if timeout <= 0: break
+                try: item = self._queue.get(timeout=timeout)
+                except queue.Empty: break
+            try: self._commit(pending, claims, waiting); pending = []; claims = []
+            except sqlite3.Error as e:  # e.g. locked past BUSY_TIMEOUT or disk full: keep the deltas for the next batch
+                log.error(f"Bankroll commit of {len(pending)} deltas failed, will retry: {e}")
+                for _, _, future in waiting: future.set_exception(e)
+                if not stop: time.sleep(self.flush_interval)
+            waiting = []
+        try: self._db.execute("DELETE FROM seated WHERE pid = ?", (self.pid,))
+        except sqlite3.Error as e: log.error(f"Could not release the seated names of this process: {e}")
+        self._db.close()
+
+    def _commit(self, pending: List[Delta], claims: List[Tuple[str, str]], waiting: List[Tuple[str, Optional[str], Future]]):
+        results: Dict[int, Optional[int]] = {}
+        with self._transaction():
+            if pending:
+                self._db.executemany("INSERT INTO journal (name, delta, reason, table_id, hand_id, time) VALUES (?, ?, ?, ?, ?, ?)", pending)
+                self._db.executemany("INSERT INTO bankrolls (name, balance, updated) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET balance = balance + excluded.balance, updated = excluded.updated",
+                                     [(d[0], d[1], d[5]) for d in pending])
+            for kind, name in claims:
+                if kind == "claim": self._db.execute("INSERT OR REPLACE INTO seated (name, pid, since) VALUES (?, ?, ?)", (name, self.pid, time.time()))
+                else: self._db.execute("DELETE FROM seated WHERE name = ? AND pid = ?", (name, self.pid))
+            for i, (kind, name, _) in enumerate(waiting):
+                if kind == "load": results[i] = self._load(name)
+                elif kind == "seat":
+                    claimed = self._db.execute("INSERT OR IGNORE INTO seated (name, pid, since) VALUES (?, ?, ?)", (name, self.pid, time.time())).rowcount
+                    results[i] = self._load(name) if claimed else None
+        self.commits += 1; self.deltas += len(pending)
+        for i, (_, _, future) in enumerate(waiting): future.set_result(results.get(i))
+
+    def _load(self, name: str) -> int:
+        row = self._db.execute("SELECT balance FROM bankrolls WHERE name = ?", (name,)).fetchone()
+        balance = row[0] if row else 0
+        if balance > 0: return balance
+        now = time.time(); buy_in = self.starting_stack - balance
+        self._db.execute("INSERT INTO journal (name, delta, reason, table_id, hand_id, time) VALUES (?, ?, ?, 0, 0, ?)", (name, buy_in, BUY_IN, now))
+        self._db.execute("INSERT INTO bankrolls (name, balance, updated) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET balance = excluded.balance, updated = excluded.updated",
+                         (name, self.starting_stack, now))
+        log.info(f"Bought in '{name}' for {buy_in}.")
+        return self.starting_stack
+
+    def close(self):
+        """Commits whatever is queued, releases this process's seated names and stops the writer."""
+        if self._closed: return
+        self._closed = True; self._queue.put(None); self._thread.join()
+
+def _alive(pid: int) -> bool:
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: pass  # someone else's process
+    return True
@@ -0,0 +1,436 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from cards import CARD_STRINGS, cards_to_ints
+from outbox import SLOW_CLIENT_POLICIES
+
+def _report(label: str, count: int, elapsed: float, unit: str = "hands"):
+    print(f"{label:<32} {count / elapsed:>14,.0f} {unit}/sec  ({elapsed * 1000:.1f} ms for {count:,})")
+
+def bench_evaluator(args):
+    from evaluator import evaluate, legacy_evaluate_hand
+    rng = random.Random(args.seed)
+    deals = [rng.sample(CARD_STRINGS, 7) for _ in range(args.hands)]
+    int_deals = [cards_to_ints(d) for d in deals]
+    start = time.perf_counter()
+    for d in deals: legacy_evaluate_hand(d[:2], d[2:])
+    _report("legacy evaluate_hand", len(deals), time.perf_counter() - start)
+    start = time.perf_counter()
+    for d in int_deals: evaluate(d)
+    _report("lookup-table evaluate", len(int_deals), time.perf_counter() - start)
+    try: import numpy as np
+    except ImportError: print("NumPy not installed; skipping evaluate_many."); return
+    from evaluator import evaluate_many
+    cards = np.array(int_deals, dtype=np.int64)
+    evaluate_many(cards[:1, :2], cards[:1, 2:])  # builds the NumPy tables outside the timing
+    start = time.perf_counter()
+    evaluate_many(cards[:, :2], cards[:, 2:])
+    _report("evaluate_many (NumPy)", len(int_deals), time.perf_counter() - start)
+
+def check_parity(args):
+    """Deals random tables and checks evaluate_many against the legacy evaluator, hand by hand
+    and by the (score, kickers) winner ordering the showdown uses."""
+    import numpy as np
+    from evaluator import evaluate_many, legacy_evaluate_hand, strength_to_score
+    rng = random.Random(args.seed); mismatches = 0
+    for _ in range(args.deals):
+        num_players = rng.randint(2, 8)
+        cards = rng.sample(CARD_STRINGS, 2 * num_players + 5)
+        board = cards[-5:]; hands = [cards[2 * i:2 * i + 2] for i in range(num_players)]
+        legacy = [legacy_evaluate_hand(h, board)[:2] for h in hands]
+        strengths = evaluate_many(np.array([cards_to_ints(h) for h in hands]), np.array(cards_to_ints(board)))
+        fast = [tuple(strength_to_score(int(s))) for s in strengths]
+        legacy_order = sorted(range(num_players), key=lambda i: legacy[i], reverse=True)
+        fast_order = sorted(range(num_players), key=lambda i: strengths[i], reverse=True)
+        if fast != [tuple(l) for l in legacy] or [legacy[i] for i in legacy_order] != [legacy[i] for i in fast_order]:
+            mismatches += 1
+            print(f"MISMATCH board={board} hands={hands} legacy={legacy} fast={fast}")
+    print(f"Checked {args.deals:,} deals: {mismatches} mismatches.")
+    if mismatches: raise SystemExit(1)
+
+def _percentile(values, pct: float) -> float:
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class _BenchSocket:
+    """In-memory stand-in for a client websocket that answers its own player_turn prompts."""
+    def __init__(self, latencies: list):
+        self.remote_address = ("bench", id(self)); self.latencies = latencies
+        self.table = None; self.player_id = None
+
+    async def send(self, message):
+        if '"assign_id"' not in message and '"player_turn"' not in message: return
+        data = json.loads(message)
+        for msg in data if isinstance(data, list) else [data]:
+            if msg["type"] == "assign_id": self.player_id = msg["payload"]["playerId"]
+            elif msg["type"] == "player_turn" and msg["payload"]["playerId"] == self.player_id: asyncio.create_task(self.act(msg["payload"]))
+
+    async def act(self, payload):
+        action = "check" if "check" in payload["actions"] else "call"
+        start = time.perf_counter()
+        await self.table.handle_player_action(self.player_id, action, None)
+        self.latencies.append(time.perf_counter() - start)
+
+    async def close(self, code=1000, reason=""): pass
+
+class _StalledSocket:
+    """A spectator whose TCP window never opens: every send blocks until the connection is closed."""
+    def __init__(self):
+        self.remote_address = ("stalled", id(self)); self._closed = asyncio.Event()
+
+    async def send(self, message):
+        await self._closed.wait()
+
+    async def close(self, code=1000, reason=""): self._closed.set()
+
+def bench_tables(args):
+    import outbox
+    import server
+    logging.getLogger().setLevel(logging.ERROR)
+    server.HAND_END_DELAY = 0; outbox.SLOW_CLIENT_POLICY = args.slow_clients
+    async def run(num_tables: int):
+        manager = server.TableManager(); latencies = []
+        for _ in range(num_tables):
+            table = manager.create_table()
+            for seat in range(args.players):
+                ws = _BenchSocket(latencies); ws.table = table
+                await manager.seat(ws, table, f"bot{seat}")
+            for _ in range(args.stalled): await table.add_spectator(_StalledSocket())
+        await asyncio.sleep(args.seconds)
+        queues = outbox.stats()
+        await manager.shutdown()
+        ms = [l * 1000 for l in latencies]
+        print(f"{num_tables:>6} tables {len(ms) / args.seconds:>10,.0f} actions/sec   "
+              f"p50 {_percentile(ms, 50):7.2f} ms  p99 {_percentile(ms, 99):7.2f} ms  max {max(ms, default=0):7.2f} ms")
+        if args.stalled: print(f"{'':>14}send queues: {queues}")
+    for count in args.tables: asyncio.run(run(count))
+
+def bench_broadcast(args):
+    import server
+    logging.getLogger().setLevel(logging.ERROR)
+    table = server.PokerGame()
+    for seat in range(args.players):
+        player = server.Player(seat + 1, object()); player.name = f"bot{seat}"; player.status = "active"
+        player.hand = cards_to_ints(["A♠", "K♦"]); player.stack = 1000 - seat; table.players[player.id] = player
+    table.game_stage = "flop"; table.community_cards = bytearray(cards_to_ints(["2♣", "7♥", "J♦"])); table.pot_ledger.add(1, 60); table.pot_ledger.add(2, 60); table.current_player_id = 1
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for pid in table.players: json.dumps({"type": "game_state", "payload": table.get_state_for_player(pid)})
+    _report("per-player get_state + dumps", args.rounds, time.perf_counter() - start, "broadcasts")
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        table.players[1 + i % args.players].stack += 1  # a new state version every broadcast
+        table.renderer.refresh()
+        for pid in table.players: table.renderer.frame_for(pid)
+    _report("StateRenderer (changed state)", args.rounds, time.perf_counter() - start, "broadcasts")
+    full_bytes = delta_bytes = 0; start = time.perf_counter()
+    for i in range(args.rounds):
+        table.players[1 + i % args.players].stack += 1
+        table.renderer.refresh()
+        for pid in table.players: delta_bytes += len(table.renderer.delta_for(pid).encode())
+    _report("StateRenderer deltas", args.rounds, time.perf_counter() - start, "broadcasts")
+    for pid in table.players: full_bytes += len(table.renderer.frame_for(pid).encode())
+    print(f"{'bytes per broadcast':<32} {full_bytes:>14,} full  {delta_bytes / args.rounds:>10,.0f} delta")
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        table.renderer.refresh()
+        for pid in table.players: table.renderer.frame_for(pid)
+    _report("StateRenderer (unchanged state)", args.rounds, time.perf_counter() - start, "broadcasts")
+
+def bench_engine(args):
+    """Plays hands on a bare TableEngine: no sockets, no event loop, pauses resumed straight away."""
+    from simulate import simulate
+    for agents in (["call"] * args.players, ["random"] * args.players):
+        result = simulate(agents, args.hands, args.seed)
+        _report(f"TableEngine, {args.players} x {agents[0]}", args.hands, result["seconds"])
+
+def bench_handlog(args):
+    """Simulated hands/sec with and without the hand history log, then replay speed of the reader."""
+    import os
+    import tempfile
+    from handlog import HandLogReader
+    from simulate import simulate
+    agents = ["call", "random", "tight"] * (args.players // 3) + ["call"] * (args.players % 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hands.log")
+        _report("simulate, no hand log", args.hands, simulate(agents, args.hands, args.seed)["seconds"])
+        _report("simulate, hand log", args.hands, simulate(agents, args.hands, args.seed, hand_log_path=path)["seconds"])
+        print(f"{'bytes per hand':<32} {os.path.getsize(path) / args.hands:>14,.0f}")
+        reader = HandLogReader(path); start = time.perf_counter()
+        records = sum(1 for _ in reader)
+        _report("iterate records (mmap)", records, time.perf_counter() - start, "records")
+        start = time.perf_counter(); reader.index()
+        _report("build hand/table/player index", len(reader.hand_ids()), time.perf_counter() - start)
+        start = time.perf_counter(); hand_ids = reader.hands_for_player("call1")[-1000:]
+        for hand_id in hand_ids: reader.hand(hand_id)
+        _report("fetch one player's hands", len(hand_ids), time.perf_counter() - start)
+        reader.close()
+
+def bench_bankroll(args):
+    """Settled hands/sec through the write-behind bankroll store, against committing every hand on its own."""
+    import os
+    import tempfile
+    from bankroll import BankrollStore
+    rng = random.Random(args.seed); names = [f"player{i}" for i in range(args.players * 50)]
+    def settle(store, hand: int):  # one hand: a winner takes what the others lost
+        seated = rng.sample(names, args.players); losses = [rng.randint(1, 200) for _ in seated[1:]]
+        store.journal(seated[0], sum(losses), 1, hand)
+        for name, loss in zip(seated[1:], losses): store.journal(name, -loss, 1, hand)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, hands, per_hand_commit in (("commit per hand", max(1, args.hands // 20), True), (f"batched every {args.interval:g} ms", args.hands, False)):
+            store = BankrollStore(os.path.join(tmp, f"{per_hand_commit}.db"), flush_interval=args.interval / 1000)
+            for name in names: store.journal(name, 10000, reason=0)
+            store.sync().result(); commits = store.commits; queued = 0.0; start = time.perf_counter()
+            for hand in range(1, hands + 1):
+                t = time.perf_counter(); settle(store, hand)
+                if per_hand_commit: store.sync().result()  # what the event loop would wait for without the queue
+                queued += time.perf_counter() - t
+            store.sync().result(); elapsed = time.perf_counter() - start
+            _report(f"settle, {label}", hands, elapsed)
+            print(f"{'  caller blocked per hand':<32} {queued / hands * 1e6:>14,.1f} µs  ({store.commits - commits:,} commits)")
+            store.close()
+            check = BankrollStore(os.path.join(tmp, f"{per_hand_commit}.db"))
+            assert check.recover() == 0 and sum(check.balance(n) for n in names) == 10000 * len(names), "chips were not conserved"
+            check.close()
+
+def bench_snapshot(args):
+    """Checkpoint cost and restart time (read the snapshot file, rebuild every table) for many tables caught mid-hand."""
+    import os
+    import tempfile
+    import server
+    from engine import Player
+    from snapshot import SnapshotStore
+    logging.getLogger().setLevel(logging.ERROR)
+    async def run(path: str):
+        store = server.snapshots = SnapshotStore(path); rng = random.Random(args.seed); tables = []
+        for table_id in range(1, args.tables + 1):
+            table = server.PokerGame(table_id); table.rng = random.Random(rng.getrandbits(64)); tables.append(table)
+            for seat in range(1, args.players + 1):
+                player = Player(seat, None); player.name = f"t{table_id}p{seat}"; table.players[seat] = player
+            events = table.start_hand()
+            while not table.awaiting_action() and events and events[-1][0] == "pause": events = table.resume(events[-1][2])
+            table.next_player_id = args.players + 1
+        start = time.perf_counter()
+        for table in tables: table.checkpoint()
+        _report("checkpoint (encode)", len(tables), time.perf_counter() - start, "tables")
+        start = time.perf_counter(); store.write()
+        _report("write snapshot file", len(tables), time.perf_counter() - start, "tables")
+        print(f"{'bytes per table':<32} {os.path.getsize(path) / len(tables):>14,.0f}")
+        store.close()
+        server.tables = server.TableManager(); server.snapshots = SnapshotStore(path); start = time.perf_counter()
+        restored = server.restore_tables(); elapsed = time.perf_counter() - start
+        _report("restore (read + rebuild)", restored, elapsed, "tables")
+        print(f"{'restart time':<32} {elapsed * 1000:>14,.0f} ms for {restored:,} tables ({len(server.tables.held):,} seats held)")
+        server.snapshots.close()
+    with tempfile.TemporaryDirectory() as tmp: asyncio.run(run(os.path.join(tmp, "tables.snap")))
+
+def bench_codec(args):
+    from codec import CODECS
+    hands = {str(pid): ["A♠", "K♦"] for pid in range(1, args.players + 1)}
+    players = {pid: {"id": pid, "name": f"bot{pid}", "stack": 1000 - pid, "hand": ["??", "??"], "current_bet": 20, "status": "active",
+                     "is_dealer": pid == 1, "last_action": "call", "last_hand_rank": None, "total_bet_this_hand": 20} for pid in range(1, args.players + 1)}
+    messages = [
+        ("game_state", {"players": players, "community_cards": ["2♣", "7♥", "J♦"], "pot": 160, "current_player_id": 1, "dealer_id": 1,
+                        "game_stage": "flop", "bigBlind": 20, "version": 12}),
+        ("player_turn", {"playerId": 1, "actions": ["fold", "check", "bet"], "currentBet": 0, "minRaise": 20, "maxRaise": 980, "callAmount": 0}),
+        ("player_action", {"playerId": 2, "action": "call", "amount": 20}),
+        ("showdown", {"allHands": hands, "handRanks": {pid: "Pair of Aces" for pid in hands}}),
+    ]
+    for name, codec in CODECS.items():
+        start = time.perf_counter(); size = 0
+        for _ in range(args.rounds):
+            for msg_type, payload in messages: size += len(codec.encode(msg_type, payload))
+        encoded = [codec.encode(t, p) for t, p in messages]
+        _report(f"{name} encode", args.rounds * len(messages), time.perf_counter() - start, "msgs")
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for frame in encoded: codec.decode_frame(frame)
+        _report(f"{name} decode", args.rounds * len(messages), time.perf_counter() - start, "msgs")
+        if name == "poker.msgpack":
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for frame in encoded: codec.decode_frame(frame, int_cards=True)
+            _report(f"{name} decode (int cards)", args.rounds * len(messages), time.perf_counter() - start, "msgs")
+        print(f"{name + ' bytes per message':<32} {size / (args.rounds * len(messages)):>14,.0f}")
+    if len(CODECS) == 1: print("msgpack not installed; only the JSON codec is available.")
+
+def bench_timers(args):
+    import tracemalloc
+    from timers import TimerWheel
+    noop = lambda *a: None
+    async def run():
+        loop = asyncio.get_running_loop(); wheel = TimerWheel()
+        schedulers = [("loop.call_later", loop.call_later), ("TimerWheel.call_later", wheel.call_later)]
+        for label, call_later in schedulers:
+            # Every table's turn clock is armed, then cancelled and re-armed as players act.
+            tracemalloc.start(); pending = [call_later(60.0 + i % 100, noop) for i in range(args.timers)]
+            per_timer = tracemalloc.get_traced_memory()[0] / args.timers; tracemalloc.stop()
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for i, timer in enumerate(pending): timer.cancel(); pending[i] = call_later(60.0, noop)
+            _report(f"{label} cancel + re-arm", args.timers * args.rounds, time.perf_counter() - start, "turns")
+            for timer in pending: timer.cancel()
+            await asyncio.sleep(0)
+            late = []; done = asyncio.Event(); remaining = [args.fire]
+            def fired(due):
+                late.append((loop.time() - due) * 1000); remaining[0] -= 1
+                if not remaining[0]: done.set()
+            for i in range(args.fire): delay = (i % 50) / 50; call_later(delay, fired, loop.time() + delay)
+            await done.wait(); late.sort()
+            print(f"{label + ' firing':<32} {per_timer:>10,.0f} bytes/timer   late p50 {late[len(late) // 2]:6.1f} ms  p99 {late[len(late) * 99 // 100]:6.1f} ms")
+    asyncio.run(run())
+
+class _IdleSocket:
+    """A connected client that never sends anything; the websockets connection itself is not counted."""
+    def __init__(self, n: int):
+        self.remote_address = ("idle", n)
+
+    async def send(self, message): pass
+
+    async def close(self, code=1000, reason=""): pass
+
+def bench_memory(args):
+    import gc
+    import tracemalloc
+    import server
+    from engine import Player
+    logging.getLogger().setLevel(logging.ERROR)
+    def traced(build) -> float:
+        gc.collect(); tracemalloc.start(); before = tracemalloc.get_traced_memory()[0]
+        kept = build(); gc.collect(); used = tracemalloc.get_traced_memory()[0] - before; tracemalloc.stop()
+        del kept
+        return used / args.connections
+    def players(cls):
+        def build():
+            made = []
+            for i in range(args.connections):
+                p = cls(i, None); p.name = f"player{i}"; p.hand = [i % 52, (i + 1) % 52]; p.status = "active"; p.last_action = "call"; made.append(p)
+            return made
+        return build
+    DictPlayer = type("DictPlayer", (), {"__init__": Player.__init__})  # the same fields with a per-instance __dict__
+    print(f"{'Player with __dict__':<32} {traced(players(DictPlayer)):>10,.0f} bytes")
+    print(f"{'Player with __slots__':<32} {traced(players(Player)):>10,.0f} bytes")
+    async def run():
+        server.tables = server.TableManager(); sockets = [_IdleSocket(i) for i in range(args.connections)]; sessions = []
+        gc.collect(); tracemalloc.start(); before = tracemalloc.get_traced_memory()[0]
+        for ws in sockets:
+            session = server.ClientSession(ws); await session.join(server.tables.find_open_table()); sessions.append(session)
+        await asyncio.sleep(0.1)  # let the assign_id and state frames go out
+        gc.collect(); idle = (tracemalloc.get_traced_memory()[0] - before) / args.connections
+        for i, session in enumerate(sessions): session.player.name = f"player{i}"; session.player.hand = [i % 52, (i + 1) % 52]
+        gc.collect(); seated = (tracemalloc.get_traced_memory()[0] - before) / args.connections; tracemalloc.stop()
+        print(f"{'idle connection (server state)':<32} {idle:>10,.0f} bytes   {idle * 100_000 / 2**20:,.0f} MiB per 100k  ({len(server.tables.tables):,} tables)")
+        print(f"{'named player with cards':<32} {seated:>10,.0f} bytes")
+        await server.tables.shutdown()
+    asyncio.run(run())
+
+def bench_metrics(args):
+    import metrics
+    histogram = metrics.Histogram("bench_seconds", "Benchmark observations."); metrics.REGISTRY.remove(histogram)
+    values = [random.Random(1).expovariate(2000) for _ in range(1000)]
+    start = time.perf_counter()
+    for _ in range(args.rounds // 1000):
+        for v in values: histogram.observe(v)
+    _report("Histogram.observe", args.rounds, time.perf_counter() - start, "observations")
+    async def locks():
+        for label, lock in (("asyncio.Lock", asyncio.Lock()), ("TimedLock", metrics.TimedLock())):
+            start = time.perf_counter()
+            for _ in range(args.rounds // 10):
+                async with lock: pass
+            _report(f"{label} acquire + release", args.rounds // 10, time.perf_counter() - start, "acquires")
+    asyncio.run(locks())
+    start = time.perf_counter()
+    for _ in range(100): text = metrics.render()
+    _report("render /metrics", 100, time.perf_counter() - start, "scrapes")
+    print(f"{'scrape size':<32} {len(text):>14,} bytes")
+
+def bench_logging(args):
+    """Per-action cost of the engine's INFO logging written to a file: by a handler on the calling
+    thread (as the event loop does by default) vs queued to logqueue's listener thread."""
+    import os
+    import tempfile
+    import logqueue
+    from simulate import simulate
+    root = logging.getLogger(); saved = root.handlers[:]; level = root.level
+    agents = ["random"] * args.players
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(label: str, json_lines: bool = False, queued: bool = False, log_level: int = logging.INFO):
+            path = os.path.join(tmp, label.replace(" ", "_") + ".log"); handler = logging.FileHandler(path)
+            root.handlers[:] = [handler]; root.setLevel(log_level); logqueue.configure(json_lines)
+            if queued: logqueue.start()
+            cpu = time.thread_time(); result = simulate(agents, args.hands, args.seed, quiet=False); cpu = time.thread_time() - cpu
+            start = time.perf_counter(); logqueue.stop(); handler.close(); drained = time.perf_counter() - start
+            actions = result["actions"]; lines = sum(1 for _ in open(path, "rb"))
+            print(f"{label:<30} {cpu / actions * 1e6:>7.1f} us/action CPU on the caller, {result['seconds'] / actions * 1e6:>6.1f} us wall"
+                  + (f", queue drained {drained * 1000:.0f} ms later" if queued else "") + f"  ({lines / actions:.1f} lines/action)")
+        try:
+            run("logging at WARNING", log_level=logging.WARNING)
+            run("handler on the caller")
+            run("queued to a listener thread", queued=True)
+            run("queued, JSON lines", json_lines=True, queued=True)
+        finally: root.handlers[:] = saved; root.setLevel(level); logqueue.configure()
+    log = logging.getLogger("bench"); log.setLevel(logging.INFO); player_id, stage, allowed = 3, "flop", ["fold", "call", "raise"]
+    start = time.perf_counter()
+    for _ in range(args.rounds): log.debug(f" P{player_id} Requesting Action. Opts: {allowed}, Stage: {stage}")
+    _report("disabled debug, f-string", args.rounds, time.perf_counter() - start, "calls")
+    start = time.perf_counter()
+    for _ in range(args.rounds): log.debug(" P%d Requesting Action. Opts: %s, Stage: %s", player_id, allowed, stage)
+    _report("disabled debug, lazy arguments", args.rounds, time.perf_counter() - start, "calls")
+
+def main():
+    parser = argparse.ArgumentParser(description="Poker server micro-benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("evaluator", help="Hands/sec of the lookup-table evaluator vs the legacy one.")
+    p.add_argument("--hands", type=int, default=20000); p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_evaluator)
+    p = sub.add_parser("parity", help="Check evaluate_many against the legacy evaluator over random deals.")
+    p.add_argument("--deals", type=int, default=2000); p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=check_parity)
+    p = sub.add_parser("tables", help="Per-table action latency as the number of concurrent tables grows.")
+    p.add_argument("--tables", type=int, nargs="+", default=[1, 10, 100, 1000])
+    p.add_argument("--players", type=int, default=2); p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--stalled", type=int, default=0, help="Spectators per table whose sends never complete.")
+    p.add_argument("--slow-clients", choices=SLOW_CLIENT_POLICIES, default="drop")
+    p.set_defaults(func=bench_tables)
+    p = sub.add_parser("broadcast", help="game_state encoding cost and size per broadcast to a full table.")
+    p.add_argument("--players", type=int, default=8); p.add_argument("--rounds", type=int, default=5000)
+    p.set_defaults(func=bench_broadcast)
+    p = sub.add_parser("engine", help="Hands/sec of the betting state machine alone, without sockets or delays.")
+    p.add_argument("--players", type=int, default=6); p.add_argument("--hands", type=int, default=2000); p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_engine)
+    p = sub.add_parser("handlog", help="Cost of writing the binary hand history, and replay speed of its mmap reader.")
+    p.add_argument("--players", type=int, default=6); p.add_argument("--hands", type=int, default=5000); p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_handlog)
+    p = sub.add_parser("bankroll", help="Sustained settled hands/sec of the SQLite bankroll store, batched vs one commit per hand.")
+    p.add_argument("--players", type=int, default=6); p.add_argument("--hands", type=int, default=100000); p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--interval", type=float, default=50.0, help="Batch interval of the write-behind queue, in ms.")
+    p.set_defaults(func=bench_bankroll)
+    p = sub.add_parser("snapshot", help="Checkpoint cost and restart time of table snapshots for many tables mid-hand.")
+    p.add_argument("--tables", type=int, default=5000); p.add_argument("--players", type=int, default=6); p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_snapshot)
+    p = sub.add_parser("codec", help="Encode/decode speed and size of the JSON and MessagePack wire codecs.")
+    p.add_argument("--players", type=int, default=8); p.add_argument("--rounds", type=int, default=5000)
+    p.set_defaults(func=bench_codec)
+    p = sub.add_parser("timers", help="Turn clock churn, memory and firing lateness of the timer wheel vs one event loop timer each.")
+    p.add_argument("--timers", type=int, default=10000); p.add_argument("--rounds", type=int, default=20); p.add_argument("--fire", type=int, default=5000)
+    p.set_defaults(func=bench_timers)
+    p = sub.add_parser("memory", help="Bytes of server state per idle connection and per seated player.")
+    p.add_argument("--connections", type=int, default=20000)
+    p.set_defaults(func=bench_memory)
+    p = sub.add_parser("metrics", help="Cost of recording a histogram observation and a timed table lock, and of rendering a scrape.")
+    p.add_argument("--rounds", type=int, default=1000000)
+    p.set_defaults(func=bench_metrics)
+    p = sub.add_parser("logging", help="Per-action cost of engine logging written on the caller vs queued to a background thread.")
+    p.add_argument("--players", type=int, default=6); p.add_argument("--hands", type=int, default=2000); p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--rounds", type=int, default=1000000)
+    p.set_defaults(func=bench_logging)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from typing import Iterable, List
+
+SUITS = "♠♥♦♣"
+RANKS = "23456789TJQKA"
+RANK_VALUES = {rank: i for i, rank in enumerate(RANKS)}
+SUIT_VALUES = {suit: i for i, suit in enumerate(SUITS)}
+
+# Integer cards: rank * 4 + suit, so 0 == "2♠" and 51 == "A♣".
+# rank == card >> 2, suit == card & 3.
+CARD_STRINGS = [rank + suit for rank in RANKS for suit in SUITS]
+CARD_INTS = {card: i for i, card in enumerate(CARD_STRINGS)}
+DECK = bytes(range(52))  # the template every hand's deck is drawn from; the engine keeps decks and boards as bytearrays
+
+def card_to_int(card: str) -> int:
+    return CARD_INTS[card]
+
+def int_to_card(card: int) -> str:
+    return CARD_STRINGS[card]
+
+def cards_to_ints(cards: Iterable[str]) -> List[int]:
+    return [CARD_INTS[c] for c in cards]
+
+def ints_to_cards(cards: Iterable[int]) -> List[str]:
+    return [CARD_STRINGS[c] for c in cards]
+
+def get_rank_value(rank_char: str) -> int:
+    return RANK_VALUES.get(rank_char, -1)
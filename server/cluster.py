@@ -0,0 +1,236 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import struct
+import time
+from collections import deque
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from outbox import outbox_for
+
+# How often each worker publishes its table summaries to the supervisor.
+DIRECTORY_INTERVAL = 1.0
+RESTART_DELAY = 1.0
+
+class PipeWriter:
+    """Sends messages down a Connection without ever blocking on a full pipe.
+
+    Messages are framed as Connection.send frames them, so the other end reads them with
+    Connection.recv. What the pipe will not take now waits in the queue, in order, for flush()
+    once the pipe is writable again. The pipes are socket pairs (duplex Pipe() on Unix), so a
+    write is made non-blocking with MSG_DONTWAIT and the reading side of the fd is untouched.
+    """
+    def __init__(self, conn: Connection):
+        self._sock = socket.socket(fileno=os.dup(conn.fileno()))
+        self._queue: Deque[memoryview] = deque(); self.pending = 0  # bytes queued
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def send(self, msg: Any) -> bool:
+        """Queues `msg` and writes what the pipe takes; False while some of the queue is left."""
+        data = ForkingPickler.dumps(msg); size = len(data)
+        frame = (struct.pack("!i", size) if size <= 0x7fffffff else struct.pack("!iQ", -1, size)) + data
+        self._queue.append(memoryview(frame)); self.pending += len(frame)
+        return self.flush()
+
+    def flush(self) -> bool:
+        queue = self._queue
+        while queue:
+            try: sent = self._sock.send(queue[0], socket.MSG_DONTWAIT)
+            except BlockingIOError: return False
+            self.pending -= sent
+            if sent < len(queue[0]): queue[0] = queue[0][sent:]
+            else: queue.popleft()
+        return True
+
+    def close(self):
+        self._queue.clear(); self.pending = 0; self._sock.close()
+
+class RemoteSocket:
+    """Stands in for a websocket connected to another worker.
+
+    Frames sent to it are relayed to the gateway worker that owns the real connection, and
+    iterating it yields the raw messages that gateway forwards, so a normal client session
+    can run on top of it.
+    """
+    def __init__(self, link: "WorkerLink", gateway: int, conn_id: int, remote_address: Any, subprotocol: Optional[str] = None):
+        self.link = link; self.gateway = gateway; self.conn_id = conn_id
+        self.remote_address = remote_address; self.subprotocol = subprotocol  # the gateway connection's codec
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.hold = False  # the gateway lost the connection: keep the seat for it to resume
+
+    async def send(self, message):
+        self.link.send({"op": "deliver", "to": self.gateway, "conn": self.conn_id, "message": message})
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.link.send({"op": "close", "to": self.gateway, "conn": self.conn_id, "code": code, "reason": reason})
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.inbox.get()
+        if message is None: raise StopAsyncIteration
+        return message
+
+class WorkerLink:
+    """A worker's IPC channel to the supervisor: the table directory plus seat relaying."""
+    def __init__(self, conn: Connection, worker_index: int, num_workers: int):
+        self.conn = conn; self.worker_index = worker_index; self.num_workers = num_workers
+        self._writer = PipeWriter(conn); self._draining = False
+        self.directory: List[Dict[str, Any]] = []
+        self._conn_ids = itertools.count(1)
+        self._gateway_sessions: Dict[int, Any] = {}
+        self._remote_sockets: Dict[Tuple[int, int], RemoteSocket] = {}
+        self._remote_session: Optional[Callable[[RemoteSocket, int, Optional[str], Optional[List[Any]]], Awaitable]] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._on_lost: Optional[Callable[[], None]] = None
+
+    def owner_of(self, table_id: int) -> int:
+        return (table_id - 1) % self.num_workers
+
+    def is_local(self, table_id: int) -> bool:
+        return self.owner_of(table_id) == self.worker_index
+
+    def start(self, list_tables: Callable[[], List[Dict[str, Any]]],
+              remote_session: Callable[[RemoteSocket, int, Optional[str], Optional[List[Any]]], Awaitable], on_lost: Callable[[], None]):
+        self._remote_session = remote_session; self._on_lost = on_lost
+        asyncio.get_running_loop().add_reader(self.conn.fileno(), self._on_readable)
+        self._publisher = asyncio.create_task(self._publish_tables(list_tables))
+
+    def stop(self):
+        loop = asyncio.get_running_loop(); loop.remove_reader(self.conn.fileno())
+        if self._draining: loop.remove_writer(self._writer.fileno()); self._draining = False
+        if self._publisher: self._publisher.cancel()
+
+    def send(self, msg: Dict[str, Any]):
+        """Never blocks the event loop: if the supervisor is behind, the rest goes out when the pipe drains."""
+        try: done = self._writer.send(msg)
+        except (BrokenPipeError, OSError) as e: logging.error(f"Worker {self.worker_index}: supervisor link lost: {e}"); return
+        if not done and not self._draining: asyncio.get_running_loop().add_writer(self._writer.fileno(), self._drain); self._draining = True
+
+    def _drain(self):
+        try: done = self._writer.flush()
+        except (BrokenPipeError, OSError) as e: logging.error(f"Worker {self.worker_index}: supervisor link lost: {e}"); done = True
+        if done: asyncio.get_running_loop().remove_writer(self._writer.fileno()); self._draining = False
+
+    async def _publish_tables(self, list_tables):
+        while True:
+            self.send({"op": "tables", "worker": self.worker_index, "tables": list_tables()})
+            await asyncio.sleep(DIRECTORY_INTERVAL)
+
+    # Gateway side: a local connection seated at a table on another worker. `resume` ([token, version])
+    # takes over the seat of that resume token instead of joining.
+    def seat_remote(self, session, table_id: int, name: Optional[str], resume: Optional[List[Any]] = None):
+        if getattr(session, "link_conn_id", None) is None: session.link_conn_id = next(self._conn_ids)
+        self._gateway_sessions[session.link_conn_id] = session
+        self.send({"op": "seat", "to": self.owner_of(table_id), "gateway": self.worker_index, "conn": session.link_conn_id,
+                   "table": table_id, "name": name, "address": session.websocket.remote_address,
+                   "subprotocol": getattr(session.websocket, "subprotocol", None), "resume": resume})
+
+    def forward(self, session, table_id: int, message):
+        self.send({"op": "inbound", "to": self.owner_of(table_id), "gateway": self.worker_index, "conn": session.link_conn_id, "message": message})
+
+    def unseat_remote(self, session, table_id: int, hold: bool = False):
+        self._gateway_sessions.pop(session.link_conn_id, None)
+        self.send({"op": "unseat", "to": self.owner_of(table_id), "gateway": self.worker_index, "conn": session.link_conn_id, "hold": hold})
+
+    # Owner side: the relayed seat has ended (left, failed to join or the table closed); `rejected` when its resume token was unknown.
+    def release(self, socket: RemoteSocket, rejected: bool = False):
+        if self._remote_sockets.pop((socket.gateway, socket.conn_id), None) is not None:
+            self.send({"op": "unseated", "to": socket.gateway, "conn": socket.conn_id, "rejected": rejected})
+
+    def _on_readable(self):
+        try:
+            while self.conn.poll(): self._dispatch(self.conn.recv())
+        except (EOFError, OSError) as e:
+            logging.error(f"Worker {self.worker_index}: supervisor link closed: {e}. Shutting down.")
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            if self._on_lost: self._on_lost()
+
+    def _dispatch(self, msg: Dict[str, Any]):
+        op = msg["op"]
+        if op == "directory": self.directory = msg["tables"]
+        elif op in ("deliver", "close", "unseated"):
+            session = self._gateway_sessions.get(msg["conn"])
+            if session is None: return
+            if op == "deliver": outbox_for(session.websocket).send(msg["message"])
+            elif op == "close": asyncio.create_task(session.websocket.close(code=msg["code"], reason=msg["reason"]))
+            else: self._gateway_sessions.pop(msg["conn"], None); session.remote_unseated(msg.get("rejected", False))
+        elif op == "seat":
+            socket = RemoteSocket(self, msg["gateway"], msg["conn"], msg["address"], msg.get("subprotocol"))
+            self._remote_sockets[(socket.gateway, socket.conn_id)] = socket
+            asyncio.create_task(self._remote_session(socket, msg["table"], msg["name"], msg.get("resume")))
+        elif op in ("inbound", "unseat"):
+            socket = self._remote_sockets.get((msg["gateway"], msg["conn"]))
+            if socket is None: return
+            if op == "unseat": del self._remote_sockets[(socket.gateway, socket.conn_id)]; socket.hold = msg.get("hold", False)
+            socket.inbox.put_nowait(msg["message"] if op == "inbound" else None)
+        else: logging.warning(f"Worker {self.worker_index}: unknown IPC op '{op}'")
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def run_supervisor(num_workers: int, worker_main: Callable[[int, int, Connection], None]):
+    """Forks `num_workers` workers and relays directory updates and seat traffic between them.
+
+    Each worker accepts on the shared SO_REUSEPORT port and owns the tables whose IDs map to
+    it (see WorkerLink.owner_of); a worker that dies is restarted (with an empty table set,
+    or with its tables as of its last snapshot under --snapshots).
+    """
+    ctx = multiprocessing.get_context("fork")
+    links: Dict[int, Connection] = {}; writers: Dict[int, PipeWriter] = {}; procs: Dict[int, multiprocessing.Process] = {}
+    directories: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(num_workers)}
+
+    def spawn(i: int):
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=worker_main, args=(i, num_workers, child), name=f"poker-worker-{i}")
+        proc.start(); child.close()
+        links[i] = parent; writers[i] = PipeWriter(parent); procs[i] = proc
+        logging.info(f"Supervisor: started worker {i} (pid {proc.pid}).")
+
+    def broadcast_directory():
+        merged = [t for i in sorted(directories) for t in directories[i]]
+        for writer in writers.values():
+            try: writer.send({"op": "directory", "tables": merged})
+            except (BrokenPipeError, OSError): pass
+
+    signal.signal(signal.SIGTERM, _interrupt)  # inherited by the workers, so they shut down cleanly too
+    for i in range(num_workers): spawn(i)
+    try:
+        while True:
+            by_conn = {conn: i for i, conn in links.items()}; by_sentinel = {p.sentinel: i for i, p in procs.items()}
+            backed_up = [writer for writer in writers.values() if writer.pending]  # a worker that is behind must not stall the others
+            readable, writable, _ = select.select(list(by_conn) + list(by_sentinel), backed_up, [], DIRECTORY_INTERVAL)
+            for writer in writable:
+                try: writer.flush()
+                except (BrokenPipeError, OSError): writer.close()  # the worker is gone; its sentinel restarts it
+            for ready in readable:
+                if ready in by_sentinel:
+                    i = by_sentinel[ready]; procs[i].join()
+                    logging.error(f"Supervisor: worker {i} exited with code {procs[i].exitcode}. Restarting in {RESTART_DELAY}s.")
+                    links.pop(i).close(); writers.pop(i).close(); directories[i] = []; broadcast_directory()
+                    time.sleep(RESTART_DELAY); spawn(i)
+                    continue
+                if ready not in by_conn or by_conn[ready] not in links: continue
+                try: msg = ready.recv()
+                except (EOFError, OSError): continue
+                if msg["op"] == "tables": directories[msg["worker"]] = msg["tables"]; broadcast_directory()
+                elif (target := writers.get(msg.get("to"))) is not None:
+                    try: target.send(msg)
+                    except (BrokenPipeError, OSError): logging.warning(f"Supervisor: dropped '{msg['op']}' for worker {msg['to']}.")
+    except KeyboardInterrupt: logging.info("Supervisor: interrupted, stopping workers.")
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for proc in procs.values():
+            if proc.is_alive(): proc.terminate()
+        for proc in procs.values(): proc.join(timeout=5)
+        logging.info("Supervisor: all workers stopped.")
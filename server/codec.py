@@ -0,0 +1,97 @@
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from cards import CARD_INTS, CARD_STRINGS
+
+try:
+    import msgpack
+except ImportError:  # the binary protocol is optional
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+# Wire IDs of the message types in the binary protocol. Append only: clients rely on the order.
+MESSAGE_TYPES = [
+    "assign_id", "game_state", "game_state_delta", "player_turn", "player_action", "game_message", "showdown",
+    "pot_awarded", "equity", "error", "table_list", "spectating", "left_table",
+    "set_name", "list_tables", "join_table", "spectate_table", "create_table", "leave_table", "resync",
+    "turn_timer",
+]
+MESSAGE_TYPE_IDS = {t: i for i, t in enumerate(MESSAGE_TYPES)}
+# Payload fields holding cards (lists of cards, or maps of player ID -> list of cards).
+CARD_FIELDS = {"hand", "community_cards", "winningHand", "allHands"}
+HIDDEN_CARD = -1  # "??"
+
+class DecodeError(ValueError):
+    pass
+
+class JsonCodec:
+    """The default text protocol: {"type": ..., "payload": ...}; batches are JSON arrays of messages."""
+    name = "json"; label = "JSON"
+
+    def encode(self, msg_type: str, payload: Any) -> str:
+        return json.dumps({"type": msg_type, "payload": payload})
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        try: return json.loads(frame)
+        except ValueError as e: raise DecodeError(str(e)) from e
+
+    def batch(self, frames: List[str]) -> str:
+        # Frames relayed from another worker may already be batches; splice them in rather than nest them.
+        return frames[0] if len(frames) == 1 else "[" + ", ".join(f[1:-1] if f[0] == "[" else f for f in frames) + "]"
+
+    def decode_frame(self, frame: Frame) -> List[Dict[str, Any]]:
+        """All messages in a (possibly batched) server frame, for bots and tools."""
+        data = self.decode(frame)
+        return data if isinstance(data, list) else [data]
+
+def _to_wire(value: Any, cards: bool = False) -> Any:
+    # Only containers are walked; scalars are copied without a call.
+    if type(value) is dict:
+        return {k: _to_wire(v, cards or k in CARD_FIELDS) if type(v) in (dict, list) else v for k, v in value.items()}
+    if cards: return [CARD_INTS.get(v, HIDDEN_CARD) if type(v) is str else _to_wire(v, cards) for v in value]
+    return [_to_wire(v) if type(v) in (dict, list) else v for v in value]
+
+def _from_wire(value: Any, cards: bool = False) -> Any:
+    if type(value) is dict:
+        return {k: _from_wire(v, cards or k in CARD_FIELDS) if type(v) in (dict, list) else v for k, v in value.items()}
+    if cards: return [("??" if v == HIDDEN_CARD else CARD_STRINGS[v]) if type(v) is int else _from_wire(v, cards) for v in value]
+    return [_from_wire(v) if type(v) in (dict, list) else v for v in value]
+
+class MsgpackCodec:
+    """Binary protocol: each message is the MessagePack array [type ID, payload], with cards as
+    integers (rank * 4 + suit, HIDDEN_CARD for a face-down card). A batch is the messages'
+    encodings back to back, which any streaming MessagePack unpacker reads one by one.
+    """
+    name = "msgpack"; label = "MessagePack"
+
+    def encode(self, msg_type: str, payload: Any) -> bytes:
+        return msgpack.packb([MESSAGE_TYPE_IDS.get(msg_type, msg_type), _to_wire(payload)])
+
+    def decode(self, frame: Frame) -> Dict[str, Any]:
+        if not isinstance(frame, bytes): raise DecodeError("expected a binary frame")
+        try: msg_type, payload = msgpack.unpackb(frame, strict_map_key=False)
+        except (ValueError, TypeError) as e: raise DecodeError(str(e)) from e
+        if isinstance(msg_type, int): msg_type = MESSAGE_TYPES[msg_type] if 0 <= msg_type < len(MESSAGE_TYPES) else None
+        return {"type": msg_type, "payload": payload}
+
+    def batch(self, frames: List[bytes]) -> bytes:
+        return b"".join(frames)
+
+    def decode_frame(self, frame: Frame, int_cards: bool = False) -> List[Dict[str, Any]]:
+        """All messages in a server frame; cards come back as strings unless `int_cards` (bots that evaluate hands)."""
+        unpacker = msgpack.Unpacker(strict_map_key=False); unpacker.feed(frame)
+        return [{"type": MESSAGE_TYPES[t] if isinstance(t, int) else t, "payload": p if int_cards else _from_wire(p)} for t, p in unpacker]
+
+JSON = JsonCodec()
+CODECS: Dict[str, Any] = {"poker.json": JSON}
+if msgpack is not None: CODECS["poker.msgpack"] = MsgpackCodec()
+
+def select_subprotocol(connection, offered) -> Optional[str]:
+    """Handshake hook: the first subprotocol the client offers that we speak. None (plain JSON) otherwise."""
+    return next((p for p in offered if p in CODECS), None)
+
+def codec_for(websocket) -> Any:
+    """The codec negotiated for a connection (via its websocket subprotocol)."""
+    subprotocol: Optional[str] = getattr(websocket, "subprotocol", None)
+    return CODECS.get(subprotocol, JSON)
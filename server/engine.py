@@ -0,0 +1,511 @@
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from cards import DECK, ints_to_cards
+from evaluator import describe_hand
+from handlog import (ABORTED, ACTION, ACTION_CODES, AWARD, BIG_BLIND_CODE, BLIND, BOARD, COMPLETED, HAND_END, HAND_START, SEAT,
+                     SEAT_NAME_BYTES, SHOWDOWN_AWARD, SMALL_BLIND_CODE, STREET_CODES, UNCONTESTED_AWARD, HandLog)
+from metrics import EVALUATE_SECONDS, SHOWDOWN_SECONDS
+from pots import PotLedger
+
+MAX_PLAYERS = 8
+STARTING_STACK = 1000
+SMALL_BLIND = 10
+BIG_BLIND = 20
+
+# Outbound events returned by the engine, as tuples whose first item is the kind:
+#   ("message", text)                         game_message to the table
+#   ("state",)                                game_state to the table
+#   ("action", payload)                       player_action to the table
+#   ("turn", player_id, payload, serial)      player_turn prompt; `serial` identifies the turn (for timeouts)
+#   ("error", player_id, text)                error to one player
+#   ("equity", stage, hands, board)           all-in equity to compute and send (integer cards)
+#   ("showdown", payload) / ("pot_awarded", payload)
+#   ("pause", seconds, token)                 always last: call resume(token) after `seconds`
+#   ("hand_over",)
+Event = Tuple[Any, ...]
+
+# The engine logs every step of a hand; simulations switch it off with `log.disabled = True`.
+log = logging.getLogger(__name__)
+
+BETTING_STAGES = ("preflop", "flop", "turn", "river")
+NEXT_STREET = {"preflop": ("flop", 3), "flop": ("turn", 1), "turn": ("river", 1)}
+
+def evaluate_hand(hand: Sequence[int], community_cards: Sequence[int]) -> Tuple[int, List[int], str, List[str]]:
+    all_cards = [*hand, *community_cards]
+    if len(all_cards) < 5: return (0, [], "Invalid Hand (<5 cards)", [])
+    return describe_hand(all_cards)
+
+_shared_rng = random.Random()
+
+class Player:
+    # A seat is held per connection, so no per-instance __dict__.
+    __slots__ = ("id", "name", "websocket", "session", "away", "stack", "hand", "current_bet", "total_bet_this_hand", "status",
+                 "is_dealer", "last_action", "last_action_time", "last_hand_rank")
+
+    def __init__(self, player_id: int, websocket):
+        self.id: int = player_id
+        self.name: Optional[str] = None
+        self.websocket = websocket
+        self.session: Optional[str] = None  # resume token handed out with assign_id
+        self.away: bool = False  # connection dropped and seat held: dealt out of new hands until they are back
+        self.stack: int = STARTING_STACK
+        self.hand: List[int] = []  # integer cards (cards.py); strings only in to_dict()
+        self.current_bet: int = 0
+        self.total_bet_this_hand: int = 0
+        self.status: str = "waiting"
+        self.is_dealer: bool = False
+        self.last_action: Optional[str] = None
+        self.last_action_time: float = 0.0
+        self.last_hand_rank: Optional[str] = None
+
+    def to_dict(self, show_hand=False) -> Dict[str, Any]:
+        display_name = self.name if self.name else f"Player {self.id}"
+        hand_display = ['??', '??'] if self.hand else []
+        if self.status == "folded": hand_display = []
+        elif show_hand and self.hand: hand_display = ints_to_cards(self.hand)
+        return {
+            "id": self.id, "name": display_name, "stack": self.stack, "hand": hand_display,
+            "current_bet": self.current_bet, "status": self.status, "is_dealer": self.is_dealer,
+            "last_action": self.last_action, "last_hand_rank": self.last_hand_rank,
+            "total_bet_this_hand": self.total_bet_this_hand
+        }
+
+    def can_act(self) -> bool:
+        return self.status == "active" and self.stack > 0
+
+    def snapshot(self) -> List[Any]:
+        return [self.id, self.name, self.stack, self.hand, self.current_bet, self.total_bet_this_hand, self.status, self.is_dealer, self.last_action, self.last_hand_rank]
+
+    @classmethod
+    def from_snapshot(cls, data: List[Any], websocket) -> "Player":
+        player = cls(data[0], websocket)
+        (player.name, player.stack, player.hand, player.current_bet, player.total_bet_this_hand, player.status, player.is_dealer,
+         player.last_action, player.last_hand_rank) = data[1:]
+        return player
+
+class LegalActions:
+    """What the player to act may do: the player_turn prompt and what act() validates against.
+    Worked out once per turn from the round's betting context, in O(1)."""
+    __slots__ = ("player_id", "serial", "actions", "call_amount", "min_total", "max_total", "current_bet", "stack", "big_blind")
+
+    def __init__(self, player: Player, serial: int, current_bet: int, raise_size: int, can_raise: bool, big_blind: int):
+        self.player_id = player.id; self.serial = serial; self.current_bet = current_bet; self.stack = player.stack; self.big_blind = big_blind
+        bet = player.current_bet; stack = player.stack; self.max_total = bet + stack  # all-in
+        self.actions = ["fold"]; self.call_amount = 0; self.min_total = 0
+        if bet == current_bet: self.actions.append("check")
+        elif stack > 0: self.actions.append("call"); self.call_amount = min(current_bet - bet, stack)
+        if stack > 0 and current_bet == 0: self.actions.append("bet"); self.min_total = min(big_blind, self.max_total)
+        elif stack > 0 and can_raise and self.max_total > current_bet: self.actions.append("raise"); self.min_total = min(current_bet + raise_size, self.max_total)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"playerId": self.player_id, "actions": self.actions, "callAmount": self.call_amount, "minRaise": self.min_total,
+                "maxRaise": self.max_total, "currentBet": self.current_bet, "stack": self.stack, "bigBlind": self.big_blind}
+
+class TableEngine:
+    """The hand flow of one table as a synchronous state machine.
+
+    start_hand(), act(), player_left() and resume() change the table state and return the
+    events the caller has to deliver; nothing here awaits, sleeps or touches a socket. Where
+    the flow should breathe for human players (after dealing, before awarding the pot) it
+    stops with a ("pause", seconds, token) event and continues on resume(token), which a
+    headless driver may call straight away.
+    """
+    def __init__(self, small_blind: int = SMALL_BLIND, big_blind: int = BIG_BLIND, rng: Optional[random.Random] = None):
+        self.small_blind = small_blind; self.big_blind = big_blind
+        self.rng = rng or _shared_rng  # a Mersenne Twister is 2.5 KB of state; tables only need their own to be reproducible
+        self.players: Dict[int, Player] = {}
+        self.deck = bytearray()  # integer cards, dealt from the end
+        self.community_cards = bytearray()
+        self.pot_ledger = PotLedger()  # main and side pots, kept up to date as chips go in
+        self.current_bet: int = 0
+        self.raise_size: int = big_blind  # the last full bet or raise of the round: a raise must be at least this much more
+        self.last_raiser_id: Optional[int] = None
+        self.current_player_id: Optional[int] = None
+        self.dealer_button_pos: int = -1
+        self.small_blind_pos: int = 0
+        self.big_blind_pos: int = 0
+        self.game_stage: str = "idle"
+        self.active_players_order: List[int] = []
+        self.actions_this_round: Set[int] = set()
+        self.turn_serial: int = 0  # bumps on every prompt, so a stale timeout can tell it's too late
+        self._legal: Optional[LegalActions] = None  # the current prompt's
+        self._pause_token: int = 0
+        self._next: Optional[Callable[[], List[Event]]] = None
+        self.table_id: int = 0
+        self.hand_log: Optional[HandLog] = None  # hand history, when enabled
+        self.hand_id: int = 0  # the open hand's ID in hand_log, 0 between hands
+        self.last_hand_id: int = 0  # the ID of the hand that ended last
+
+    # --- flow control ---
+
+    def _pause(self, seconds: float, then: Callable[[], List[Event]]) -> Event:
+        self._pause_token += 1; self._next = then
+        return ("pause", seconds, self._pause_token)
+
+    def resume(self, token: int) -> List[Event]:
+        """Continues the flow after a pause. A token from an aborted or finished hand does nothing."""
+        if token != self._pause_token or self._next is None: return []
+        then, self._next = self._next, None
+        return then()
+
+    def abort_hand(self):
+        """Drops any pending continuation, e.g. when the table is reset mid-hand."""
+        self._next = None; self._pause_token += 1; self.current_player_id = None
+        if self.hand_id: self._end_record(ABORTED)
+
+    def _record(self, kind: int, code: int = 0, player_id: int = 0, amount: int = 0, cards: Sequence[int] = (), extra: bytes = b""):
+        self.hand_log.record(kind, code, self.table_id, self.hand_id, player_id, amount, cards, extra)
+
+    def _end_record(self, code: int, pot: int = 0):
+        self._record(HAND_END, code, amount=pot); self.last_hand_id, self.hand_id = self.hand_id, 0
+
+    def _record_hand_start(self, dealer_id: int, sb_id: int, sb_amt: int, bb_id: int, bb_amt: int):
+        self.hand_id = self.hand_log.new_hand()
+        self._record(HAND_START, len(self.active_players_order), dealer_id, self.big_blind)
+        for pid in self.active_players_order:
+            p = self.players[pid]
+            self._record(SEAT, 0, pid, p.stack + p.total_bet_this_hand, p.hand, (p.name or "").encode()[:SEAT_NAME_BYTES])
+        self._record(BLIND, SMALL_BLIND_CODE, sb_id, sb_amt); self._record(BLIND, BIG_BLIND_CODE, bb_id, bb_amt)
+
+    def awaiting_action(self) -> bool:
+        return self._next is None and self.game_stage in BETTING_STAGES and self.current_player_id is not None
+
+    def can_start_hand(self) -> bool:
+        return sum(1 for p in self.players.values() if p.name is not None and p.stack > 0 and not p.away) >= 2
+
+    @property
+    def pot(self) -> int:
+        return self.pot_ledger.total
+
+    def live_pots(self) -> List[Dict[str, Any]]:
+        """The main pot, then side pots: chips in each and the IDs of the players who can still win it."""
+        live = {pid for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ("active", "all-in")}
+        return [{"amount": amount, "eligible": eligible} for amount, eligible in self.pot_ledger.pots_for(live)]
+
+    def _name(self, player_id: Optional[int]) -> str:
+        p = self.players.get(player_id)
+        return (p.name or f"P{player_id}") if p else f"P{player_id}"
+
+    # --- snapshots ---
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """The table as plain data, at a point the flow can pick up from: between hands, or waiting
+        on a player's action. None while dealing or paused; the caller keeps its previous snapshot."""
+        between_hands = self.game_stage in ("idle", "hand_over")
+        if not between_hands and not self.awaiting_action(): return None
+        return {"stage": "idle" if between_hands else self.game_stage, "deck": list(self.deck), "board": list(self.community_cards), "pot": self.pot, "pots": self.pot_ledger.snapshot(),
+                "bet": self.current_bet, "raiseSize": self.raise_size, "raiser": self.last_raiser_id, "turn": self.current_player_id if not between_hands else None,
+                "positions": [self.dealer_button_pos, self.small_blind_pos, self.big_blind_pos], "order": self.active_players_order,
+                "acted": sorted(self.actions_this_round), "hand": self.hand_id, "lastHand": self.last_hand_id,
+                "players": [p.snapshot() for p in self.players.values() if p.name is not None]}
+
+    def restore(self, state: Dict[str, Any], websocket_for: Callable[[List[Any]], Any]):
+        """Loads a snapshot(). A hand in progress continues with _request_action() for the player
+        whose turn it was; `websocket_for` gives each player's stand-in websocket."""
+        self.game_stage = state["stage"]; self.deck = bytearray(state["deck"]); self.community_cards = bytearray(state["board"])
+        self.current_bet = state["bet"]; self.raise_size = state.get("raiseSize", self.big_blind); self.last_raiser_id = state["raiser"]; self.current_player_id = state["turn"]
+        self.dealer_button_pos, self.small_blind_pos, self.big_blind_pos = state["positions"]
+        self.active_players_order = state["order"]; self.actions_this_round = set(state["acted"])
+        self.hand_id = state["hand"]; self.last_hand_id = state["lastHand"]; self._next = None
+        self.players = {data[0]: Player.from_snapshot(data, websocket_for(data)) for data in state["players"]}
+        pots = state.get("pots") or [[p.id, p.total_bet_this_hand, int(p.status == "all-in")] for p in self.players.values() if p.total_bet_this_hand]
+        self.pot_ledger = PotLedger.from_snapshot(pots)
+
+    # --- hand setup ---
+
+    def start_hand(self) -> List[Event]:
+        log.info("Setting up new hand...")
+        self._next = None; self._pause_token += 1
+        if self.hand_id: self._end_record(ABORTED)
+        self.game_stage = "starting"
+        self.community_cards = bytearray(); self.pot_ledger.clear(); self.current_bet = 0; self.last_raiser_id = None
+        self.current_player_id = None; self.actions_this_round = set(); self.raise_size = self.big_blind
+        eligible_players = {pid: p for pid, p in self.players.items() if p.stack > 0 and p.name is not None and not p.away}
+        if len(eligible_players) < 2:
+            log.warning("New hand setup failed: Less than 2 eligible players.")
+            self.game_stage = "idle"; return [("message", "Game paused. Waiting for players..."), ("state",), ("hand_over",)]
+        self.active_players_order = sorted(eligible_players.keys())
+        num_eligible = len(self.active_players_order)
+        # A random draw of just the cards this hand can use (hole cards, 3 burns, 5 board) is a
+        # shuffled deck's top as far as the hand can tell, and much cheaper than shuffling all 52.
+        self.deck = bytearray(self.rng.sample(DECK, 2 * num_eligible + 8))
+        log.debug("Eligible Player Order for Hand: %s", self.active_players_order)
+        for player in self.players.values():
+            player.last_hand_rank = None
+            player.hand = []; player.current_bet = 0; player.total_bet_this_hand = 0; player.is_dealer = False; player.last_action = None
+            player.status = "active" if player.id in eligible_players else "waiting"
+        if self.dealer_button_pos == -1: self.dealer_button_pos = self.rng.randrange(num_eligible)
+        else: self.dealer_button_pos = (self.dealer_button_pos + 1) % num_eligible
+        dealer_id = self.active_players_order[self.dealer_button_pos]; self.players[dealer_id].is_dealer = True
+        if num_eligible == 2:
+             self.small_blind_pos = self.dealer_button_pos; self.big_blind_pos = (self.dealer_button_pos + 1) % num_eligible
+        else:
+             self.small_blind_pos = (self.dealer_button_pos + 1) % num_eligible; self.big_blind_pos = (self.dealer_button_pos + 2) % num_eligible
+        sb_id = self.active_players_order[self.small_blind_pos]; bb_id = self.active_players_order[self.big_blind_pos]
+        deal_start_pos = (self.dealer_button_pos + 1) % num_eligible
+        for _ in range(2):
+            for i in range(num_eligible):
+                self.players[self.active_players_order[(deal_start_pos + i) % num_eligible]].hand.append(self.deck.pop())
+        sb_amt = self._post_blind(sb_id, self.small_blind); bb_amt = self._post_blind(bb_id, self.big_blind)
+        self.current_bet = max(sb_amt, bb_amt); self.last_raiser_id = bb_id  # a short big blind can be all-in for less than the small blind
+        if self.hand_log: self._record_hand_start(dealer_id, sb_id, sb_amt, bb_id, bb_amt)
+        start_action_pos = (self.big_blind_pos + 1) % num_eligible
+        self.current_player_id = next((pid for i in range(num_eligible) if self.players[pid := self.active_players_order[(start_action_pos + i) % num_eligible]].can_act()), None)
+        if self.current_player_id is None: log.warning("No active player found to start preflop betting (all-in?).")
+        self.game_stage = "preflop"
+        dealer_name, sb_name, bb_name = self._name(dealer_id), self._name(sb_id), self._name(bb_id)
+        log.info(f"Hand Setup Complete: Dealer: {dealer_name}({dealer_id}), SB: {sb_name}({sb_id}), BB: {bb_name}({bb_id})")
+        sb_msg = f"{sb_name} posts Small Blind ${sb_amt}" + (" (All-in)" if self.players[sb_id].status == 'all-in' else "")
+        bb_msg = f"{bb_name} posts Big Blind ${bb_amt}" + (" (All-in)" if self.players[bb_id].status == 'all-in' else "")
+        # The blinds are already in; the messages are paced for the players' benefit.
+        return [("message", f"--- Starting New Hand --- Dealer: {dealer_name}"), ("state",), self._pause(0.5, lambda: [
+            ("message", sb_msg), ("state",), self._pause(0.2, lambda: [
+                ("message", bb_msg), ("state",), self._pause(0.2, self._begin_betting)])])]
+
+    def _post_blind(self, player_id: int, amount: int) -> int:
+        player = self.players[player_id]; blind_amount = min(amount, player.stack)
+        player.stack -= blind_amount; player.current_bet = blind_amount; player.total_bet_this_hand += blind_amount
+        self.pot_ledger.add(player_id, blind_amount, player.stack == 0); player.last_action = "blind"
+        if player.stack == 0: player.status = "all-in"
+        log.info("%s posts blind $%d%s", player.name or f"P{player.id}", blind_amount, " (All-in)" if player.status == 'all-in' else "")
+        return blind_amount
+
+    # --- betting ---
+
+    def _begin_betting(self) -> List[Event]:
+        stage = self.game_stage
+        if stage == "hand_over": return []
+        log.info("--- Starting Betting Round: %s ---", stage.upper())
+        events: List[Event] = []
+        if stage != "preflop":
+            self.current_bet = 0; self.raise_size = self.big_blind; self.last_raiser_id = None; self.actions_this_round = set()
+            for pid in self.active_players_order:
+                if (p := self.players.get(pid)) and p.status != "folded": p.current_bet = 0; p.last_action = None
+            num_in_order = len(self.active_players_order); start_idx = (self.dealer_button_pos + 1) % num_in_order
+            self.current_player_id = next((pid for i in range(num_in_order) if (p := self.players.get(pid := self.active_players_order[(start_idx + i) % num_in_order])) and p.can_act()), None)
+            log.info("Post-flop round (%s) starts with %s", stage, self._name(self.current_player_id) if self.current_player_id else 'None')
+            events.append(("state",))
+        return events + self._continue_round()
+
+    def _continue_round(self) -> List[Event]:
+        """Moves the turn on until someone has to act, or finishes the round (or the hand)."""
+        for _ in range(len(self.active_players_order) + 1):
+            over = self._check_hand_over()
+            if over is not None: return over
+            if self.is_betting_round_complete(): log.info("Betting round %s complete.", self.game_stage); return self._next_street()
+            p = self.players.get(self.current_player_id)
+            if p is None or not p.can_act(): self._advance_turn(); continue
+            return self._request_action()
+        log.error(f"Betting round {self.game_stage}: no player left to act. Ending round.")
+        return self._next_street()
+
+    def _advance_turn(self):
+        order = self.active_players_order
+        if not order: self.current_player_id = None; return
+        start_idx = order.index(self.current_player_id) if self.current_player_id in order else -1
+        original = self.current_player_id
+        self.current_player_id = next((pid for i in range(1, len(order) + 1) if (p := self.players.get(pid := order[(start_idx + i) % len(order)])) and p.can_act()), None)
+        if self.current_player_id is None: log.warning("Advance Turn Warning: No actionable players found in the loop.")
+        else: log.info("Advanced turn from P%s -> P%s ('%s')", original, self.current_player_id, self._name(self.current_player_id))
+
+    def _big_blind_id(self) -> Optional[int]:
+        return self.active_players_order[self.big_blind_pos] if self.big_blind_pos < len(self.active_players_order) else None
+
+    def legal_actions(self, player: Player) -> LegalActions:
+        """The current prompt's LegalActions for `player`, or new ones if the turn moved on since.
+        Betting is only reopened for a player who has not acted since the last full bet or raise:
+        facing just a short all-in, they may call or fold."""
+        legal = self._legal
+        if legal is None or legal.player_id != player.id or legal.serial != self.turn_serial:
+            can_raise = player.id not in self.actions_this_round
+            legal = self._legal = LegalActions(player, self.turn_serial, self.current_bet, self.raise_size, can_raise, self.big_blind)
+        return legal
+
+    def _request_action(self) -> List[Event]:
+        player = self.players[self.current_player_id]; self.turn_serial += 1
+        legal = self.legal_actions(player)
+        log.debug(" P%d Requesting Action. Opts: %s, CallAmt:%d, MinSlider:%d, MaxSlider:%d", player.id, legal.actions, legal.call_amount, legal.min_total, legal.max_total)
+        return [("turn", player.id, legal.to_dict(), self.turn_serial), ("state",)]
+
+    def act(self, player_id: int, action: str, amount: Optional[int] = None) -> List[Event]:
+        """Applies one player's action: invalid ones are answered with an error and a new prompt."""
+        log.debug("HANDLE_ACTION: P%s attempts '%s' %s. Current Actor: P%s, Stage: %s, RoundBet: $%d", player_id, action, f"(${amount})" if amount else "", self.current_player_id, self.game_stage, self.current_bet)
+        if not self.awaiting_action(): log.warning(f"Action '{action}' ignored: not accepting actions (stage {self.game_stage})."); return []
+        if player_id != self.current_player_id:
+            log.warning(f"Action '{action}' ignored: Player {player_id} acted out of turn (Expected P{self.current_player_id})."); return [("error", player_id, "Not your turn.")]
+        player = self.players.get(player_id)
+        if not player: log.error(f"Action '{action}' Error: Player {player_id} (current player) not found!"); return []
+        player_name = player.name or f"P{player.id}"
+        if not player.can_act():
+            log.warning(f"Action '{action}' ignored: {player_name} cannot act (Status: {player.status}, Stack: {player.stack}).")
+            self._advance_turn(); return [("error", player_id, f"Cannot act (Status: {player.status}).")] + self._continue_round()
+        log.info("Processing action: %s - %s %s", player_name, action.upper(), f"${amount}" if amount is not None else "")
+        error_msg = self._apply(player, action, amount)
+        if error_msg: log.info("Invalid action by P%s. Re-requesting action.", player_id); return [("error", player_id, error_msg)] + self._request_action()
+        self.actions_this_round.add(player_id)
+        if self.hand_id: self._record(ACTION, ACTION_CODES[action], player_id, player.current_bet)
+        amount_shown = player.current_bet if action in ("call", "bet", "raise") else None
+        events: List[Event] = [("action", {"playerId": player_id, "action": action, "amount": amount_shown}), ("state",)]
+        return events + self._after_turn()
+
+    def _apply(self, player: Player, action: str, amount: Optional[int]) -> Optional[str]:
+        """Validates a betting action against the turn's LegalActions and applies it. Returns the error message for an invalid one."""
+        player_id = player.id; player_name = player.name or f"P{player.id}"; legal = self.legal_actions(player)
+        if action == "fold": player.status = "folded"; player.hand = []; player.last_action = "fold"; player.last_hand_rank = None; self._legal = None; return None
+        if action == "check":
+            if "check" not in legal.actions: return f"Cannot check. Current bet to match is ${self.current_bet}."
+            player.last_action = "check"; self._legal = None; return None
+        if action == "call":
+            if "call" not in legal.actions: return "Cannot call (already matched bet or nothing to call)."
+            player.stack -= legal.call_amount; player.current_bet += legal.call_amount; player.total_bet_this_hand += legal.call_amount; player.last_action = "call"
+            self.pot_ledger.add(player_id, legal.call_amount, player.stack == 0); self._legal = None
+            if player.stack == 0: player.status = "all-in"; log.info("%s is All-in calling.", player_name)
+            return None
+        if action not in ("bet", "raise"): return f"Unknown action type received: {action}"
+        if amount is None or not isinstance(amount, int) or amount <= 0: return "Invalid bet/raise amount provided."
+        total_bet_intended = amount; bet_increase = total_bet_intended - player.current_bet
+        if bet_increase <= 0: return f"Bet/Raise amount (${total_bet_intended}) must be greater than your current bet (${player.current_bet})."
+        if total_bet_intended > legal.max_total: return f"Insufficient stack ({player.stack}) for bet increase of ${bet_increase} (Total: ${total_bet_intended})."
+        if action not in legal.actions:
+            if action == "bet": return f"Invalid action: Cannot 'bet' when facing a bet (${self.current_bet}). Use 'call' or 'raise'."
+            if self.current_bet == 0: return "Invalid action: Cannot 'raise' when there is no bet to raise. Use 'bet'."
+            return "Invalid action: Betting was not reopened for you (only a short all-in since you acted). Call or fold."
+        if total_bet_intended < legal.min_total: return f"Amount too small. Minimum {action} total is ${legal.min_total}."
+        raised_by = total_bet_intended - self.current_bet
+        player.stack -= bet_increase; player.current_bet = total_bet_intended; player.total_bet_this_hand += bet_increase
+        self.pot_ledger.add(player_id, bet_increase, player.stack == 0); player.last_action = action; self.current_bet = total_bet_intended; self._legal = None
+        # A short all-in raises the bet without reopening the betting, and the next raise is still measured from the last full one.
+        if action == "bet" or raised_by >= self.raise_size:
+            self.raise_size = max(raised_by, self.big_blind); self.last_raiser_id = player_id; self.actions_this_round = {player_id}
+            log.debug(" Action by %s ($%d) reopens betting. Reset actions_this_round.", player_name, total_bet_intended)
+        else: log.debug(" Action by %s ($%d) does not fully reopen betting (MinReq: $%d).", player_name, total_bet_intended, self.current_bet - raised_by + self.raise_size)
+        if player.stack == 0: player.status = "all-in"; log.info("%s is All-in %sing $%d.", player_name, action, total_bet_intended)
+        return None
+
+    def _after_turn(self) -> List[Event]:
+        over = self._check_hand_over()
+        if over is not None: log.info("Hand ended immediately after valid action."); return over
+        if self.is_betting_round_complete(): log.info("Confirmed: Betting round %s ended.", self.game_stage); return self._next_street()
+        self._advance_turn()
+        return self._continue_round()
+
+    def is_betting_round_complete(self) -> bool:
+        # Asked around every action, so this is a single pass over the seats and logs nothing.
+        round_bet = self.current_bet; actors = []
+        for pid in self.active_players_order:
+            p = self.players.get(pid)
+            if p is None or p.status != "active" or p.stack == 0: continue  # folded, all-in or sitting out
+            if p.current_bet < round_bet: return False
+            actors.append(pid)
+        # Everyone else is all-in (or folded) and the last player with chips has matched: nobody left to bet against.
+        if len(actors) <= 1: return True
+        last_aggressor_id = self.last_raiser_id; current_id = self.current_player_id
+        if self.game_stage == "preflop" and current_id is not None and current_id == last_aggressor_id == self._big_blind_id():
+            if (bb := self.players.get(current_id)) and bb.last_action == "blind": return False  # the big blind's option (unless they just left)
+        # An all-in (or folded) aggressor never gets the turn back; then everyone who can still act must have acted since.
+        if last_aggressor_id is not None and (aggressor := self.players.get(last_aggressor_id)) and aggressor.can_act():
+            return current_id == last_aggressor_id
+        return self.actions_this_round.issuperset(actors)
+
+    def player_left(self, player_id: int, was_their_turn: bool) -> List[Event]:
+        """Continues the hand after a player was folded and removed from the table mid-hand."""
+        if self.hand_id: self._record(ACTION, ACTION_CODES["fold"], player_id)
+        over = self._check_hand_over()
+        if over is not None: return over
+        if was_their_turn and self.awaiting_action():
+            log.debug(f"Player disconnected on turn. Checking round end / advancing.")
+            return self._after_turn()
+        return []
+
+    # --- streets and showdown ---
+
+    def _check_hand_over(self) -> Optional[List[Event]]:
+        """Ends the hand if at most one contender is left; returns None if it goes on."""
+        if self.game_stage == "hand_over": return []
+        if sum(1 for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ("active", "all-in")) > 1: return None
+        contenders = [p for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ("active", "all-in")]
+        log.info(f"CHECK_HAND_OVER: Only {len(contenders)} contender(s) remain. Ending hand.")
+        self.game_stage = "hand_over"; self.current_player_id = None; self._next = None
+        pot_amount = self.pot; self.pot_ledger.clear()
+        if not contenders:
+            log.warning(f"Uncontested pot ${pot_amount} awarded, but no contender remains."); payload = [{"playerName": "Unknown Winner", "amount": pot_amount}]
+        else:
+            winner = contenders[0]; winner.stack += pot_amount
+            if self.hand_id: self._record(AWARD, UNCONTESTED_AWARD, winner.id, pot_amount)
+            log.info(f"Uncontested winner P{winner.id} ('{winner.name}') wins ${pot_amount}. New stack: ${winner.stack}")
+            payload = [{"playerId": winner.id, "playerName": winner.name or f"P{winner.id}", "amount": pot_amount}]
+        if self.hand_id: self._end_record(COMPLETED, pot_amount)
+        return [("pot_awarded", {"winners": payload, "isUncontested": True}), ("state",), ("hand_over",)]
+
+    def _next_street(self) -> List[Event]:
+        self.current_player_id = None
+        if self.game_stage == "river":
+            start = time.perf_counter(); events = self._showdown(); SHOWDOWN_SECONDS.observe(time.perf_counter() - start)
+            return events
+        if self.game_stage not in NEXT_STREET: log.error(f"No street follows stage '{self.game_stage}'."); return []
+        next_stage, card_count = NEXT_STREET[self.game_stage]
+        log.info("Dealing %s...", next_stage.upper())
+        if len(self.deck) < card_count + 1:
+            log.error(f"Deck ran out before dealing {next_stage}!"); self.game_stage = "hand_over"
+            if self.hand_id: self._end_record(ABORTED)
+            return [("state",), ("message", "Error: Deck ran out of cards!"), ("hand_over",)]
+        burned = self.deck.pop()
+        if log.isEnabledFor(logging.DEBUG): log.debug("Burned card: %s", ints_to_cards([burned])[0])
+        self.community_cards.extend(self.deck.pop() for _ in range(card_count)); self.game_stage = next_stage
+        if self.hand_id: self._record(BOARD, STREET_CODES[next_stage], cards=self.community_cards[-card_count:])
+        log.info("Community Cards (%s): %s", next_stage, ints_to_cards(self.community_cards))
+        return [("state",), self._pause(0.5, self._after_deal)]
+
+    def _after_deal(self) -> List[Event]:
+        events: List[Event] = []
+        players_can_act = [p for pid in self.active_players_order if (p := self.players.get(pid)) and p.can_act()]
+        if len(players_can_act) <= 1:
+            log.info(f"Only {len(players_can_act)} player(s) can act after {self.game_stage}. Skipping betting round.")
+            hands = {p.id: list(p.hand) for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ["active", "all-in"] and len(p.hand) == 2}
+            if len(hands) >= 2: events.append(("equity", self.game_stage, hands, list(self.community_cards)))
+        return events + self._begin_betting()
+
+    def _showdown(self) -> List[Event]:
+        log.info("-" * 20 + " Performing Showdown " + "-" * 20)
+        self.game_stage = "showdown"; self.current_player_id = None
+        contenders = [p for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ("active", "all-in")]
+        all_hands_data = {p.id: ints_to_cards(p.hand) for p in contenders if p.hand}; hand_ranks_data = {}
+        if not contenders:
+            log.error("Showdown Error: No contenders found!"); self.game_stage = "hand_over"
+            if self.hand_id: self._end_record(ABORTED)
+            return [("state",), ("hand_over",)]
+        pots = self.pot_ledger.pots_for({p.id for p in contenders}); total_pot = self.pot; self.pot_ledger.clear()
+        ranks: Dict[int, Tuple[int, List[int]]] = {}; best_hands: Dict[int, Tuple[str, List[str]]] = {}
+        for p in contenders:
+            if p.hand:
+                start = time.perf_counter(); score, kickers, name, best5 = evaluate_hand(p.hand, self.community_cards); EVALUATE_SECONDS.observe(time.perf_counter() - start)
+                ranks[p.id] = (score, kickers); best_hands[p.id] = (name, best5); hand_ranks_data[p.id] = name; p.last_hand_rank = name
+        # Odd chips of a split pot go one each to the winners nearest the button on its left.
+        order = self.active_players_order; button = self.dealer_button_pos
+        after_button = {pid: (i - button - 1) % len(order) for i, pid in enumerate(order)}
+        player_winnings: Dict[int, int] = defaultdict(int); winners_summary: Dict[int, Dict[str, Any]] = {}
+        for i, (pot_amount, eligible_ids) in enumerate(pots):
+            pot_name = "Main Pot" if i == 0 else f"Side Pot {i}"
+            if not eligible_ids: log.error("%s ($%d) has no eligible player left; it is not awarded.", pot_name, pot_amount); continue
+            best = max(ranks.get(pid, (-1, [])) for pid in eligible_ids)
+            pot_winners = sorted((pid for pid in eligible_ids if ranks.get(pid, (-1, [])) == best), key=after_button.__getitem__)
+            win_each, odd_chips = divmod(pot_amount, len(pot_winners))
+            log.info("Awarding %s ($%d) among %s to %s%s", pot_name, pot_amount, eligible_ids, pot_winners, f"; odd chips: {odd_chips}" if odd_chips else "")
+            for k, pid in enumerate(pot_winners):
+                won = win_each + (k < odd_chips); player_winnings[pid] += won
+                if pid in winners_summary: winners_summary[pid]["amount"] += won
+                else:
+                    name, best5 = best_hands.get(pid, ("", []))
+                    winners_summary[pid] = {"playerId": pid, "playerName": self._name(pid), "amount": won, "handRank": name, "winningHand": best5}
+        for p_id, total_won in player_winnings.items():
+            if total_won > 0 and (player := self.players.get(p_id)):
+                player.stack += total_won; log.info(" Player P%d (%s) wins total $%d. New Stack: $%d", p_id, player.name, total_won, player.stack)
+                if self.hand_id: self._record(AWARD, SHOWDOWN_AWARD, p_id, total_won)
+        if self.hand_id: self._end_record(COMPLETED, total_pot)
+        self.game_stage = "hand_over"; final_winners_summary = list(winners_summary.values())
+        return [("showdown", {"allHands": all_hands_data, "handRanks": hand_ranks_data}), ("state",), self._pause(1.0, lambda: [
+            ("pot_awarded", {"winners": final_winners_summary, "isUncontested": False}), ("state",), ("hand_over",)])]
@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import logging
+import math
+import os
+import random
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from evaluator import evaluate
+
+# Enumerate every runout when at most this many board cards are still to come
+# (C(45, 2) = 990 runouts heads-up on the flop); sample beyond that.
+EXACT_MAX_MISSING = 2
+MONTE_CARLO_SAMPLES = 4000
+
+Tally = List[List[float]]  # per contender: [wins, ties, losses, equity share]
+
+def _tally(hands: Sequence[Sequence[int]], board: Sequence[int], runouts: Iterable[Sequence[int]]) -> Tally:
+    counts = [[0, 0, 0, 0.0] for _ in hands]
+    for runout in runouts:
+        full_board = list(board) + list(runout)
+        strengths = [evaluate(list(h) + full_board) for h in hands]
+        best = max(strengths); winners = strengths.count(best)
+        for c, s in zip(counts, strengths):
+            if s != best: c[2] += 1
+            elif winners == 1: c[0] += 1; c[3] += 1.0
+            else: c[1] += 1; c[3] += 1.0 / winners
+    return counts
+
+def _enumerate_chunk(hands, board, deck, missing: int, start: int, stop: int) -> Tally:
+    return _tally(hands, board, itertools.islice(itertools.combinations(deck, missing), start, stop))
+
+def _sample_chunk(hands, board, deck, missing: int, seed: int, samples: int) -> Tally:
+    rng = random.Random(seed)
+    return _tally(hands, board, (rng.sample(deck, missing) for _ in range(samples)))
+
+def _merge(tallies: Iterable[Tally], num_hands: int) -> Tally:
+    total = [[0, 0, 0, 0.0] for _ in range(num_hands)]
+    for tally in tallies:
+        for acc, part in zip(total, tally):
+            for i in range(4): acc[i] += part[i]
+    return total
+
+def _plan(hands: Dict[int, List[int]], board: Sequence[int], dead: Sequence[int], samples: int,
+          seed: Optional[int], chunks: int) -> Tuple[list, list]:
+    """Splits one equity job into `chunks` argument tuples for the worker functions."""
+    used = set(board) | set(dead)
+    for h in hands.values(): used.update(h)
+    deck = [c for c in range(52) if c not in used]
+    missing = 5 - len(board)
+    hand_list = [list(h) for h in hands.values()]
+    if missing <= EXACT_MAX_MISSING:
+        total = math.comb(len(deck), missing); step = -(-total // chunks)
+        return [(_enumerate_chunk, (hand_list, list(board), deck, missing, i, min(i + step, total))) for i in range(0, total, step)], hand_list
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    per_chunk = -(-samples // chunks)
+    jobs = []
+    for i in range(chunks):
+        n = min(per_chunk, samples - i * per_chunk)
+        if n > 0: jobs.append((_sample_chunk, (hand_list, list(board), deck, missing, seed * 1_000_003 + i, n)))
+    return jobs, hand_list
+
+def _results(hands: Dict[int, List[int]], total: Tally) -> Dict[int, Dict[str, float]]:
+    results = {}
+    for pid, (wins, ties, losses, share) in zip(hands.keys(), total):
+        runouts = wins + ties + losses or 1
+        results[pid] = {"win": wins / runouts, "tie": ties / runouts, "lose": losses / runouts, "equity": share / runouts}
+    return results
+
+def calculate_equity(hands: Dict[int, List[int]], board: Sequence[int], dead: Sequence[int] = (),
+                     samples: int = MONTE_CARLO_SAMPLES, seed: Optional[int] = None) -> Dict[int, Dict[str, float]]:
+    """Win/tie/lose probabilities per contender, computed in-process.
+
+    `hands` maps player ID -> two integer hole cards; `board` holds 0 to 5 community cards and
+    `dead` any other cards known to be out of the deck. Runouts are enumerated exactly when
+    at most EXACT_MAX_MISSING board cards remain, otherwise `samples` are drawn with `seed`.
+    """
+    jobs, hand_list = _plan(hands, board, dead, samples, seed, 1)
+    return _results(hands, _merge((fn(*args) for fn, args in jobs), len(hand_list)))
+
+def _init_pool_process():
+    # The parent owns shutdown: pool processes ignore Ctrl+C and die quietly on SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN); signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+class EquityEngine:
+    """Runs equity jobs on a process pool so the asyncio loop never blocks on them."""
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_pool_process)
+            # Spin the workers up now so the first all-in doesn't pay for process start-up.
+            for _ in range(self.max_workers): self._executor.submit(_tally, [], [], [])
+            logging.info(f"Equity engine started with {self.max_workers} worker process(es).")
+
+    async def calculate(self, hands: Dict[int, List[int]], board: Sequence[int], dead: Sequence[int] = (),
+                        samples: int = MONTE_CARLO_SAMPLES, seed: Optional[int] = None) -> Dict[int, Dict[str, float]]:
+        self.start()
+        loop = asyncio.get_running_loop()
+        jobs, hand_list = _plan(hands, board, dead, samples, seed, self.max_workers)
+        tallies = await asyncio.gather(*(loop.run_in_executor(self._executor, fn, *args) for fn, args in jobs))
+        return _results(hands, _merge(tallies, len(hand_list)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True); self._executor = None
@@ -0,0 +1,252 @@
+import itertools
+import logging
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from cards import RANKS, get_rank_value, int_to_card
+
+try:
+    import numpy as np
+except ImportError:  # evaluate_many is optional; everything else is pure Python
+    np = None
+
+# A hand strength is one int: the category score (1 = High Card .. 9 = Straight Flush)
+# followed by five 4-bit kicker ranks. Comparing strengths gives exactly the same
+# ordering as comparing the legacy (score, kickers) tuples, because every category
+# always carries the same number of kickers.
+KICKER_COUNTS = {9: 1, 8: 2, 7: 2, 6: 5, 5: 1, 4: 3, 3: 3, 2: 4, 1: 5}
+# Cards taken per kicker rank when picking the best five for display.
+GROUP_SIZES = {8: (4, 1), 7: (3, 2), 4: (3, 1, 1), 3: (2, 2, 1), 2: (2, 1, 1, 1), 1: (1, 1, 1, 1, 1)}
+WHEEL_MASK = (1 << 12) | 0b1111
+
+def make_strength(score: int, kickers: Sequence[int]) -> int:
+    value = score
+    for i in range(5): value = (value << 4) | (kickers[i] if i < len(kickers) else 0)
+    return value
+
+def strength_to_score(strength: int) -> Tuple[int, List[int]]:
+    score = strength >> 20
+    kickers = [(strength >> (16 - 4 * i)) & 0xF for i in range(KICKER_COUNTS.get(score, 0))]
+    return score, kickers
+
+def _straight_top(mask: int) -> int:
+    for top in range(12, 3, -1):
+        window = 0b11111 << (top - 4)
+        if mask & window == window: return top
+    if mask & WHEEL_MASK == WHEEL_MASK: return 3
+    return -1
+
+def _best_rank_strength(counts: Sequence[int]) -> int:
+    """Best non-flush hand for a multiset of ranks (counts[r] cards of rank r)."""
+    present = [r for r in range(12, -1, -1) if counts[r]]
+    quads = [r for r in present if counts[r] == 4]
+    trips = [r for r in present if counts[r] == 3]
+    pairs = [r for r in present if counts[r] == 2]
+    if quads:
+        q = quads[0]
+        return make_strength(8, [q, next(r for r in present if r != q)])
+    if trips and (len(trips) >= 2 or pairs):
+        return make_strength(7, [trips[0], max(trips[1:] + pairs)])
+    mask = 0
+    for r in present: mask |= 1 << r
+    top = _straight_top(mask)
+    if top >= 0: return make_strength(5, [top])
+    if trips:
+        t = trips[0]
+        return make_strength(4, [t] + [r for r in present if r != t][:2])
+    if len(pairs) >= 2:
+        hi, lo = pairs[0], pairs[1]
+        return make_strength(3, [hi, lo, next(r for r in present if r != hi and r != lo)])
+    if pairs:
+        p = pairs[0]
+        return make_strength(2, [p] + [r for r in present if r != p][:3])
+    return make_strength(1, present[:5])
+
+def _best_flush_strength(mask: int) -> int:
+    top = _straight_top(mask)
+    if top >= 0: return make_strength(9, [top])
+    return make_strength(6, [r for r in range(12, -1, -1) if mask >> r & 1][:5])
+
+def _build_tables():
+    # Rank multisets hash to the sum of 5**rank per card: counts never exceed 4, so the
+    # sum is the base-5 representation of the count vector and is collision free.
+    rank_table: Dict[int, int] = {}
+    counts = [0] * 13
+    def fill(rank: int, remaining: int, key: int):
+        if rank == 13:
+            if sum(counts) >= 5: rank_table[key] = _best_rank_strength(counts)
+            return
+        for n in range(min(4, remaining) + 1):
+            counts[rank] = n
+            fill(rank + 1, remaining - n, key + n * 5 ** rank)
+        counts[rank] = 0
+    fill(0, 7, 0)
+    flush_table = [0] * (1 << 13)
+    for mask in range(1 << 13):
+        if bin(mask).count("1") >= 5: flush_table[mask] = _best_flush_strength(mask)
+    # Suit counts are packed one nibble per suit; the table maps a packed sum to
+    # (flush suit + 1), or 0 when no suit has five cards.
+    flush_suit = bytearray(1 << 16)
+    for packed in range(1 << 16):
+        for suit in range(4):
+            if (packed >> (4 * suit)) & 0xF >= 5: flush_suit[packed] = suit + 1; break
+    return rank_table, flush_table, bytes(flush_suit)
+
+RANK_KEYS = [5 ** (card >> 2) for card in range(52)]
+SUIT_KEYS = [1 << (4 * (card & 3)) for card in range(52)]
+RANK_TABLE, FLUSH_TABLE, FLUSH_SUIT = _build_tables()
+
+def evaluate(cards: Sequence[int]) -> int:
+    """Strength of the best five-card hand among 5 to 7 integer cards."""
+    key = 0; suits = 0
+    for c in cards: key += RANK_KEYS[c]; suits += SUIT_KEYS[c]
+    strength = RANK_TABLE[key]
+    flush = FLUSH_SUIT[suits]
+    if flush:
+        suit = flush - 1; mask = 0
+        for c in cards:
+            if c & 3 == suit: mask |= 1 << (c >> 2)
+        flush_strength = FLUSH_TABLE[mask]
+        if flush_strength > strength: strength = flush_strength
+    return strength
+
+_np_tables = None
+
+def _numpy_tables():
+    global _np_tables
+    if _np_tables is None:
+        keys = np.fromiter(RANK_TABLE.keys(), dtype=np.int64, count=len(RANK_TABLE))
+        values = np.fromiter(RANK_TABLE.values(), dtype=np.int64, count=len(RANK_TABLE))
+        order = np.argsort(keys)
+        _np_tables = (np.array(RANK_KEYS, dtype=np.int64), np.array(SUIT_KEYS, dtype=np.int64),
+                      keys[order], values[order], np.array(FLUSH_TABLE, dtype=np.int64),
+                      np.frombuffer(FLUSH_SUIT, dtype=np.uint8))
+    return _np_tables
+
+def evaluate_many(hands, boards):
+    """Vectorized `evaluate` over integer-encoded NumPy arrays.
+
+    `hands` is an (N, 2) array of hole cards and `boards` either an (N, K) array or a
+    single (K,) board shared by every hand, with 3 <= K <= 5. Returns an int64 array of
+    N strengths that order exactly like `evaluate` (and the legacy score/kickers tuples).
+    """
+    if np is None: raise ImportError("evaluate_many requires NumPy (pip install numpy).")
+    rank_keys, suit_keys, sorted_keys, sorted_values, flush_table, flush_suit = _numpy_tables()
+    hands = np.asarray(hands, dtype=np.int64); boards = np.asarray(boards, dtype=np.int64)
+    if hands.ndim != 2: raise ValueError(f"hands must be an (N, 2) array, got shape {hands.shape}")
+    if boards.ndim == 1: boards = np.broadcast_to(boards, (hands.shape[0], boards.shape[0]))
+    if boards.shape[0] != hands.shape[0]: raise ValueError(f"Got {hands.shape[0]} hands but {boards.shape[0]} boards.")
+    cards = np.concatenate((hands, boards), axis=1)
+    if cards.shape[1] < 5 or cards.shape[1] > 7: raise ValueError(f"Need 5 to 7 cards per hand, got {cards.shape[1]}.")
+    strengths = sorted_values[np.searchsorted(sorted_keys, rank_keys[cards].sum(axis=1))]
+    flush = flush_suit[suit_keys[cards].sum(axis=1)]
+    rows = np.flatnonzero(flush)
+    if rows.size:
+        flush_cards = cards[rows]; suit = flush[rows].astype(np.int64)[:, None] - 1
+        bits = np.where((flush_cards & 3) == suit, np.left_shift(1, flush_cards >> 2), 0)
+        strengths[rows] = np.maximum(strengths[rows], flush_table[np.bitwise_or.reduce(bits, axis=1)])
+    return strengths
+
+def best_five(cards: Sequence[int], strength: int) -> List[int]:
+    """Picks the five cards that make up `strength`, highest rank first."""
+    score, kickers = strength_to_score(strength)
+    picked: List[int] = []
+    if score in (9, 6, 5):
+        pool = list(cards)
+        if score != 5:
+            suit_counts = Counter(c & 3 for c in cards)
+            flush_suit = max(suit_counts, key=suit_counts.get)
+            pool = [c for c in cards if c & 3 == flush_suit]
+        if score == 6: ranks = kickers
+        else: ranks = [3, 2, 1, 0, 12] if kickers[0] == 3 else list(range(kickers[0], kickers[0] - 5, -1))
+        for r in ranks: picked.append(next(c for c in pool if c >> 2 == r))
+    else:
+        for r, size in zip(kickers, GROUP_SIZES[score]):
+            picked.extend([c for c in cards if c >> 2 == r][:size])
+    return sorted(picked, key=lambda c: c >> 2, reverse=True)
+
+def hand_name(strength: int) -> str:
+    score, kickers = strength_to_score(strength)
+    if score == 9: return "Royal Flush" if kickers[0] == 12 else f"{RANKS[kickers[0]]}-high Straight Flush"
+    if score == 8: return f"Four of a Kind, {RANKS[kickers[0]]}s"
+    if score == 7: return f"Full House, {RANKS[kickers[0]]}s full of {RANKS[kickers[1]]}s"
+    if score == 6: return f"{RANKS[kickers[0]]}-high Flush"
+    if score == 5: return f"{RANKS[kickers[0]]}-high Straight"
+    if score == 4: return f"Three of a Kind, {RANKS[kickers[0]]}s"
+    if score == 3: return f"Two Pair, {RANKS[kickers[0]]}s & {RANKS[kickers[1]]}s"
+    if score == 2: return f"Pair of {RANKS[kickers[0]]}s"
+    if score == 1: return f"{RANKS[kickers[0]]}-High"
+    return "Invalid Hand"
+
+def describe_hand(cards: Sequence[int]) -> Tuple[int, List[int], str, List[str]]:
+    """Legacy (score, kickers, name, best5) tuple for 5 to 7 integer cards."""
+    strength = evaluate(cards)
+    score, kickers = strength_to_score(strength)
+    return (score, kickers, hand_name(strength), [int_to_card(c) for c in best_five(cards, strength)])
+
+def legacy_evaluate_hand(hand: List[str], community_cards: List[str]) -> Tuple[int, List[int], str, List[str]]:
+    """The original combinatorial evaluator, kept as the reference for benchmarks and parity checks."""
+    all_cards = hand + community_cards
+    if not all_cards or len(all_cards) < 5: return (0, [], "Invalid Hand (<5 cards)", [])
+    best_score = (-1, [], "Invalid Hand", [])
+    for combo_tuple in itertools.combinations(all_cards, 5):
+        combo = list(combo_tuple)
+        valid_combo = [c for c in combo if isinstance(c, str) and len(c) >= 1]
+        if len(valid_combo) != 5: continue
+        ranks = sorted([get_rank_value(c[0]) for c in valid_combo], reverse=True)
+        suits = [c[1] for c in valid_combo if len(c) >= 2]
+        if len(suits) != 5: continue
+        is_flush = len(set(suits)) == 1
+        is_straight = all(ranks[i] == ranks[0] - i for i in range(5))
+        ace_low_ranks = [12, 3, 2, 1, 0]
+        is_ace_low_straight = (ranks == ace_low_ranks)
+        if not is_straight and is_ace_low_straight:
+            is_straight = True
+            ranks_for_kicker = [3, 2, 1, 0, -1]
+        else:
+            ranks_for_kicker = ranks
+        is_sf = is_straight and is_flush
+        rank_counts = Counter(ranks); counts = sorted(rank_counts.values(), reverse=True)
+        primary_kickers = sorted(rank_counts.keys(), key=lambda r: (rank_counts[r], r), reverse=True)
+        current_score = (-1, [], "Unknown", [])
+        if is_sf: current_score = (9, [ranks_for_kicker[0]], "Straight Flush", combo)
+        elif counts[0] == 4: current_score = (8, primary_kickers, "Four of a Kind", combo)
+        elif counts == [3, 2]: current_score = (7, primary_kickers, "Full House", combo)
+        elif is_flush: current_score = (6, ranks, "Flush", combo)
+        elif is_straight: current_score = (5, [ranks_for_kicker[0]], "Straight", combo)
+        elif counts[0] == 3: current_score = (4, primary_kickers, "Three of a Kind", combo)
+        elif counts == [2, 2, 1]: current_score = (3, primary_kickers, "Two Pair", combo)
+        elif counts[0] == 2: current_score = (2, primary_kickers, "One Pair", combo)
+        else: current_score = (1, ranks, "High Card", combo)
+        if current_score[0] > best_score[0] or \
+           (current_score[0] == best_score[0] and current_score[1] > best_score[1]):
+            best_5_display = sorted(combo, key=lambda c: get_rank_value(c[0]), reverse=True)
+            best_score = (current_score[0], current_score[1], current_score[2], best_5_display)
+    if best_score[0] == -1:
+        valid_all = [c for c in all_cards if isinstance(c, str) and len(c) >= 1]
+        if not valid_all: return (0, [], "Invalid Hand", [])
+        ranks = sorted([get_rank_value(c[0]) for c in valid_all], reverse=True)
+        best_5 = sorted(valid_all, key=lambda c: get_rank_value(c[0]), reverse=True)[:5]
+        return (1, ranks[:5], "High Card (Fallback)", best_5)
+    final_name = best_score[2]
+    try:
+        score_val = best_score[0]; kickers = best_score[1]; best_5_cards = best_score[3]
+        if score_val == 9 and kickers:
+            high_rank_idx = kickers[0]; high_rank_char = RANKS[high_rank_idx] if high_rank_idx >= 0 else '5'
+            final_name = f"{high_rank_char}-high Straight Flush"
+            sf_ranks_set = {get_rank_value(c[0]) for c in best_5_cards}
+            if sf_ranks_set == {12, 11, 10, 9, 8}: final_name = "Royal Flush"
+        elif score_val == 8 and len(kickers) >= 1: final_name = f"Four of a Kind, {RANKS[kickers[0]]}s"
+        elif score_val == 7 and len(kickers) >= 2: final_name = f"Full House, {RANKS[kickers[0]]}s full of {RANKS[kickers[1]]}s"
+        elif score_val == 6 and kickers: final_name = f"{RANKS[kickers[0]]}-high Flush"
+        elif score_val == 5 and kickers:
+            high_rank_idx = kickers[0]; high_rank_char = RANKS[high_rank_idx] if high_rank_idx >= 0 else '5'
+            final_name = f"{high_rank_char}-high Straight"
+        elif score_val == 4 and len(kickers) >= 1: final_name = f"Three of a Kind, {RANKS[kickers[0]]}s"
+        elif score_val == 3 and len(kickers) >= 2: final_name = f"Two Pair, {RANKS[kickers[0]]}s & {RANKS[kickers[1]]}s"
+        elif score_val == 2 and len(kickers) >= 1: final_name = f"Pair of {RANKS[kickers[0]]}s"
+        elif score_val == 1 and kickers: final_name = f"{RANKS[kickers[0]]}-High"
+    except IndexError:
+        logging.error(f"Error refining hand name for score: {best_score}", exc_info=True)
+        final_name = best_score[2]
+    return (best_score[0], best_score[1], final_name, best_score[3])
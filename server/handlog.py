@@ -0,0 +1,190 @@
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict, namedtuple
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from cards import CARD_STRINGS
+
+# Every record is RECORD.size (48) bytes, little-endian:
+#   kind, code, card count, pad | table ID | hand ID | player ID | amount | time (µs since the epoch) | 16 data bytes
+# `data` holds the record's cards as integers (rank * 4 + suit), for SEAT followed by the player's name.
+RECORD = struct.Struct("<BBBxIQIiq16s")
+HEADER = b"PKRHLOG1"  # file magic; records start right after it
+
+HAND_START, SEAT, BLIND, ACTION, BOARD, AWARD, HAND_END = range(1, 8)
+KIND_NAMES = {HAND_START: "start", SEAT: "seat", BLIND: "blind", ACTION: "action", BOARD: "board", AWARD: "award", HAND_END: "end"}
+ACTION_CODES = {"fold": 1, "check": 2, "call": 3, "bet": 4, "raise": 5}
+ACTION_NAMES = {code: name for name, code in ACTION_CODES.items()}
+STREET_CODES = {"flop": 1, "turn": 2, "river": 3}
+SMALL_BLIND_CODE, BIG_BLIND_CODE = 1, 2
+SHOWDOWN_AWARD, UNCONTESTED_AWARD = 0, 1
+COMPLETED, ABORTED = 0, 1  # HAND_END codes
+
+FLUSH_INTERVAL = 0.5  # seconds between background flushes
+FLUSH_BYTES = 1 << 20  # or sooner, once this much is buffered
+SCAN_BLOCK = 4096  # records read at a time when looking back for the last hand ID
+SEAT_NAME_BYTES = 14  # a SEAT record holds the first 14 bytes of the player's name, after the 2 hole cards
+
+HandRecord = namedtuple("HandRecord", "kind code ncards table_id hand_id player_id amount time_us data")
+
+def pack_cards(cards: Sequence[int]) -> bytes:
+    return bytes(cards)
+
+class HandLog:
+    """Append-only hand history file. record() packs a fixed-size record into an in-memory
+    buffer, so callers on the event loop never touch the disk; a background thread writes the
+    buffer out every FLUSH_INTERVAL seconds. Hand IDs continue from the highest one in the file.
+    """
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path; self.flush_interval = flush_interval
+        self._buffer = bytearray(); self._lock = threading.Lock(); self._wake = threading.Event(); self._closed = False
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file and (os.path.getsize(path) - len(HEADER)) % RECORD.size:
+            os.truncate(path, os.path.getsize(path) - (os.path.getsize(path) - len(HEADER)) % RECORD.size)  # drop a record cut short by a crash
+        self.next_hand_id = 1 if new_file else _max_hand_id(path) + 1
+        self._file = open(path, "ab")
+        if new_file: self._file.write(HEADER); self._file.flush()
+        self.records = 0
+        self._thread = threading.Thread(target=self._flush_loop, name="hand-log", daemon=True); self._thread.start()
+
+    def new_hand(self) -> int:
+        hand_id = self.next_hand_id; self.next_hand_id += 1
+        return hand_id
+
+    def record(self, kind: int, code: int, table_id: int, hand_id: int, player_id: int = 0, amount: int = 0, cards: Sequence[int] = (), extra: bytes = b""):
+        packed = RECORD.pack(kind, code, len(cards), table_id, hand_id, player_id, amount, int(time.time() * 1_000_000), pack_cards(cards) + extra)
+        with self._lock: self._buffer += packed
+        self.records += 1
+        if len(self._buffer) >= FLUSH_BYTES: self._wake.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval); self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock: data, self._buffer = self._buffer, bytearray()
+        if data: self._file.write(data); self._file.flush()
+
+    def close(self):
+        if self._closed: return
+        self._closed = True; self._wake.set(); self._thread.join()
+        self.flush(); self._file.close()
+
+def _max_hand_id(path: str) -> int:
+    # Hand IDs are handed out as hands start, so the largest is the last HAND_START's (not the last record's:
+    # hands of several tables interleave and end in any order). Reading back from the end in blocks stops at
+    # it, so startup does not grow with the history.
+    end = (os.path.getsize(path) - len(HEADER)) // RECORD.size
+    with open(path, "rb") as f:
+        while end > 0:
+            start = max(0, end - SCAN_BLOCK); f.seek(len(HEADER) + start * RECORD.size)
+            for fields in reversed(list(RECORD.iter_unpack(f.read((end - start) * RECORD.size)))):
+                if fields[0] == HAND_START: return fields[4]
+            end = start
+    return 0
+
+class HandLogReader:
+    """Memory-maps a hand log for replay. Iterating yields HandRecords; index() builds the
+    hand, table, player and time indexes once, on first use of the lookups."""
+    def __init__(self, path: str):
+        self._file = open(path, "rb"); size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if size and self._map[:len(HEADER)] != HEADER: self.close(); raise ValueError(f"{path} is not a hand log")
+        self.count = max(0, (size - len(HEADER)) // RECORD.size)  # a trailing partial record is ignored
+        self._starts: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[HandRecord]:
+        if not self.count: return iter(())
+        view = memoryview(self._map)[len(HEADER):len(HEADER) + self.count * RECORD.size]
+        return (HandRecord(*fields) for fields in RECORD.iter_unpack(view))
+
+    def record_at(self, index: int) -> HandRecord:
+        return HandRecord(*RECORD.unpack_from(self._map, len(HEADER) + index * RECORD.size))
+
+    def index(self):
+        if self._starts is not None: return
+        self._starts = {}; self._by_table: Dict[int, List[int]] = defaultdict(list); self._by_player: Dict[bytes, List[int]] = defaultdict(list)
+        self._times: List[int] = []; self._time_hands: List[int] = []
+        for i, r in enumerate(self):
+            if r.kind == HAND_START:
+                self._starts[r.hand_id] = i; self._by_table[r.table_id].append(r.hand_id)
+                self._times.append(r.time_us); self._time_hands.append(r.hand_id)
+            elif r.kind == SEAT: self._by_player[r.data[r.ncards:].rstrip(bytes(1))].append(r.hand_id)
+
+    def hand(self, hand_id: int) -> List[HandRecord]:
+        """All records of one hand, in order. Hands of other tables may be interleaved in the file; they are skipped."""
+        self.index(); i = self._starts.get(hand_id)
+        if i is None: return []
+        records = []
+        for j in range(i, self.count):
+            r = self.record_at(j)
+            if r.hand_id != hand_id: continue
+            records.append(r)
+            if r.kind == HAND_END: break
+        return records
+
+    def hand_ids(self) -> List[int]:
+        """Every hand in the file, in the order they started."""
+        self.index(); return list(self._time_hands)
+
+    def hands_for_table(self, table_id: int) -> List[int]:
+        self.index(); return list(self._by_table.get(table_id, []))
+
+    def hands_for_player(self, name: str) -> List[int]:
+        """Hands the player was dealt into, at any table and across restarts. Looked up by name, as
+        player IDs are per table and per run; names are matched on the SEAT_NAME_BYTES the log keeps."""
+        self.index(); return list(self._by_player.get(name.encode()[:SEAT_NAME_BYTES], []))
+
+    def hands_between(self, start: float, end: float) -> List[int]:
+        """Hands started between two Unix times. Records are appended in time order, so this is a bisection."""
+        self.index()
+        return self._time_hands[bisect.bisect_left(self._times, int(start * 1_000_000)):bisect.bisect_right(self._times, int(end * 1_000_000))]
+
+    def close(self):
+        if self._map is not None: self._map.close(); self._map = None
+        self._file.close()
+
+def cards_of(record: HandRecord) -> List[str]:
+    return [CARD_STRINGS[c] for c in record.data[:record.ncards]]
+
+def describe(record: HandRecord) -> str:
+    """One readable line per record, for disputes and eyeballing."""
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.time_us / 1_000_000))
+    if record.kind == HAND_START: text = f"hand {record.hand_id} at table {record.table_id}: {record.code} players, dealer P{record.player_id}, big blind {record.amount}"
+    elif record.kind == SEAT: text = f"P{record.player_id} {record.data[record.ncards:].rstrip(bytes(1)).decode('utf-8', 'replace')!r} stack {record.amount} holds {' '.join(cards_of(record))}"
+    elif record.kind == BLIND: text = f"P{record.player_id} posts {'small' if record.code == SMALL_BLIND_CODE else 'big'} blind {record.amount}"
+    elif record.kind == ACTION: text = f"P{record.player_id} {ACTION_NAMES.get(record.code, '?')}" + (f" (bet now {record.amount})" if record.code >= ACTION_CODES["call"] else "")
+    elif record.kind == BOARD: text = f"board: {' '.join(cards_of(record))}"
+    elif record.kind == AWARD: text = f"P{record.player_id} wins {record.amount}" + (" uncontested" if record.code == UNCONTESTED_AWARD else "")
+    elif record.kind == HAND_END: text = "hand aborted" if record.code == ABORTED else f"hand over, pot {record.amount}"
+    else: text = f"unknown record kind {record.kind}"
+    return f"{stamp} {text}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Print hands from a binary hand log.")
+    parser.add_argument("path")
+    parser.add_argument("--table", type=int); parser.add_argument("--player", help="Player name.")
+    parser.add_argument("--hand", type=int); parser.add_argument("--last", type=int, default=10, help="How many of the matching hands to print.")
+    args = parser.parse_args()
+    reader = HandLogReader(args.path)
+    if args.hand is not None: hand_ids = [args.hand]
+    elif args.player is not None: hand_ids = reader.hands_for_player(args.player)
+    elif args.table is not None: hand_ids = reader.hands_for_table(args.table)
+    else: hand_ids = reader.hand_ids()
+    print(f"{len(reader):,} records, {len(hand_ids):,} matching hands")
+    for hand_id in hand_ids[-args.last:]:
+        for r in reader.hand(hand_id): print(describe(r))
+        print()
+    reader.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import os
+import random
+import ssl
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+from codec import CODECS, JSON
+
+try:
+    import resource
+except ImportError:  # not on Windows; the open-file limit is left alone there
+    resource = None
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class LoadClient:
+    """One simulated player: joins whatever table the server seats it at, names itself and
+    answers its player_turn prompts with a random legal action, timing how long each action
+    takes to come back as the table's player_action broadcast."""
+    def __init__(self, index: int, codec, rng: random.Random, stats: Dict[str, Any]):
+        self.index = index; self.codec = codec; self.rng = rng; self.stats = stats
+        self.player_id: Optional[int] = None
+        self.sent_at: Optional[float] = None  # when our pending action went out
+
+    def choose(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        actions = payload["actions"]; roll = self.rng.random()
+        if roll < 0.15:
+            for action in ("raise", "bet"):
+                if action in actions: return {"action": action, "amount": self.rng.randint(payload["minRaise"], min(payload["maxRaise"], payload["minRaise"] * 3))}
+        if roll > 0.95 and "fold" in actions and "check" not in actions: return {"action": "fold"}
+        return {"action": "check" if "check" in actions else "call"}
+
+    async def run(self, url: str, ssl_context, subprotocols, stop: asyncio.Event):
+        stats = self.stats
+        try: ws = await websockets.connect(url, ssl=ssl_context, subprotocols=subprotocols, open_timeout=30, max_queue=None)
+        except Exception as e: stats["failed"] += 1; stats["failures"].setdefault(type(e).__name__, 0); stats["failures"][type(e).__name__] += 1; return
+        stats["connected"] += 1
+        try:
+            await ws.send(self.codec.encode("set_name", {"name": f"load{self.index}"}))
+            while not stop.is_set():
+                frame = await ws.recv()
+                now = time.perf_counter(); messages = self.codec.decode_frame(frame)
+                stats["frames"] += 1; stats["bytes"] += len(frame); stats["messages"] += len(messages)
+                for msg in messages:
+                    msg_type, payload = msg["type"], msg["payload"]
+                    if msg_type == "assign_id": self.player_id = payload["playerId"]
+                    elif msg_type == "player_action" and payload.get("playerId") == self.player_id and self.sent_at is not None:
+                        stats["latencies"].append(now - self.sent_at); self.sent_at = None
+                    elif msg_type == "error": stats["errors"] += 1; self.sent_at = None
+                    elif msg_type == "player_turn" and payload["playerId"] == self.player_id:
+                        self.sent_at = time.perf_counter(); stats["actions"] += 1
+                        await ws.send(self.codec.encode("player_action", self.choose(payload)))
+        except websockets.exceptions.ConnectionClosed: stats["dropped"] += 1
+        finally: await ws.close()
+
+def _process_tree(pid: int) -> List[int]:
+    """`pid` and its descendants (a multi-worker server is a supervisor plus its workers)."""
+    pids = [pid]
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/task/{p}/children") as f: pids.extend(int(c) for c in f.read().split())
+        except OSError: pass
+    return pids
+
+def server_usage(pid: Optional[int]) -> Optional[Dict[str, float]]:
+    """CPU seconds and resident memory of the server process tree, from /proc (Linux only)."""
+    if pid is None or not os.path.exists(f"/proc/{pid}"): return None
+    cpu = 0.0; rss = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f: fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+            with open(f"/proc/{p}/status") as f: rss += next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration): pass
+    return {"cpu": cpu, "rss": rss}
+
+def _raise_open_file_limit(needed: int):
+    if resource is None: return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed: resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard) if hard != resource.RLIM_INFINITY else needed, hard))
+
+async def run(args):
+    codec = CODECS["poker.msgpack"] if args.msgpack else JSON
+    subprotocols = ["poker.msgpack"] if args.msgpack else None
+    ssl_context = None
+    if args.url.startswith("wss"):
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT); ssl_context.check_hostname = False; ssl_context.verify_mode = ssl.CERT_NONE
+    stats: Dict[str, Any] = {"connected": 0, "failed": 0, "dropped": 0, "failures": {}, "frames": 0, "messages": 0, "bytes": 0, "actions": 0, "errors": 0, "latencies": []}
+    stop = asyncio.Event(); rng = random.Random(args.seed)
+    baseline = server_usage(args.server_pid)
+    start = time.perf_counter(); tasks = []
+    for i in range(args.connections):
+        tasks.append(asyncio.create_task(LoadClient(i, codec, random.Random(rng.getrandbits(64)), stats).run(args.url, ssl_context, subprotocols, stop)))
+        if args.ramp: await asyncio.sleep(1 / args.ramp)
+    while stats["connected"] + stats["failed"] < args.connections and time.perf_counter() - start < 60: await asyncio.sleep(0.1)
+    print(f"{stats['connected']:,} of {args.connections:,} connections open after {time.perf_counter() - start:.1f} s"
+          + (f" ({stats['failed']:,} failed: {stats['failures']})" if stats["failed"] else ""))
+    # Measure over a window that starts once everyone is connected.
+    await asyncio.sleep(min(args.warmup, args.seconds))
+    for key in ("frames", "messages", "bytes", "actions", "errors"): stats[key] = 0
+    stats["latencies"] = []; before = server_usage(args.server_pid); window_start = time.perf_counter()
+    await asyncio.sleep(args.seconds)
+    elapsed = time.perf_counter() - window_start; after = server_usage(args.server_pid)
+    window = {k: stats[k] for k in ("frames", "messages", "bytes", "actions", "errors")}; ms = [l * 1000 for l in stats["latencies"]]
+    stop.set()
+    for task in tasks: task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"{'messages received':<28} {window['messages'] / elapsed:>12,.0f} /sec  ({window['frames'] / elapsed:,.0f} frames/sec, {window['bytes'] / elapsed / 1024:,.0f} KB/sec)")
+    print(f"{'actions':<28} {window['actions'] / elapsed:>12,.0f} /sec  ({window['errors']:,} errors, {stats['dropped']:,} connections dropped)")
+    print(f"{'action -> broadcast latency':<28} p50 {_percentile(ms, 50):.2f} ms  p90 {_percentile(ms, 90):.2f} ms  "
+          f"p99 {_percentile(ms, 99):.2f} ms  max {max(ms, default=0):.2f} ms")
+    if before and after and baseline:
+        per_connection = (after["rss"] - baseline["rss"]) / max(stats["connected"], 1)
+        print(f"{'server CPU':<28} {(after['cpu'] - before['cpu']) / elapsed * 100:>11.1f} %  of one core")
+        print(f"{'server memory':<28} {after['rss'] / 2 ** 20:>11.1f} MB  ({per_connection / 1024:,.1f} KB per connection)")
+    elif args.server_pid: print(f"Server process {args.server_pid} not found under /proc; no CPU/memory figures.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Opens many bot connections against a running poker server and measures it.")
+    parser.add_argument("--url", default="wss://127.0.0.1:8765")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the measured window.")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds to let tables start before measuring.")
+    parser.add_argument("--ramp", type=float, default=500.0, help="New connections per second (0 = all at once).")
+    parser.add_argument("--msgpack", action="store_true", help="Speak the poker.msgpack subprotocol instead of JSON.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-pid", type=int, help="PID of the server, for its CPU and memory use (Linux).")
+    parser.add_argument("--spawn", action="store_true", help="Start `server.py` on the URL's port for the run and measure it.")
+    args = parser.parse_args()
+    if args.msgpack and "poker.msgpack" not in CODECS: parser.error("--msgpack needs `pip install msgpack`")
+    _raise_open_file_limit(args.connections + 64)
+    server = None
+    if args.spawn:
+        port = args.url.rsplit(":", 1)[1].split("/")[0]
+        server = subprocess.Popen([sys.executable, "server.py", "--port", port], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        args.server_pid = server.pid; time.sleep(2)
+    try: asyncio.run(run(args))
+    finally:
+        if server: server.terminate(); server.wait()
+
+if __name__ == "__main__":
+    main()
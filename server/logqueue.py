@@ -0,0 +1,59 @@
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+FORMAT = '%(asctime)s [%(levelname)s] (%(funcName)s) %(message)s'
+_PLAIN = (str, int, float, bool, type(None))  # arguments that cannot change between the log call and formatting
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: ts (epoch seconds), level, logger, func, msg, and exc for a traceback."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 6), "level": record.levelname, "logger": record.name, "func": record.funcName, "msg": record.getMessage()}
+        if record.exc_info and not record.exc_text: record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text: entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records as they are, leaving the message, the timestamp and the line to the listener
+    thread. QueueHandler formats the whole line in the caller; only a record whose arguments could
+    still change before the listener gets to it (lists, dicts, objects) has its message merged here."""
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (type(args) is tuple and all(type(a) in _PLAIN for a in args)):
+            record.msg = record.getMessage(); record.args = None
+        return record
+
+_listener: Optional[QueueListener] = None
+_handlers: List[logging.Handler] = []
+
+def configure(json_lines: bool = False):
+    """Formats the root logger's output as plain lines (FORMAT) or, with json_lines, as JSON lines."""
+    formatter = JsonLinesFormatter() if json_lines else logging.Formatter(FORMAT)
+    for handler in logging.getLogger().handlers: handler.setFormatter(formatter)
+
+def start():
+    """Moves formatting and writing of every log record off the calling thread: the root logger's
+    handlers are handed to a QueueListener thread, and the logger only puts records on a queue.
+    Call from the process that logs (each worker after the fork), and stop() before it exits."""
+    global _listener, _handlers
+    if _listener is not None: return
+    root = logging.getLogger(); _handlers = list(root.handlers)
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    for handler in _handlers: root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False  # the format uses none of them
+    _listener.start(); atexit.register(stop)
+
+def stop():
+    """Writes out what is still queued and gives the handlers back to the root logger."""
+    global _listener
+    if _listener is None: return
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler): root.removeHandler(handler)
+    _listener.stop(); _listener = None
+    for handler in _handlers: root.addHandler(handler)
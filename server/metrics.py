@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+# Seconds; hot-path timings are mostly well under a millisecond, pauses and slow clients reach seconds.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REGISTRY: List["Metric"] = []
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name; self.help = help
+        REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n" + "".join(line + "\n" for line in self.samples())
+
+class Counter(Metric):
+    """A count that only goes up; `fn` reads it from elsewhere at scrape time instead."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help); self.value = 0; self.fn = fn
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_number(self.fn() if self.fn else self.value)}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: int = 1):
+        self.value -= amount
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets allocated up front. Everything runs on the event
+    loop thread, so observe() is a bisect and two additions with no lock."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.bounds = tuple(buckets); self.counts = [0] * (len(self.bounds) + 1); self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1; self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self) -> List[str]:
+        lines = []; total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count; lines.append(f'{self.name}_bucket{{le="{bound}"}} {total}')
+        total += self.counts[-1]
+        lines += [f'{self.name}_bucket{{le="+Inf"}} {total}', f"{self.name}_sum {_number(self.sum)}", f"{self.name}_count {total}"]
+        return lines
+
+class TimedLock(asyncio.Lock):
+    """asyncio.Lock that records how long every acquire() waited in LOCK_WAIT_SECONDS."""
+    async def acquire(self):
+        start = time.perf_counter()
+        await super().acquire()
+        LOCK_WAIT_SECONDS.observe(time.perf_counter() - start)
+        return True
+
+ACTION_SECONDS = Histogram("poker_action_seconds", "Processing time of a player action, from receipt (including the table lock wait) until its events are queued.")
+LOCK_WAIT_SECONDS = Histogram("poker_table_lock_wait_seconds", "Time spent waiting to acquire a table's action lock.")
+BROADCAST_SECONDS = Histogram("poker_broadcast_seconds", "Fan-out time of a game_state broadcast to a table's connections.")
+RENDER_SECONDS = Histogram("poker_state_render_seconds", "Time to render and encode one connection's game_state frame when its send queue flushes.")
+SHOWDOWN_SECONDS = Histogram("poker_showdown_seconds", "Duration of a showdown: side pots, hand evaluation and awards.")
+EVALUATE_SECONDS = Histogram("poker_evaluate_hand_seconds", "Duration of one hand evaluation at showdown.")
+ACTIONS = Counter("poker_actions_total", "Player actions accepted.")
+HANDS = Counter("poker_hands_total", "Hands played to the end; rate() gives hands per second.")
+CONNECTIONS = Gauge("poker_connections", "Open client connections.")
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "".join(metric.render() for metric in REGISTRY)
+
+PAGES: Dict[bytes, Callable[[], str]] = {b"/metrics": render}  # what the metrics port serves; profiling adds /profile
+
+async def _serve_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+        path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b""
+        page = PAGES.get(path.split(b"?")[0])
+        if page: status, body = "200 OK", page().encode()
+        else: status, body = "404 Not Found", b"Not found. Metrics are at /metrics\n"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError): pass
+    finally: writer.close()
+
+async def start_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Serves GET /metrics over plain HTTP. Meant for a local or internal scrape port, not the internet."""
+    server = await asyncio.start_server(_serve_http, host, port)
+    log.info(f"Metrics at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+import websockets.exceptions
+
+from codec import Frame, codec_for
+
+StateSource = Callable[[], Optional[Frame]]  # renders a connection's game_state frame at flush time
+
+# What to do with a client whose send queue backs up (see Outbox):
+#   "drop"       - hold back game_state frames while the queue is over the high-water mark; only the newest is sent once it drains
+#   "disconnect" - close the connection once its queue has stayed over the high-water mark for SLOW_CLIENT_GRACE seconds
+SLOW_CLIENT_POLICIES = ("drop", "disconnect")
+SLOW_CLIENT_POLICY = "drop"
+SEND_QUEUE_HIGH_WATER = 16  # frames
+SEND_QUEUE_LIMIT = 256  # frames; a connection over this is closed under either policy
+SLOW_CLIENT_GRACE = 10.0
+
+_totals = {"dropped_state_frames": 0, "slow_disconnects": 0}
+
+class Outbox:
+    """Collects everything sent to one connection during an event-loop tick and writes it as one frame.
+
+    A lone message goes out as is; several go out as one batch in the connection's codec. A game_state
+    requested several times in the same tick is rendered once, when the batch is flushed, in
+    the place of the last request, so superseded snapshots never reach the wire.
+
+    Frames wait in a bounded queue drained by the connection's own writer task, so the tables
+    never wait on a socket. What happens to a client that can't keep up is SLOW_CLIENT_POLICY.
+    """
+    __slots__ = ("websocket", "codec", "_pending", "_state", "_held", "_scheduled", "_queue", "_writer", "_over_since", "closed", "sent", "dropped")
+
+    def __init__(self, websocket):
+        self.websocket = websocket; self.codec = codec_for(websocket)
+        self._pending: List[Union[Frame, StateSource]] = []
+        self._state: Optional[StateSource] = None
+        self._held: Optional[StateSource] = None  # game_state held back while the queue is backed up
+        self._scheduled = False
+        self._queue: Optional[Deque[Frame]] = None  # only while frames are waiting: most connections are idle most of the time
+        self._writer: Optional[asyncio.Task] = None
+        self._over_since: Optional[float] = None
+        self.closed = False
+        self.sent = 0; self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue) if self._queue else 0
+
+    def send(self, message: Frame):
+        if self.closed: return
+        self._pending.append(message); self._schedule()
+
+    def send_state(self, render: StateSource):
+        if self.closed: return
+        if self._held is not None: self._drop_held()
+        if self._state is not None: self._pending.remove(self._state)
+        self._state = render; self._pending.append(render); self._schedule()
+
+    def _drop_held(self):
+        self._held = None; self.dropped += 1; _totals["dropped_state_frames"] += 1
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True; asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        pending, state, self._pending, self._state, self._scheduled = self._pending, self._state, [], None, False
+        if self.closed: return
+        if state is not None and SLOW_CLIENT_POLICY == "drop" and self.depth >= SEND_QUEUE_HIGH_WATER:
+            pending.remove(state); self._held = state  # rendered once the writer catches up
+        frames = [f for f in (m if isinstance(m, (str, bytes)) else m() for m in pending) if f]
+        if not frames: return
+        if self._queue is None: self._queue = deque()
+        self._queue.append(self.codec.batch(frames))
+        if self._writer is None or self._writer.done(): self._writer = asyncio.create_task(self._drain())
+        self._check_backlog()
+
+    def _check_backlog(self):
+        if self.depth > SEND_QUEUE_LIMIT: self.close(f"Send queue over {SEND_QUEUE_LIMIT} frames"); return
+        if self.depth < SEND_QUEUE_HIGH_WATER: self._over_since = None; return
+        now = time.monotonic()
+        if self._over_since is None: self._over_since = now
+        elif SLOW_CLIENT_POLICY == "disconnect" and now - self._over_since > SLOW_CLIENT_GRACE:
+            self.close(f"Send queue over {SEND_QUEUE_HIGH_WATER} frames for {SLOW_CLIENT_GRACE:g}s")
+
+    async def _drain(self):
+        ws_id = getattr(self.websocket, 'id', id(self.websocket))
+        while self._queue and not self.closed:
+            try: await self.websocket.send(self._queue[0])
+            except websockets.exceptions.ConnectionClosed: logging.warning(f"Send failed: Conn Closed OK ws={ws_id}"); self._discard(); return
+            except Exception as e: logging.error(f"Send error ws={ws_id}: {e}", exc_info=False)
+            if self._queue: self._queue.popleft(); self.sent += 1
+            if self._held is not None and self.depth < SEND_QUEUE_HIGH_WATER:
+                self._pending.append(self._held); self._state = self._held; self._held = None; self._schedule()
+        if not self._queue: self._over_since = None; self._queue = None; self._writer = None
+
+    def _discard(self):
+        self.closed = True; self._queue = None; self._pending = []; self._state = None; self._held = None
+
+    def close(self, reason: str):
+        """Gives up on a client that can't keep up: drops its queue and closes the connection."""
+        if self.closed: return
+        logging.warning(f"Closing slow client ws={getattr(self.websocket, 'id', id(self.websocket))}: {reason}.")
+        self._discard(); _totals["slow_disconnects"] += 1
+        if self._writer and not self._writer.done(): self._writer.cancel()
+        asyncio.create_task(self.websocket.close(code=1008, reason=reason))
+
+_outboxes: "weakref.WeakKeyDictionary[object, Outbox]" = weakref.WeakKeyDictionary()
+
+def outbox_for(websocket) -> Outbox:
+    outbox = _outboxes.get(websocket)
+    if outbox is None: outbox = _outboxes[websocket] = Outbox(websocket)
+    return outbox
+
+def stats() -> Dict[str, Any]:
+    """Send queue depth over all live connections plus drop and slow-client disconnect counts since start."""
+    depths = [o.depth for o in list(_outboxes.values()) if not o.closed]
+    return {"connections": len(depths), "queued_frames": sum(depths), "max_queue_depth": max(depths, default=0),
+            "backlogged_connections": sum(d >= SEND_QUEUE_HIGH_WATER for d in depths), **_totals}
@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+class Pot:
+    """Chips put in between the cap of the pot below and `cap` (None for the top pot, which has no cap yet)."""
+    __slots__ = ("cap", "amount", "contributors")
+
+    def __init__(self, cap: Optional[int] = None):
+        self.cap = cap; self.amount = 0; self.contributors: Set[int] = set()
+
+class PotLedger:
+    """The main pot and side pots of the hand in progress, updated as each blind, call, bet and raise
+    goes in rather than worked out from everyone's total at showdown.
+
+    A pot's cap is the total of a player who went all-in: they can win at most that much from each
+    opponent, so chips above it go to the pot above. Caps only appear when someone goes all-in, so
+    most chips land in the single top pot and add() touches one or two pots.
+    """
+    __slots__ = ("contributions", "pots", "total")
+
+    def __init__(self):
+        self.contributions: Dict[int, int] = {}  # player ID -> chips put in this hand
+        self.pots: List[Pot] = [Pot()]
+        self.total = 0
+
+    def clear(self):
+        self.contributions.clear(); self.pots = [Pot()]; self.total = 0
+
+    def add(self, player_id: int, amount: int, all_in: bool = False):
+        """`player_id` puts `amount` more chips in; `all_in` when that was the last of their stack."""
+        before = self.contributions.get(player_id, 0); after = before + amount
+        self.contributions[player_id] = after; self.total += amount; floor = 0
+        for pot in self.pots:
+            if pot.cap is not None and before >= pot.cap: floor = pot.cap; continue
+            top = after if pot.cap is None or after < pot.cap else pot.cap
+            if top > max(before, floor): pot.amount += top - max(before, floor); pot.contributors.add(player_id)
+            if pot.cap is None or after <= pot.cap: break
+            floor = pot.cap
+        if all_in and after: self._cap(after)
+
+    def _cap(self, level: int):
+        # Splits the pot spanning `level` in two; what its contributors put in above the level moves up.
+        for i, pot in enumerate(self.pots):
+            if pot.cap == level: return
+            if pot.cap is not None and pot.cap < level: continue
+            upper = Pot(pot.cap); pot.cap = level
+            for pid in pot.contributors:
+                put_in = self.contributions[pid]
+                above = (put_in if upper.cap is None else min(put_in, upper.cap)) - level
+                if above > 0: upper.amount += above; upper.contributors.add(pid)
+            pot.amount -= upper.amount; self.pots.insert(i + 1, upper)
+            return
+
+    def pots_for(self, live: Set[int]) -> List[Tuple[int, List[int]]]:
+        """(amount, eligible player IDs) for each pot with chips, main pot first, where `live` are the
+        players still in the hand. A pot none of them can win (chips of players who folded or left
+        above everyone still in) goes to the pot below it."""
+        result: List[Tuple[int, List[int]]] = []; carry = 0
+        for pot in self.pots:
+            if not pot.amount: continue
+            eligible = sorted(pot.contributors & live)
+            if eligible: result.append((pot.amount + carry, eligible)); carry = 0
+            elif result: result[-1] = (result[-1][0] + pot.amount, result[-1][1])
+            else: carry += pot.amount
+        if carry: result.append((carry, []))
+        return result
+
+    def snapshot(self) -> List[List[int]]:
+        """[player ID, chips put in, 1 if that was an all-in cap] per contributor."""
+        caps = {pot.cap for pot in self.pots}
+        return [[pid, amount, int(amount in caps)] for pid, amount in self.contributions.items()]
+
+    @classmethod
+    def from_snapshot(cls, data: Iterable[List[int]]) -> "PotLedger":
+        ledger = cls(); caps = []
+        for pid, amount, capped in data:
+            ledger.add(pid, amount)
+            if capped: caps.append(amount)
+        for level in caps: ledger._cap(level)
+        return ledger
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from metrics import Histogram, TimedLock
+
+log = logging.getLogger(__name__)
+
+LAG_INTERVAL = 0.05  # seconds between event loop lag samples
+_SKIP_FILES = (asyncio.locks.__file__, __file__)
+
+class SiteStats:
+    __slots__ = ("acquires", "contended", "wait", "max_wait", "hold", "max_hold")
+
+    def __init__(self):
+        self.acquires = 0; self.contended = 0; self.wait = 0.0; self.max_wait = 0.0; self.hold = 0.0; self.max_hold = 0.0
+
+SITES: Dict[str, SiteStats] = {}  # call site -> what its acquisitions of table locks cost, over all tables
+LOOP_LAG_SECONDS = Histogram("poker_event_loop_lag_seconds", "How late the event loop ran a callback that was due (sampled every LAG_INTERVAL while profiling).",
+                             (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+_lag_max = 0.0; _started = time.monotonic()
+
+def _call_site() -> str:
+    # The first frame outside asyncio's lock code and this module: the coroutine that took the lock.
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename in _SKIP_FILES: frame = frame.f_back
+    if frame is None: return "?"
+    return f"{frame.f_code.co_qualname} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+
+class ProfiledLock(TimedLock):
+    """A table lock that also records, per call site, how long each acquisition waited and how
+    long the lock was then held. Opt-in (--profile): finding the call site costs a frame walk."""
+    def __init__(self):
+        super().__init__(); self._site: Optional[SiteStats] = None; self._since = 0.0
+
+    async def acquire(self):
+        site = _call_site(); start = time.perf_counter(); contended = self.locked()
+        await super().acquire()
+        now = time.perf_counter(); waited = now - start
+        stats = SITES.get(site)
+        if stats is None: stats = SITES[site] = SiteStats()
+        stats.acquires += 1; stats.wait += waited; stats.contended += contended
+        if waited > stats.max_wait: stats.max_wait = waited
+        self._site = stats; self._since = now
+        return True
+
+    def release(self):
+        stats = self._site
+        if stats is not None:
+            held = time.perf_counter() - self._since; stats.hold += held
+            if held > stats.max_hold: stats.max_hold = held
+            self._site = None
+        super().release()
+
+async def sample_loop_lag(interval: float = LAG_INTERVAL):
+    """Sleeps `interval` over and over; whatever it oversleeps by is time the loop was busy elsewhere."""
+    global _lag_max, _started
+    loop = asyncio.get_running_loop(); _started = time.monotonic()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - due); LOOP_LAG_SECONDS.observe(lag)
+        if lag > _lag_max: _lag_max = lag
+
+def report() -> str:
+    """Table lock cost per call site, worst first, and the event loop lag seen while profiling."""
+    lines = [f"Profile after {time.monotonic() - _started:,.0f}s",
+             f"{'call site':<64} {'acquires':>9} {'contended':>9} {'wait ms':>9} {'avg us':>8} {'max ms':>8} {'hold ms':>9} {'avg us':>8} {'max ms':>8}"]
+    for site, s in sorted(SITES.items(), key=lambda item: item[1].wait + item[1].hold, reverse=True):
+        n = max(1, s.acquires)
+        lines.append(f"{site[:64]:<64} {s.acquires:>9,} {s.contended:>9,} {s.wait * 1000:>9,.1f} {s.wait / n * 1e6:>8,.1f} {s.max_wait * 1000:>8,.2f} "
+                     f"{s.hold * 1000:>9,.1f} {s.hold / n * 1e6:>8,.1f} {s.max_hold * 1000:>8,.2f}")
+    samples = LOOP_LAG_SECONDS.count
+    if samples:
+        over: List[str] = []; total = 0
+        for bound, count in zip(LOOP_LAG_SECONDS.bounds, LOOP_LAG_SECONDS.counts):
+            total += count
+            if bound in (0.005, 0.05, 0.25): over.append(f">{bound * 1000:g} ms: {samples - total:,}")
+        lines.append(f"Event loop lag: {samples:,} samples, mean {LOOP_LAG_SECONDS.sum / samples * 1000:.2f} ms, max {_lag_max * 1000:.1f} ms; " + ", ".join(over))
+    return "\n".join(lines) + "\n"
+
+def write_report(path: str):
+    try:
+        with open(path, "w") as f: f.write(report())
+        log.info(f"Wrote lock and event loop profile to {path}")
+    except OSError as e: log.error(f"Could not write the profile to {path}: {e}")
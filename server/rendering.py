@@ -0,0 +1,150 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from cards import ints_to_cards
+from codec import JSON, Frame
+
+REVEAL_STAGES = ("showdown", "hand_over")
+
+class StateRenderer:
+    """Encodes a table's game_state frames.
+
+    The public view (every player with hidden hole cards, board, pot, ...) is encoded once
+    per state version. A seated player's frame splices in only their own player entry, and
+    spectators get the shared frame as is. The version only moves when the table state
+    actually changed, so repeated broadcasts of the same state reuse the cached frames.
+
+    Alongside the full snapshot, each version has a game_state_delta against the previous
+    one: only the changed fields of changed players, the IDs of removed players and the
+    changed table fields.
+
+    Frames for the default JSON codec are spliced together from cached fragments; other codecs
+    encode the same cached dicts once per version and recipient.
+    """
+    def __init__(self, game, big_blind: int):
+        self.game = game; self.big_blind = big_blind
+        self.version: int = 0
+        self._signature: Optional[Tuple] = None
+        self._public: Dict[int, Dict[str, Any]] = {}
+        self._fragments: Dict[int, str] = {}
+        self._own: Dict[int, Dict[str, Any]] = {}  # pid -> what that player sees of themselves
+        # pid -> [(player signature, reveal), public dict, fragment, own dict, own fragment]
+        self._player_cache: Dict[int, list] = {}
+        self._table: Dict[str, Any] = {}
+        self._suffix: str = ""
+        self._frames: Dict[Any, Frame] = {}  # recipient (or (codec name, recipient)) -> frame
+        self._prev_public: Dict[int, Dict[str, Any]] = {}
+        self._prev_own: Dict[int, Dict[str, Any]] = {}
+        self._delta_players: Dict[int, Dict[str, Any]] = {}
+        self._delta_table: Dict[str, Any] = {}
+        self._delta_fragments: Dict[int, str] = {}
+        self._delta_suffix: str = ""
+        self._delta_frames: Dict[Any, Frame] = {}
+
+    def _current_signature(self) -> Tuple:
+        g = self.game
+        players = tuple((p.id, p.name, p.stack, tuple(p.hand), p.current_bet, p.total_bet_this_hand, p.status,
+                         p.is_dealer, p.last_action, p.last_hand_rank) for p in g.players.values())
+        return (g.game_stage, g.pot, g.current_player_id, bytes(g.community_cards), players)
+
+    def _player_entry(self, p, player_signature: Tuple, reveal: bool) -> list:
+        # Players whose own fields didn't change keep their encoded fragments across versions.
+        key = (player_signature, reveal); entry = self._player_cache.get(p.id)
+        if entry is None or entry[0] != key:
+            # Hands are dealt in place, so cached dicts hold copies for the next version's diff.
+            public = p.to_dict(show_hand=reveal and p.status != "folded"); public["hand"] = list(public["hand"])
+            own = public
+            if p.hand and p.status != "folded" and public["hand"][0] == "??":
+                own = p.to_dict(show_hand=True); own["hand"] = list(own["hand"])
+            entry = self._player_cache[p.id] = [key, public, f'"{p.id}": {json.dumps(public)}', own, None]
+        return entry
+
+    def refresh(self) -> bool:
+        """Re-renders the public view if the table changed since the last call. Returns True if it did."""
+        signature = self._current_signature()
+        if signature == self._signature: return False
+        g = self.game; reveal = g.game_stage in REVEAL_STAGES; dealer_id = -1
+        self._prev_public, self._prev_own, prev_table = self._public, self._own, self._table
+        self._public = {}; self._own = {}; self._fragments = {}
+        for p, player_signature in zip(list(g.players.values()), signature[4]):
+            entry = self._player_entry(p, player_signature, reveal)
+            self._public[p.id] = entry[1]; self._fragments[p.id] = entry[2]; self._own[p.id] = entry[3]
+            if p.is_dealer: dealer_id = p.id
+        for pid in [pid for pid in self._player_cache if pid not in g.players]: del self._player_cache[pid]
+        self._table = {
+            "community_cards": ints_to_cards(g.community_cards), "pot": g.pot, "pots": g.live_pots(), "current_player_id": g.current_player_id,
+            "dealer_id": dealer_id, "game_stage": g.game_stage, "bigBlind": self.big_blind
+        }
+        self.version += 1
+        self._suffix = "}, " + json.dumps({**self._table, "version": self.version})[1:] + "}"
+        self._delta_players = {pid: _diff(self._prev_public.get(pid), public)
+                               for pid, public in self._public.items() if public is not self._prev_public.get(pid)}
+        self._delta_fragments = {pid: f'"{pid}": {json.dumps(changes)}' for pid, changes in self._delta_players.items()}
+        changed = {k: v for k, v in self._table.items() if prev_table.get(k) != v}
+        removed = [pid for pid in self._prev_public if pid not in self._public]
+        self._delta_table = {**changed, "removed": removed, "version": self.version, "base": self.version - 1}
+        self._delta_suffix = "}, " + json.dumps(self._delta_table)[1:] + "}"
+        self._signature = signature; self._frames = {}; self._delta_frames = {}
+        return True
+
+    def _private_fragment(self, player_id: int) -> Optional[str]:
+        """The recipient's own entry, or None when it matches the public one (no cards or already revealed)."""
+        if self._own.get(player_id) is self._public.get(player_id): return None
+        entry = self._player_cache[player_id]
+        if entry[4] is None: entry[4] = f'"{player_id}": {json.dumps(entry[3])}'
+        return entry[4]
+
+    def frame_for(self, player_id: Optional[int], codec=JSON) -> Frame:
+        """The encoded game_state message for a seated player, or the shared one for `None` (spectators)."""
+        if codec is not JSON: return self._encoded(self._frames, "game_state", player_id, codec)
+        frame = self._frames.get(player_id)
+        if frame is None:
+            private = self._private_fragment(player_id) if player_id in self._fragments else None
+            if private is None and player_id is not None:
+                frame = self._frames[player_id] = self.frame_for(None)
+                return frame
+            fragments: List[str] = [private if pid == player_id else f for pid, f in self._fragments.items()]
+            frame = self._frames[player_id] = '{"type": "game_state", "payload": {"players": {' + ", ".join(fragments) + self._suffix
+        return frame
+
+    def _personal_delta(self, player_id: Optional[int]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """The players part of the delta as `player_id` sees it, or None when that is the shared one."""
+        own, prev_own = self._own.get(player_id), self._prev_own.get(player_id)
+        if own is None or (own is self._public[player_id] and prev_own is self._prev_public.get(player_id)): return None
+        players = dict(self._delta_players); players.pop(player_id, None)
+        changes = _diff(prev_own, own)
+        if changes: players[player_id] = changes
+        return players
+
+    def delta_for(self, player_id: Optional[int], codec=JSON) -> Frame:
+        """The encoded game_state_delta taking a recipient from `version - 1` to `version`."""
+        if codec is not JSON: return self._encoded(self._delta_frames, "game_state_delta", player_id, codec)
+        frame = self._delta_frames.get(player_id)
+        if frame is None:
+            players = self._personal_delta(player_id)
+            if players is None and player_id is not None:
+                frame = self._delta_frames[player_id] = self.delta_for(None)
+                return frame
+            fragments = self._delta_fragments.values() if players is None else \
+                [f'"{pid}": {json.dumps(c)}' if pid == player_id else self._delta_fragments[pid] for pid, c in players.items()]
+            frame = self._delta_frames[player_id] = '{"type": "game_state_delta", "payload": {"players": {' + ", ".join(fragments) + self._delta_suffix
+        return frame
+
+    def _encoded(self, cache: Dict[Any, Frame], msg_type: str, player_id: Optional[int], codec) -> Frame:
+        key = (codec.name, player_id); frame = cache.get(key)
+        if frame is None:
+            if msg_type == "game_state":
+                personal = player_id in self._own and self._own[player_id] is not self._public[player_id]
+                if not personal and player_id is not None: frame = cache[key] = self._encoded(cache, msg_type, None, codec); return frame
+                players = {pid: self._own[pid] if pid == player_id else public for pid, public in self._public.items()}
+                payload = {"players": players, **self._table, "version": self.version}
+            else:
+                players = self._personal_delta(player_id)
+                if players is None and player_id is not None: frame = cache[key] = self._encoded(cache, msg_type, None, codec); return frame
+                payload = {"players": self._delta_players if players is None else players, **self._delta_table}
+            frame = cache[key] = codec.encode(msg_type, payload)
+        return frame
+
+def _diff(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    if old is None: return new
+    return {k: v for k, v in new.items() if old.get(k) != v}
@@ -1,187 +1,250 @@
 import asyncio
 import websockets
 import websockets.exceptions
-import json
-import random
-import itertools
-from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Set, Optional, Any
+from typing import List, Dict, Set, Optional, Any, Tuple
 import logging
 import time
 import ssl
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] (%(funcName)s) %(message)s')
-
-MAX_PLAYERS = 8
-STARTING_STACK = 1000
-SMALL_BLIND = 10
-BIG_BLIND = 20
-HAND_END_DELAY = 5
-ACTION_TIMEOUT = 60.0
-
-SUITS = "♠♥♦♣"
-RANKS = "23456789TJQKA"
-RANK_VALUES = {rank: i for i, rank in enumerate(RANKS)}
-
-def create_deck():
-    return [rank + suit for rank in RANKS for suit in SUITS]
-
-def get_rank_value(rank_char: str) -> int:
-    return RANK_VALUES.get(rank_char, -1)
-
-def evaluate_hand(hand: List[str], community_cards: List[str]) -> Tuple[int, List[int], str, List[str]]:
-    all_cards = hand + community_cards
-    if not all_cards or len(all_cards) < 5: return (0, [], "Invalid Hand (<5 cards)", [])
-    best_score = (-1, [], "Invalid Hand", [])
-    for combo_tuple in itertools.combinations(all_cards, 5):
-        combo = list(combo_tuple)
-        valid_combo = [c for c in combo if isinstance(c, str) and len(c) >= 1]
-        if len(valid_combo) != 5: continue
-        ranks = sorted([get_rank_value(c[0]) for c in valid_combo], reverse=True)
-        suits = [c[1] for c in valid_combo if len(c) >= 2]
-        if len(suits) != 5: continue
-        is_flush = len(set(suits)) == 1
-        is_straight = all(ranks[i] == ranks[0] - i for i in range(5))
-        ace_low_ranks = [12, 3, 2, 1, 0]
-        is_ace_low_straight = (ranks == ace_low_ranks)
-        if not is_straight and is_ace_low_straight:
-            is_straight = True
-            ranks_for_kicker = [3, 2, 1, 0, -1]
-        else:
-            ranks_for_kicker = ranks
-        is_sf = is_straight and is_flush
-        rank_counts = Counter(ranks); counts = sorted(rank_counts.values(), reverse=True)
-        primary_kickers = sorted(rank_counts.keys(), key=lambda r: (rank_counts[r], r), reverse=True)
-        current_score = (-1, [], "Unknown", [])
-        if is_sf: current_score = (9, [ranks_for_kicker[0]], "Straight Flush", combo)
-        elif counts[0] == 4: current_score = (8, primary_kickers, "Four of a Kind", combo)
-        elif counts == [3, 2]: current_score = (7, primary_kickers, "Full House", combo)
-        elif is_flush: current_score = (6, ranks, "Flush", combo)
-        elif is_straight: current_score = (5, [ranks_for_kicker[0]], "Straight", combo)
-        elif counts[0] == 3: current_score = (4, primary_kickers, "Three of a Kind", combo)
-        elif counts == [2, 2, 1]: current_score = (3, primary_kickers, "Two Pair", combo)
-        elif counts[0] == 2: current_score = (2, primary_kickers, "One Pair", combo)
-        else: current_score = (1, ranks, "High Card", combo)
-        if current_score[0] > best_score[0] or \
-           (current_score[0] == best_score[0] and current_score[1] > best_score[1]):
-            best_5_display = sorted(combo, key=lambda c: get_rank_value(c[0]), reverse=True)
-            best_score = (current_score[0], current_score[1], current_score[2], best_5_display)
-    if best_score[0] == -1:
-        valid_all = [c for c in all_cards if isinstance(c, str) and len(c) >= 1]
-        if not valid_all: return (0, [], "Invalid Hand", [])
-        ranks = sorted([get_rank_value(c[0]) for c in valid_all], reverse=True)
-        best_5 = sorted(valid_all, key=lambda c: get_rank_value(c[0]), reverse=True)[:5]
-        return (1, ranks[:5], "High Card (Fallback)", best_5)
-    final_name = best_score[2]
-    try:
-        score_val = best_score[0]; kickers = best_score[1]; best_5_cards = best_score[3]
-        if score_val == 9 and kickers:
-            high_rank_idx = kickers[0]; high_rank_char = RANKS[high_rank_idx] if high_rank_idx >= 0 else '5'
-            final_name = f"{high_rank_char}-high Straight Flush"
-            sf_ranks_set = {get_rank_value(c[0]) for c in best_5_cards}
-            if sf_ranks_set == {12, 11, 10, 9, 8}: final_name = "Royal Flush"
-        elif score_val == 8 and len(kickers) >= 1: final_name = f"Four of a Kind, {RANKS[kickers[0]]}s"
-        elif score_val == 7 and len(kickers) >= 2: final_name = f"Full House, {RANKS[kickers[0]]}s full of {RANKS[kickers[1]]}s"
-        elif score_val == 6 and kickers: final_name = f"{RANKS[kickers[0]]}-high Flush"
-        elif score_val == 5 and kickers:
-            high_rank_idx = kickers[0]; high_rank_char = RANKS[high_rank_idx] if high_rank_idx >= 0 else '5'
-            final_name = f"{high_rank_char}-high Straight"
-        elif score_val == 4 and len(kickers) >= 1: final_name = f"Three of a Kind, {RANKS[kickers[0]]}s"
-        elif score_val == 3 and len(kickers) >= 2: final_name = f"Two Pair, {RANKS[kickers[0]]}s & {RANKS[kickers[1]]}s"
-        elif score_val == 2 and len(kickers) >= 1: final_name = f"Pair of {RANKS[kickers[0]]}s"
-        elif score_val == 1 and kickers: final_name = f"{RANKS[kickers[0]]}-High"
-    except IndexError:
-        logging.error(f"Error refining hand name for score: {best_score}", exc_info=True)
-        final_name = best_score[2]
-    return (best_score[0], best_score[1], final_name, best_score[3])
-
-class Player:
-    def __init__(self, player_id: int, websocket):
-        self.id: int = player_id
-        self.name: Optional[str] = None
-        self.websocket = websocket
-        self.stack: int = STARTING_STACK
-        self.hand: List[str] = []
-        self.current_bet: int = 0
-        self.total_bet_this_hand: int = 0
-        self.status: str = "waiting"
-        self.is_dealer: bool = False
-        self.last_action: Optional[str] = None
-        self.last_action_time: float = 0.0
-        self.last_hand_rank: Optional[str] = None
-
-    def to_dict(self, show_hand=False) -> Dict[str, Any]:
-        display_name = self.name if self.name else f"Player {self.id}"
-        hand_display = ['??', '??'] if self.hand else []
-        if self.status == "folded": hand_display = []
-        elif show_hand and self.hand: hand_display = self.hand
-        return {
-            "id": self.id, "name": display_name, "stack": self.stack, "hand": hand_display,
-            "current_bet": self.current_bet, "status": self.status, "is_dealer": self.is_dealer,
-            "last_action": self.last_action, "last_hand_rank": self.last_hand_rank,
-            "total_bet_this_hand": self.total_bet_this_hand
-        }
-
-    def can_act(self) -> bool:
-        return self.status == "active" and self.stack > 0
-
-class PokerGame:
-    def __init__(self):
-        self.players: Dict[int, Player] = {}
+import argparse
+import functools
+import gc
+import os
+import secrets
+import signal
+import sqlite3
+import urllib.parse
+
+from bankroll import BankrollStore
+from cards import ints_to_cards
+from engine import BIG_BLIND, MAX_PLAYERS, SMALL_BLIND, Event, Player, TableEngine
+from equity import EquityEngine
+from handlog import HandLog
+from cluster import RemoteSocket, WorkerLink, _interrupt, run_supervisor
+from codec import DecodeError, codec_for, select_subprotocol
+from rendering import StateRenderer
+from snapshot import SNAPSHOT_INTERVAL, SnapshotStore
+from timers import Timer, timers
+import logqueue
+import metrics
+import profiling
+import outbox
+from outbox import outbox_for
+
+logging.basicConfig(level=logging.INFO, format=logqueue.FORMAT)
+
+HAND_END_DELAY = 5.0  # seconds between hands (--hand-delay); tables may set their own
+ACTION_TIMEOUT = 60.0  # seconds a player has to act (--action-timeout); tables may set their own
+ACTION_TIMEOUT_RANGE = (5.0, 300.0)  # what a table created from the lobby may ask for
+TIME_BANK = 30.0  # extra seconds each player may draw on once their action clock runs out (--time-bank); used up for the session
+SEND_STATS_INTERVAL = 60.0
+HAND_LOG_PATH: Optional[str] = None  # binary hand history file (--hand-log); workers append their index
+BANKROLL_PATH: Optional[str] = None  # SQLite bankroll database (--bankrolls); shared by all workers
+SNAPSHOT_PATH: Optional[str] = None  # table snapshot file (--snapshots); workers append their index
+RESTORE_GRACE = 60.0  # seconds a restored table holds its seats for players to reconnect
+METRICS_PORT: Optional[int] = None  # Prometheus /metrics over HTTP (--metrics-port); workers add their index
+METRICS_HOST = "127.0.0.1"
+ASYNC_LOGGING = False  # format and write log records on a background thread (--async-logging)
+PROFILE_PATH: Optional[str] = None  # lock and event loop lag report (--profile), written at shutdown and on SIGUSR1; workers append their index
+SESSION_GRACE = 30.0  # seconds a dropped player's seat is held for them to resume (--session-grace; 0 = fold and remove at once)
+
+class HeldSeat:
+    """Stands in for the websocket of a player who is away: restored from a snapshot, or dropped
+    and within SESSION_GRACE. It is never in a table's connected set, so sends to it are dropped."""
+    __slots__ = ("name", "__weakref__")  # outboxes are looked up by weak reference
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"HeldSeat({self.name!r})"
+
+def new_resume_token(table_id: int) -> str:
+    """A resume token starts with the ID of the table it was issued at, so that any worker can tell which one owns the seat."""
+    return f"{table_id}.{secrets.token_urlsafe(16)}"
+
+def resume_token_table(token: str) -> Optional[int]:
+    head = token.partition(".")[0]
+    return int(head) if head.isdigit() else None
+
+class PokerGame(TableEngine):
+    def __init__(self, table_id: int = 1, name: Optional[str] = None, max_players: int = MAX_PLAYERS,
+                 action_timeout: Optional[float] = None, hand_end_delay: Optional[float] = None, time_bank: Optional[float] = None):
+        super().__init__(SMALL_BLIND, BIG_BLIND)
+        self.table_id: int = table_id
+        self.name: str = name or f"Table {table_id}"
+        self.max_players: int = max_players
+        self.action_timeout: float = ACTION_TIMEOUT if action_timeout is None else action_timeout
+        self.hand_end_delay: float = HAND_END_DELAY if hand_end_delay is None else hand_end_delay
+        self.time_bank: float = TIME_BANK if time_bank is None else time_bank
+        self.closed: bool = False
         self.connected_websockets_set: Set = set()
+        self.seated: Dict[Any, Player] = {}  # websocket (or HeldSeat) -> its player
+        self.spectators: Set = set()
+        self.renderer = StateRenderer(self, BIG_BLIND)
+        self.state_versions: Dict[Any, int] = {}  # websocket -> last game_state version it was sent
         self.next_player_id: int = 1
-        self.deck: List[str] = []
-        self.community_cards: List[str] = []
-        self.pot: int = 0
-        self.current_bet: int = 0
-        self.last_raiser_id: Optional[int] = None
-        self.current_player_id: Optional[int] = None
-        self.dealer_button_pos: int = -1
-        self.small_blind_pos: int = 0
-        self.big_blind_pos: int = 0
-        self.game_stage: str = "idle"
-        self.active_players_order: List[int] = []
         self.game_loop_task: Optional[asyncio.Task] = None
-        self._action_lock = asyncio.Lock()
-        self._player_action_event: Optional[asyncio.Event] = None
-        self.actions_this_round: Set[int] = set()
-
-    async def register_player(self, websocket):
-        if len(self.players) >= MAX_PLAYERS:
-            logging.warning(f"Connection rejected: Game full ({len(self.players)} players).")
-            await self.send_error(websocket, "Game is full.")
-            try: await websocket.close(code=1008, reason="Game full")
-            except websockets.exceptions.ConnectionClosed: pass
-            return
-        player_id = self.next_player_id
-        player = Player(player_id, websocket)
+        self._action_lock = profiling.ProfiledLock() if PROFILE_PATH else metrics.TimedLock()
+        self._flow_timer: Optional[Timer] = None  # ends the engine's current pause
+        self._turn_timer: Optional[Timer] = None
+        self._clock_turn: Tuple[int, int] = (0, 0)  # (player ID, serial of the prompt) the action clock was started for
+        self._bank_clock: Optional[Tuple[int, float]] = None  # (player ID, when) a time bank started running
+        self.time_banks: Dict[int, float] = {}  # player ID -> time bank left, for those who have drawn on it
+        self._hand_finished = asyncio.Event()
+        self._settled: Dict[int, int] = {}  # player ID -> stack last journaled to the bankroll store
+        self.restoring: bool = False  # restored from a snapshot and holding seats until players reconnect
+        self._snapshot_dirty: bool = True
+        self._snapshot_hand: int = 0  # hand ID in the last snapshot handed to the store
+        self._last_turn: Optional[Tuple[int, Dict[str, Any]]] = None  # (player ID, player_turn payload) of the open prompt
+
+    @classmethod
+    def from_snapshot(cls, state: Dict[str, Any]) -> "PokerGame":
+        table = cls(state["id"], state["name"], state["seats"], *state.get("clocks", ()))
+        table.restore(state, lambda data: HeldSeat(data[1])); table.seated = {p.websocket: p for p in table.players.values()}
+        table.time_banks = {pid: left for pid, left in state.get("timeBanks", ()) if pid in table.players}
+        table.next_player_id = state["nextPlayer"]; table._settled = {pid: stack for pid, stack in state["settled"] if pid in table.players}
+        table.restoring = bool(table.players); table._snapshot_dirty = False; table._snapshot_hand = state["hand"]
+        return table
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        state = super().snapshot()
+        if state is not None:
+            state.update(id=self.table_id, name=self.name, seats=self.max_players, nextPlayer=self.next_player_id, settled=list(self._settled.items()),
+                         clocks=[self.action_timeout, self.hand_end_delay, self.time_bank], timeBanks=list(self.time_banks.items()))
+        return state
+
+    def checkpoint(self):
+        """Hands the table to the snapshot store if it changed since the last time and is at a point it can be resumed from."""
+        if not snapshots or not self._snapshot_dirty or self.restoring: return
+        state = self.snapshot()
+        if state is not None: snapshots.update(self.table_id, state); self._snapshot_dirty = False; self._snapshot_hand = state["hand"]
+
+    def hand_to_snapshot(self):
+        """At shutdown, after the last checkpoint: if the snapshot holds the open hand, stops logging it
+        here without ending it. The next run restores the hand and finishes it under the same ID."""
+        if self.hand_id and self.hand_id == self._snapshot_hand: self.hand_id = 0
+
+    def player_for(self, websocket) -> Optional[Player]:
+        return self.seated.get(websocket)
+
+    def _seat(self, player: Player, websocket):
+        """Moves a player to another websocket (a reconnect, or a HeldSeat while they are away)."""
+        if self.seated.get(player.websocket) is player: del self.seated[player.websocket]
+        player.websocket = websocket; self.seated[websocket] = player
+
+    def held_seats(self) -> List[HeldSeat]:
+        return [p.websocket for p in self.players.values() if isinstance(p.websocket, HeldSeat)]
+
+    async def reclaim_seat(self, name: str, websocket, token: Optional[str] = None) -> Optional[Player]:
+        """Gives a reconnecting player back the seat held for their name, with `token` as its new resume token."""
         async with self._action_lock:
-            self.players[player_id] = player
+            player = next((p for p in self.players.values() if p.name == name and isinstance(p.websocket, HeldSeat)), None)
+            if player is None: return None
+            self._seat(player, websocket); player.away = False; player.session = token; self.connected_websockets_set.add(websocket)
+        logging.info(f"{name} reconnected to their seat (P{player.id}) at {self.name}.")
+        assignment = {"playerId": player.id, "tableId": self.table_id, "tableName": self.name}
+        if token: assignment["resumeToken"] = token
+        await self.send_message(websocket, "assign_id", assignment)
+        await self.send_game_state(websocket)
+        return player
+
+    async def hold_seat(self, websocket) -> Optional[HeldSeat]:
+        """Keeps a dropped player's seat (and their place in the hand) instead of folding them;
+        returns the stand-in, or None for a connection without a named seat."""
+        async with self._action_lock:
+            player = self.seated.get(websocket)
+            if player is None or player.name is None: return None
+            seat = HeldSeat(player.name); self._seat(player, seat); player.away = True; self.connected_websockets_set.discard(websocket); self.state_versions.pop(websocket, None)
+        logging.info(f"{player.name} (P{player.id}) dropped from {self.name}; holding their seat.")
+        return seat
+
+    async def resume_seat(self, token: str, websocket, version: Optional[int]) -> Optional[Player]:
+        """Hands the seat with resume token `token` to a new connection. The client gets a delta or
+        snapshot from `version`, the last game_state version it has, and its open prompt again.
+        A connection that still holds the seat (its drop not yet noticed) is closed."""
+        async with self._action_lock:
+            player = next((p for p in self.players.values() if p.session == token), None)
+            if player is None: return None
+            old = player.websocket; self._seat(player, websocket); player.away = False
+            if not isinstance(old, HeldSeat): self.connected_websockets_set.discard(old); self.state_versions.pop(old, None)
+            self.connected_websockets_set.add(websocket)
+            if version is not None: self.state_versions[websocket] = version
+            turn = self._last_turn if self._last_turn and self._last_turn[0] == player.id and self.current_player_id == player.id else None
+        if not isinstance(old, HeldSeat): asyncio.create_task(old.close(4000, "Resumed on another connection"))
+        logging.info(f"{player.name} (P{player.id}) resumed their seat at {self.name}.")
+        await self.send_message(websocket, "assign_id", {"playerId": player.id, "tableId": self.table_id, "tableName": self.name, "resumeToken": token, "resumed": True})
+        await self.send_game_state(websocket)
+        if turn: await self.send_message(websocket, "player_turn", turn[1])
+        if self._turn_timer: await self.send_message(websocket, "turn_timer", self._turn_clock())
+        return player
+
+    async def resume_restored(self) -> List[HeldSeat]:
+        """Ends the wait for players after a restore and picks the game back up: a hand in progress
+        continues with a fresh prompt for the player whose turn it was. Returns the seats still held."""
+        async with self._action_lock:
+            if not self.restoring: return []
+            self.restoring = False; self._snapshot_dirty = True; events = []
+            if self.awaiting_action():
+                self._hand_finished.clear(); events = self._request_action()
+                self.game_loop_task = asyncio.create_task(self.game_loop(hand_in_progress=True))
+            held = self.held_seats()
+        logging.info(f"Resuming restored {self.name}" + (f"; {len(held)} player(s) did not come back." if held else "."))
+        await self.broadcast_game_state(); await self.run_events(events)
+        return held
+
+    async def register_player(self, websocket, token: Optional[str] = None) -> Optional[Player]:
+        async with self._action_lock:
+            if self.closed: logging.warning(f"Join rejected: {self.name} is closed."); return None
+            if len(self.players) >= self.max_players: logging.warning(f"Join rejected: {self.name} full ({len(self.players)} players)."); return None
+            player_id = self.next_player_id
+            player = Player(player_id, websocket); player.session = token
+            self.players[player_id] = player; self.seated[websocket] = player
             self.connected_websockets_set.add(websocket)
             self.next_player_id += 1
-        logging.info(f"Player {player_id} connected ({websocket.remote_address}). Requesting name.")
-        await self.send_message(websocket, "assign_id", {"playerId": player_id})
+        logging.info(f"Player {player_id} joined {self.name} ({websocket.remote_address}). Requesting name.")
+        assignment = {"playerId": player_id, "tableId": self.table_id, "tableName": self.name}
+        if token: assignment["resumeToken"] = token
+        await self.send_message(websocket, "assign_id", assignment)
+        return player
 
     async def set_player_name(self, player_id: int, name: str):
-        broadcast_needed = False
+        broadcast_needed = False; name = name.strip()[:15]; balance = None
+        player = self.players.get(player_id)
+        if bankrolls and player and player.name is None:
+            try: balance = await bankrolls.seat(name)
+            except sqlite3.Error as e:
+                logging.error(f"Could not load the bankroll of '{name}': {e}")
+                await self.send_error(player.websocket, "Could not load your bankroll. Please try again."); return
+            if balance is None: await self.send_error(player.websocket, f"'{name}' is already playing."); return
         async with self._action_lock:
             player = self.players.get(player_id)
             if player:
                 if player.name is None:
-                     player.name = name.strip()[:15]
-                     logging.info(f"Player {player_id} set name to: '{player.name}'.")
+                     player.name = name
+                     if balance is not None: player.stack = balance; self._settled[player_id] = balance
+                     logging.info(f"Player {player_id} set name to: '{player.name}'" + (f", bankroll {balance}." if balance is not None else "."))
                      broadcast_needed = True
                 else:
                      logging.warning(f"Player {player_id} attempted to change name to '{name}', ignored.")
                      broadcast_needed = False
             else:
                 logging.error(f"Cannot set name for unknown Player ID: {player_id}")
-                return
+            if balance is not None and not broadcast_needed: bankrolls.release(name)  # left, or named, while the bankroll loaded
         if broadcast_needed:
             await self.broadcast_game_state()
             await self.check_start_game()
 
+    def _settle(self, players):
+        """Journals each player's stack change since it was last settled. Runs at hand boundaries,
+        so chips still in an unfinished pot never reach the bankroll store."""
+        if not bankrolls: return
+        for p in players:
+            settled = self._settled.get(p.id)
+            if settled is None or p.stack == settled: continue
+            bankrolls.journal(p.name, p.stack - settled, self.table_id, self.last_hand_id); self._settled[p.id] = p.stack
+
     async def check_start_game(self):
+        if self.restoring: return
         ready_players = [p for p in self.players.values() if p.name is not None]
         num_ready = len(ready_players)
         if num_ready >= 2 and self.game_stage == "idle":
@@ -190,19 +253,18 @@ class PokerGame:
                     logging.info(f"{num_ready} players ready. Starting game loop.")
                     self.game_loop_task = asyncio.create_task(self.game_loop())
         elif self.game_stage != "idle":
-            logging.debug(f"Check start: Game already in progress ({self.game_stage}).")
+            logging.debug("Check start: Game already in progress (%s).", self.game_stage)
         else:
-            logging.debug(f"Check start: Not enough players ({num_ready}). Waiting for more.")
-
+            logging.debug("Check start: Not enough players (%d). Waiting for more.", num_ready)
     async def unregister_player(self, websocket):
         player_id_to_remove = None; player_name = "Unknown"; player_status = "unknown"; was_their_turn = False; player_to_remove = None
+        events = []; reset_game = False
         async with self._action_lock:
-            for pid, p in self.players.items():
-                if p.websocket == websocket:
-                    player_id_to_remove = pid; player_name = p.name or f"Player {pid}"; player_status = p.status
-                    was_their_turn = (self.current_player_id == pid); player_to_remove = p
-                    break
-            self.connected_websockets_set.discard(websocket)
+            p = self.seated.pop(websocket, None)
+            if p is not None:
+                player_id_to_remove = p.id; player_name = p.name or f"Player {p.id}"; player_status = p.status
+                was_their_turn = (self.current_player_id == p.id); player_to_remove = p
+            self.connected_websockets_set.discard(websocket); self.state_versions.pop(websocket, None)
             if player_id_to_remove is None:
                 logging.debug(f"Websocket disconnected but no associated player found.")
                 return
@@ -213,16 +275,22 @@ class PokerGame:
                 player_to_remove.status = "folded"; player_to_remove.hand = []; player_to_remove.last_action = "fold"; player_to_remove.last_hand_rank = None
                 should_check_hand_end = True
             if player_id_to_remove in self.players:
-                del self.players[player_id_to_remove]
+                del self.players[player_id_to_remove]; self.time_banks.pop(player_id_to_remove, None)
+            if bankrolls and player_id_to_remove in self._settled:  # chips already in the pot are forfeited, as with any fold
+                self._settle([player_to_remove]); del self._settled[player_id_to_remove]; bankrolls.release(player_to_remove.name)
             active_game_players = [p for p in self.players.values() if p.name is not None]
             num_remaining = len(active_game_players)
-            reset_game = False
             if num_remaining < 2 and self.game_stage != "idle":
                 logging.warning(f"Only {num_remaining} player(s) remaining. Resetting game to idle state.")
-                self.game_stage = "idle"; self.pot = 0; self.community_cards = []; self.current_player_id = None; self.current_bet = 0
+                if self.game_stage != "hand_over":  # the hand is void: everyone still seated gets their bets back
+                    for p in self.players.values(): p.stack += p.total_bet_this_hand
+                self._stop_flow(); self.abort_hand(); self._settle(self.players.values())
+                self.game_stage = "idle"; self.pot_ledger.clear(); self.community_cards = bytearray(); self.current_bet = 0
                 if self.game_loop_task and not self.game_loop_task.done(): self.game_loop_task.cancel(); self.game_loop_task = None
-                if was_their_turn and self._player_action_event: self._player_action_event.set(); self._player_action_event = None
                 reset_game = True
+            elif should_check_hand_end:
+                if was_their_turn: self._cancel_turn_timer()
+                events = self.player_left(player_id_to_remove, was_their_turn)
         await self.broadcast_game_state()
         if reset_game:
             for p in self.players.values():
@@ -231,22 +299,16 @@ class PokerGame:
             await self.broadcast("game_message", {"message": "Not enough players to continue. Waiting..."})
             await self.broadcast_game_state()
             return
-        if should_check_hand_end:
-            if was_their_turn:
-                 async with self._action_lock:
-                     if self._player_action_event: self._player_action_event.set(); self._player_action_event = None
-                 logging.debug(f"Set action event due to Player {player_id_to_remove} disconnect-fold.")
-            if not await self.check_hand_over_conditions() and was_their_turn:
-                 logging.debug(f"Player disconnected on turn. Checking round end / advancing.")
-                 await self.check_round_end()
+        await self.run_events(events)
 
     async def send_message(self, websocket, msg_type: str, payload: Any):
-        if websocket not in self.connected_websockets_set: return
-        try:
-            message = json.dumps({"type": msg_type, "payload": payload})
-            await websocket.send(message)
-        except websockets.exceptions.ConnectionClosed: logging.warning(f"Send failed: Conn Closed OK ws={getattr(websocket, 'id', id(websocket))}")
-        except Exception as e: logging.error(f"Send {msg_type} error ws={getattr(websocket, 'id', id(websocket))}: {e}", exc_info=False)
+        if websocket not in self.connected_websockets_set: logging.debug("Dropped %s for a connection that left %s.", msg_type, self.name); return
+        await self.send_raw(websocket, outbox_for(websocket).codec.encode(msg_type, payload), msg_type)
+
+    async def send_raw(self, websocket, message, msg_type: str = "frame"):
+        """Queues an encoded message on the connection's outbox; it is written at the end of the current tick."""
+        if websocket not in self.connected_websockets_set: logging.debug("Dropped %s for a connection that left %s.", msg_type, self.name); return
+        outbox_for(websocket).send(message)
 
     async def send_error(self, websocket, error_message: str):
         ws_id = getattr(websocket, 'id', id(websocket)); logging.warning(f"SEND_ERR ws={ws_id}: {error_message}")
@@ -254,567 +316,572 @@ class PokerGame:
 
     async def broadcast(self, msg_type: str, payload: Any, exclude_websockets: Set = set()):
         if not self.connected_websockets_set: return
-        tasks = [asyncio.create_task(self.send_message(ws, msg_type, payload)) for ws in list(self.connected_websockets_set) if ws not in exclude_websockets]
-        if tasks: await asyncio.wait(tasks)
+        frames = {}  # encoded once per codec in use
+        for ws in list(self.connected_websockets_set):
+            if ws in exclude_websockets: continue
+            box = outbox_for(ws); frame = frames.get(box.codec.name)
+            if frame is None: frame = frames[box.codec.name] = box.codec.encode(msg_type, payload)
+            box.send(frame)
+
+    def _state_frame(self, websocket, player_id: Optional[int], codec) -> Optional[Any]:
+        """The frame that brings `websocket` up to the current state version: nothing if it is already
+        there, a delta if it is one version behind and a full snapshot otherwise."""
+        sent = self.state_versions.get(websocket); version = self.renderer.version
+        if sent == version: return None
+        self.state_versions[websocket] = version
+        return self.renderer.delta_for(player_id, codec) if sent == version - 1 else self.renderer.frame_for(player_id, codec)
+
+    def _render_state(self, websocket, player_id: Optional[int]) -> Optional[Any]:
+        # Runs when the connection's outbox flushes, so the frame reflects the state at the end of the tick.
+        if websocket not in self.connected_websockets_set: return None
+        start = time.perf_counter(); self.renderer.refresh()
+        frame = self._state_frame(websocket, player_id, outbox_for(websocket).codec); metrics.RENDER_SECONDS.observe(time.perf_counter() - start)
+        return frame
 
     async def broadcast_game_state(self):
-        if not self.players: return
-        tasks = []
-        current_players = list(self.players.values())
-        for p in current_players:
-             if p.websocket in self.connected_websockets_set:
-                 state_for_player = self.get_state_for_player(p.id)
-                 tasks.append(asyncio.create_task(self.send_message(p.websocket, "game_state", state_for_player)))
-        if tasks: await asyncio.wait(tasks)
+        self._snapshot_dirty = True  # every state change is broadcast
+        if not self.players and not self.spectators: return
+        start = time.perf_counter()
+        recipients = [(p.websocket, p.id) for p in list(self.players.values()) if p.websocket in self.connected_websockets_set]
+        recipients.extend((ws, None) for ws in list(self.spectators))
+        for ws, pid in recipients: outbox_for(ws).send_state(functools.partial(self._render_state, ws, pid))
+        metrics.BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+    async def send_game_state(self, websocket, full: bool = False):
+        """Brings one connection up to date; `full` forces a snapshot (client-requested resync)."""
+        if full: self.state_versions.pop(websocket, None)
+        player = self.seated.get(websocket); player_id = player.id if player else None
+        outbox_for(websocket).send_state(functools.partial(self._render_state, websocket, player_id))
+
+    async def add_spectator(self, websocket) -> bool:
+        async with self._action_lock:
+            if self.closed: return False
+            self.spectators.add(websocket); self.connected_websockets_set.add(websocket)
+        logging.info(f"Spectator joined {self.name} ({websocket.remote_address}).")
+        await self.send_message(websocket, "spectating", {"tableId": self.table_id, "tableName": self.name})
+        await self.send_game_state(websocket)
+        return True
+
+    async def remove_spectator(self, websocket):
+        async with self._action_lock:
+            self.spectators.discard(websocket); self.connected_websockets_set.discard(websocket); self.state_versions.pop(websocket, None)
 
     def get_state_for_player(self, perspective_player_id: int) -> Dict[str, Any]:
         player_states = {}
         dealer_id = -1
-        current_stage = self.game_stage; current_cc = self.community_cards; current_pot = self.pot
+        current_stage = self.game_stage; current_cc = ints_to_cards(self.community_cards); current_pot = self.pot
         acting_player = self.current_player_id; is_reveal_stage = current_stage in ["showdown", "hand_over"]
         for pid, p in self.players.items():
             show_hand = (pid == perspective_player_id) or (is_reveal_stage and p.status != "folded")
             player_states[pid] = p.to_dict(show_hand=show_hand);
             if p.is_dealer: dealer_id = pid
         return {
-            "players": player_states, "community_cards": current_cc, "pot": current_pot,
+            "players": player_states, "community_cards": current_cc, "pot": current_pot, "pots": self.live_pots(),
             "current_player_id": acting_player, "dealer_id": dealer_id, "game_stage": current_stage,
             "bigBlind": BIG_BLIND
         }
 
-    async def game_loop(self):
-        logging.info("GAME LOOP STARTED")
+    def summary(self) -> Dict[str, Any]:
+        return {"tableId": self.table_id, "name": self.name, "players": len(self.players), "maxPlayers": self.max_players, "spectators": len(self.spectators), "stage": self.game_stage,
+                "actionTimeout": self.action_timeout}
+
+    async def game_loop(self, hand_in_progress: bool = False):
+        """Plays hands until fewer than two players can. `hand_in_progress` (a restored table) first waits for the current hand to end."""
+        logging.info(f"GAME LOOP STARTED ({self.name})")
         try:
             while True:
-                async with self._action_lock:
-                    current_players_list = list(self.players.values())
-                    named_players = [p for p in current_players_list if p.name is not None]
-                    can_continue = len(named_players) >= 2
-                if not can_continue:
-                    logging.warning("Game loop: Less than 2 named players. Stopping.")
-                    async with self._action_lock: self.game_stage = "idle"
-                    await self.broadcast("game_message", {"message": "Game paused. Waiting for players..."})
-                    await self.broadcast_game_state(); break
-                logging.info("-" * 20 + " Starting New Hand " + "-" * 20)
-                await self.start_new_hand_setup()
-                if self.game_stage != "hand_over": await self.run_betting_round()
-                if self.game_stage != "hand_over": await self.deal_community_cards("flop"); await self.run_betting_round()
-                if self.game_stage != "hand_over": await self.deal_community_cards("turn"); await self.run_betting_round()
-                if self.game_stage != "hand_over": await self.deal_community_cards("river"); await self.run_betting_round()
-                if self.game_stage != "hand_over": await self.perform_showdown()
-                logging.info(f"Hand concluded (Stage: {self.game_stage}). Waiting {HAND_END_DELAY}s...")
-                await self.broadcast("game_message", {"message": f"--- Next hand starting in {HAND_END_DELAY}s ---"})
-                await asyncio.sleep(HAND_END_DELAY)
+                if not hand_in_progress:
+                    async with self._action_lock:
+                        can_continue = self.can_start_hand()
+                        if can_continue:
+                            logging.info("-" * 20 + " Starting New Hand " + "-" * 20)
+                            self._hand_finished.clear(); events = self.start_hand()
+                        else: self.game_stage = "idle"
+                    if not can_continue:
+                        logging.warning("Game loop: Less than 2 named players with chips. Stopping.")
+                        await self.broadcast("game_message", {"message": "Game paused. Waiting for players..."})
+                        await self.broadcast_game_state(); break
+                    await self.run_events(events)
+                hand_in_progress = False
+                await self._hand_finished.wait()
+                logging.info(f"Hand concluded (Stage: {self.game_stage}). Waiting {self.hand_end_delay:g}s...")
+                await self.broadcast("game_message", {"message": f"--- Next hand starting in {self.hand_end_delay:g}s ---"})
+                await timers.sleep(self.hand_end_delay)
         except asyncio.CancelledError: logging.info("Game loop was cancelled.")
         except Exception as e: logging.exception(f"!!! UNEXPECTED ERROR IN GAME LOOP: {e} !!!")
         finally:
-             async with self._action_lock: self.game_stage = "idle"; self.game_loop_task = None
-             logging.info("GAME LOOP EXITED")
-
-    async def start_new_hand_setup(self):
-        logging.info("Setting up new hand...")
-        dealer_id = -1; sb_id = -1; bb_id = -1; sb_amt = 0; bb_amt = 0; first_actor_id = None
-        async with self._action_lock:
-            self.game_stage = "starting"; self.deck = create_deck(); random.shuffle(self.deck)
-            self.community_cards = []; self.pot = 0; self.current_bet = 0; self.last_raiser_id = None
-            self.current_player_id = None; self._player_action_event = None
-            self.actions_this_round = set()
-            eligible_players = {pid: p for pid, p in self.players.items() if p.stack > 0 and p.name is not None}
-            if len(eligible_players) < 2:
-                logging.warning("New hand setup failed: Less than 2 eligible players.")
-                self.game_stage = "idle"; raise Exception("Setup failed: Not enough eligible players.")
-            self.active_players_order = sorted(list(eligible_players.keys()))
-            num_eligible = len(self.active_players_order)
-            logging.debug(f"Eligible Player Order for Hand: {self.active_players_order}")
-            for player in self.players.values():
-                player.last_hand_rank = None
-                if player.id in eligible_players:
-                    player.hand = []; player.current_bet = 0; player.total_bet_this_hand = 0
-                    player.status = "active"; player.is_dealer = False; player.last_action = None
-                else:
-                    player.status = "waiting"; player.hand = []; player.current_bet = 0
-                    player.total_bet_this_hand = 0; player.is_dealer = False; player.last_action = None
-            if self.dealer_button_pos == -1: self.dealer_button_pos = random.randrange(num_eligible)
-            else: self.dealer_button_pos = (self.dealer_button_pos + 1) % num_eligible
-            dealer_found = False
-            for i in range(num_eligible):
-                 check_idx = (self.dealer_button_pos + i) % num_eligible
-                 if self.active_players_order[check_idx] in eligible_players:
-                     self.dealer_button_pos = check_idx; dealer_found = True; break
-            if not dealer_found: logging.error("Failed to find a valid dealer position!"); self.dealer_button_pos = 0
-            dealer_id = self.active_players_order[self.dealer_button_pos]; self.players[dealer_id].is_dealer = True
-            if num_eligible == 2:
-                 self.small_blind_pos = self.dealer_button_pos; self.big_blind_pos = (self.dealer_button_pos + 1) % num_eligible
-            else:
-                 self.small_blind_pos = (self.dealer_button_pos + 1) % num_eligible; self.big_blind_pos = (self.dealer_button_pos + 2) % num_eligible
-            sb_id = self.active_players_order[self.small_blind_pos]; bb_id = self.active_players_order[self.big_blind_pos]
-            deal_start_pos = (self.dealer_button_pos + 1) % num_eligible
-            for _ in range(2):
-                for i in range(num_eligible):
-                    p_idx = (deal_start_pos + i) % num_eligible; p_id = self.active_players_order[p_idx]
-                    if self.players[p_id].status == "active":
-                         if self.deck: self.players[p_id].hand.append(self.deck.pop())
-                         else: logging.error("Deck ran out during initial deal!"); raise Exception("Deck Empty during deal")
-            sb_amt = self._post_blind_internal(sb_id, SMALL_BLIND); bb_amt = self._post_blind_internal(bb_id, BIG_BLIND)
-            self.current_bet = bb_amt; self.last_raiser_id = bb_id
-            start_action_pos = (self.big_blind_pos + 1) % num_eligible;
-            for i in range(num_eligible):
-                check_idx = (start_action_pos + i) % num_eligible; check_id = self.active_players_order[check_idx]
-                if self.players[check_id].can_act(): first_actor_id = check_id; break
-            if first_actor_id is None: logging.warning("No active player found to start preflop betting (all-in?)."); self.current_player_id = None
-            else: self.current_player_id = first_actor_id
-            self.game_stage = "preflop";
-        dealer_player = self.players.get(dealer_id); sb_player = self.players.get(sb_id); bb_player = self.players.get(bb_id)
-        dealer_name = dealer_player.name if dealer_player else f"P{dealer_id}"; sb_name = sb_player.name if sb_player else f"P{sb_id}"; bb_name = bb_player.name if bb_player else f"P{bb_id}"
-        logging.info(f"Hand Setup Complete: Dealer: {dealer_name}({dealer_id}), SB: {sb_name}({sb_id}), BB: {bb_name}({bb_id})")
-        await self.broadcast("game_message", {"message": f"--- Starting New Hand --- Dealer: {dealer_name}"})
-        await self.broadcast_game_state(); await asyncio.sleep(0.5)
-        sb_status = self.players.get(sb_id).status if self.players.get(sb_id) else 'unknown'
-        bb_status = self.players.get(bb_id).status if self.players.get(bb_id) else 'unknown'
-        await self.broadcast("game_message", {"message": f"{sb_name} posts Small Blind ${sb_amt}" + (" (All-in)" if sb_status=='all-in' else "")})
-        await self.broadcast_game_state(); await asyncio.sleep(0.2)
-        await self.broadcast("game_message", {"message": f"{bb_name} posts Big Blind ${bb_amt}" + (" (All-in)" if bb_status=='all-in' else "")})
-        await self.broadcast_game_state(); await asyncio.sleep(0.2)
-        if await self.check_hand_over_conditions(): return
-        current_player = self.players.get(self.current_player_id)
-        if current_player: logging.info(f"Preflop betting starts with {current_player.name or f'P{self.current_player_id}'}")
-        else: logging.warning("Setup done but no first actor found for preflop. Hand should end.")
-
-    def _post_blind_internal(self, player_id: int, amount: int) -> int:
-        player = self.players[player_id]; blind_amount = min(amount, player.stack)
-        player.stack -= blind_amount; player.current_bet = blind_amount; player.total_bet_this_hand += blind_amount
-        self.pot += blind_amount; player.last_action = "blind"
-        if player.stack == 0: player.status = "all-in"
-        logging.info(f"{player.name or f'P{player.id}'} posts blind ${blind_amount}" + (" (All-in)" if player.status=='all-in' else ""))
-        return blind_amount
-
-    async def run_betting_round(self):
-        async with self._action_lock:
-             current_stage = self.game_stage; active_order = list(self.active_players_order)
-             num_active_players = len(active_order); dealer_pos = self.dealer_button_pos
-        if current_stage == "hand_over": return
-        logging.info(f"--- Starting Betting Round: {current_stage.upper()} ---")
-        if num_active_players == 0: return
-        if current_stage != "preflop":
-             async with self._action_lock:
-                self.current_bet = 0; self.last_raiser_id = None; self.current_player_id = None
-                self.actions_this_round = set()
-                for pid in active_order:
-                    if (p := self.players.get(pid)) and p.status != "folded":
-                        p.current_bet = 0
-                        p.last_action = None
-                first_actor_pos = -1; num_in_order = len(self.active_players_order)
-                if num_in_order == 0: logging.error("RunBettingRound: active_players_order empty post-flop!"); return
-                start_idx = (dealer_pos + 1) % num_in_order
-                for i in range(num_in_order):
-                    check_pos = (start_idx + i) % num_in_order; p_id = self.active_players_order[check_pos]
-                    player = self.players.get(p_id)
-                    if player and player.can_act(): first_actor_pos = check_pos; break
-                if first_actor_pos != -1: self.current_player_id = self.active_players_order[first_actor_pos]
-                else: logging.warning(f"No active player found to start betting round {current_stage}."); self.current_player_id = None
-             await self.broadcast_game_state()
-             first_actor_player = self.players.get(self.current_player_id)
-             first_actor_name = first_actor_player.name if first_actor_player else "None"
-             logging.info(f"Post-flop round ({current_stage}) starts with {first_actor_name}")
-             if self.current_player_id is None: await self.check_hand_over_conditions(); return
-        action_count = 0; max_actions = num_active_players * 3 + 5
-        while action_count < max_actions:
-            action_count += 1; logging.debug(f"Betting loop iter {action_count}/{max_actions} Stage: {current_stage}")
-            async with self._action_lock:
-                current_actor_id = self.current_player_id; last_aggro_id = self.last_raiser_id
-                current_stage_check = self.game_stage
-            if current_stage_check == "hand_over": logging.info("Betting loop ending: Stage changed to hand_over."); return
-            if await self.check_hand_over_conditions(): logging.info(f"Betting loop ending: Hand over condition met."); return
-            async with self._action_lock: round_complete = self.is_betting_round_complete(last_aggro_id)
-            if round_complete: logging.info(f"Betting round {current_stage} complete."); return
-            if current_actor_id is None: logging.error("Betting loop ERROR: current_player_id is None! Advancing."); await self.advance_to_next_player(); continue
-            current_player = self.players.get(current_actor_id)
-            if not current_player: logging.error(f"Betting loop ERROR: Player {current_actor_id} not found! Advancing."); await self.advance_to_next_player(); continue
-            if not current_player.can_act(): logging.debug(f"Betting loop: Skipping P{current_actor_id} (Status: {current_player.status}). Advancing."); await self.advance_to_next_player(); await asyncio.sleep(0.01); continue
-            await self.request_player_action()
-            logging.debug(f"Betting loop: Waiting for action event from P{current_actor_id}")
-            async with self._action_lock: current_event = self._player_action_event
-            if current_event:
-                try:
-                    await asyncio.wait_for(current_event.wait(), timeout=ACTION_TIMEOUT)
-                    logging.debug(f"Betting loop: Action event received/set for P{current_actor_id}")
-                except asyncio.TimeoutError:
-                    logging.warning(f"Player P{current_actor_id} timed out on stage {current_stage}.")
-                    await self.handle_player_action(current_actor_id, "fold", None)
-            else:
-                 logging.warning(f"Betting loop: No action event found for P{current_actor_id} after request?")
-                 await asyncio.sleep(0.1)
-        logging.error(f"Betting round {current_stage} exceeded max actions ({max_actions})! Ending round prematurely.")
-
-    async def request_player_action(self):
-        player_id_to_request = None; player_websocket = None; payload = None; should_advance = False
+             self._stop_flow()
+             async with self._action_lock: self.abort_hand(); self.game_stage = "idle"; self.game_loop_task = None
+             logging.info(f"GAME LOOP EXITED ({self.name})")
+
+    async def run_events(self, events: List[Event]):
+        """Delivers what the engine produced: messages to the table, prompts and errors to one
+        player. A turn starts the action clock; a pause schedules the engine's continuation."""
+        for event in events:
+            kind = event[0]
+            if kind == "state": await self.broadcast_game_state()
+            elif kind == "message": await self.broadcast("game_message", {"message": event[1]})
+            elif kind == "action": await self.broadcast("player_action", event[1])
+            elif kind == "turn":
+                _, player_id, payload, serial = event
+                player = self.players.get(player_id)
+                if player: await self.send_message(player.websocket, "player_turn", payload)
+                self._last_turn = (player_id, payload); self._arm_turn_timer(player_id, serial)
+                await self.broadcast("turn_timer", self._turn_clock())
+            elif kind == "error":
+                player = self.players.get(event[1])
+                if player: await self.send_error(player.websocket, event[2])
+            elif kind == "equity": asyncio.create_task(self.broadcast_equity(*event[1:]))
+            elif kind == "showdown": await self.broadcast("showdown", event[1])
+            elif kind == "pot_awarded": logging.info("Broadcasting pot_awarded: %s", event[1]['winners']); await self.broadcast("pot_awarded", event[1])
+            elif kind == "pause": self._flow_timer = timers.call_later(event[1], self._resume_flow, event[2])
+            elif kind == "hand_over": metrics.HANDS.inc(); self._cancel_turn_timer(); self._settle(self.players.values()); self.checkpoint(); self._hand_finished.set()
+
+    async def _resume_flow(self, token: int):
+        self._flow_timer = None
+        async with self._action_lock: events = self.resume(token)
+        await self.run_events(events)
+
+    def _arm_turn_timer(self, player_id: int, serial: int):
+        """Starts the action clock for a new turn. The re-prompt after an invalid action is the same
+        turn: the clock, or the time bank already running, carries on towards the same deadline."""
+        if self._turn_timer and self._clock_turn[0] == player_id: return
+        self._cancel_turn_timer(); self._clock_turn = (player_id, serial)
+        self._turn_timer = timers.call_later(self.action_timeout, self._turn_timed_out, player_id, serial)
+
+    def _cancel_turn_timer(self):
+        if self._turn_timer: self._turn_timer.cancel(); self._turn_timer = None
+        if self._bank_clock:  # charge the player for the time bank they used
+            player_id, started = self._bank_clock; self._bank_clock = None
+            if player_id in self.players: self.time_banks[player_id] = max(0.0, self.time_banks.get(player_id, self.time_bank) - (time.monotonic() - started))
+
+    def _turn_clock(self) -> Dict[str, Any]:
+        """The turn_timer payload: who is on the clock, for how many more seconds, and whether that is their time bank."""
+        return {"playerId": self.current_player_id, "seconds": round(self._turn_timer.remaining(), 1) if self._turn_timer else 0, "timeBank": self._bank_clock is not None}
+
+    async def _turn_timed_out(self, player_id: int, serial: int):
         async with self._action_lock:
-            if self.current_player_id is None: logging.error("Request Action Error: No current player ID set."); return
-            player = self.players.get(self.current_player_id)
-            if not player: logging.error(f"Request Action Error: Player {self.current_player_id} not found."); return
-            if not player.can_act(): logging.warning(f"Request Action: Player {player.name or f'P{player.id}'} cannot act (Status: {player.status}). Advancing turn."); should_advance = True
+            if (player_id, serial) != self._clock_turn or player_id != self.current_player_id: return
+            player = self.players.get(player_id); bank = self.time_banks.get(player_id, self.time_bank)
+            if self._bank_clock is None and bank >= 1 and player and not player.away:  # someone who is away can't use the extra time
+                logging.info("Player P%s is on their time bank (%.0fs) on stage %s.", player_id, bank, self.game_stage)
+                self._turn_timer = timers.call_later(bank, self._turn_timed_out, player_id, serial); self._bank_clock = (player_id, time.monotonic())
+                events = None
             else:
-                player_id = player.id; player_stack = player.stack; player_bet = player.current_bet
-                player_name = player.name or f"P{player.id}"; round_bet = self.current_bet; stage = self.game_stage
-                last_raiser = self.last_raiser_id; bb_id = self.active_players_order[self.big_blind_pos] if self.big_blind_pos < len(self.active_players_order) else None
-                player_websocket = player.websocket; player_id_to_request = player_id
-                allowed = ["fold"]; call_needed = max(0, round_bet - player_bet); eff_stack = player_stack
-                if player_bet == round_bet: allowed.append("check"); call_amt = 0
-                elif call_needed > 0 and eff_stack > 0: allowed.append("call"); call_amt = min(call_needed, eff_stack)
-                else: call_amt = 0
-                max_possible_total_bet = player_bet + eff_stack; min_open_bet = BIG_BLIND
-                prev_bet_level = self.get_previous_bet_level(); last_raise_size = round_bet - prev_bet_level
-                min_raise_delta = max(last_raise_size, BIG_BLIND); req_min_raise_total = round_bet + min_raise_delta
-                min_slider_value = 0; can_increase_bet = eff_stack > 0
-                if round_bet == 0 and can_increase_bet:
-                     allowed.append("bet"); min_slider_value = min(min_open_bet, max_possible_total_bet)
-                is_bb_preflop_option = (stage == "preflop" and player_id == bb_id and player_bet == round_bet and last_raiser == bb_id)
-                if (round_bet > 0 or is_bb_preflop_option) and can_increase_bet:
-                     if max_possible_total_bet > round_bet:
-                         allowed.append("raise")
-                         min_raise_total_this_player = min(req_min_raise_total, max_possible_total_bet)
-                         min_slider_value = max(min_slider_value, min_raise_total_this_player)
-                final_min_slider = min_slider_value; final_max_slider = max_possible_total_bet
-                if final_min_slider > final_max_slider: final_min_slider = final_max_slider
-                if final_min_slider == final_max_slider and final_min_slider <= round_bet:
-                     if 'bet' in allowed: allowed.remove('bet')
-                     if 'raise' in allowed: allowed.remove('raise')
-                     final_min_slider = 0; final_max_slider = 0
-                logging.debug(f" P{player_id} Requesting Action. Opts: {allowed}, CallAmt:{call_amt}, MinSlider:{final_min_slider}, MaxSlider:{final_max_slider}")
-                payload = {
-                    "playerId": player_id, "actions": allowed, "callAmount": call_amt, "minRaise": final_min_slider,
-                    "maxRaise": final_max_slider, "currentBet": round_bet, "stack": player_stack, "bigBlind": BIG_BLIND
-                }
-                self._player_action_event = asyncio.Event(); logging.debug(f"Created action event for P{player_id}")
-        if should_advance: await self.advance_to_next_player(); return
-        if player_websocket and payload:
-            logging.info(f"Requesting action from {player_name} (ID: {player_id_to_request})")
-            await self.send_message(player_websocket, "player_turn", payload)
-            await self.broadcast_game_state()
+                logging.warning(f"Player P{player_id} timed out on stage {self.game_stage}.")
+                self._cancel_turn_timer(); events = self.act(player_id, "fold")
+        if events is None: await self.broadcast("turn_timer", self._turn_clock())
+        else: await self.run_events(events)
 
-    def get_previous_bet_level(self) -> int:
-        bets = sorted([p.current_bet for pid in self.active_players_order if (p := self.players.get(pid)) and p.status not in ['folded', 'waiting'] and p.current_bet < self.current_bet], reverse=True)
-        return bets[0] if bets else 0
+    def _stop_flow(self):
+        """Drops the pending pause and action timeout, e.g. when the game loop stops."""
+        self._cancel_turn_timer()
+        if self._flow_timer: self._flow_timer.cancel(); self._flow_timer = None
+        self._hand_finished.set()
 
     async def handle_player_action(self, player_id: int, action: str, amount: Optional[int] = None):
-        error_to_send = None; final_valid_action = False; final_broadcast_payload = None; player_websocket = None; event_to_set = None
+        start = time.perf_counter()
         async with self._action_lock:
-            logging.debug(f"HANDLE_ACTION: P{player_id} attempts '{action}' {f'(${amount})' if amount else ''}. Current Actor: P{self.current_player_id}, Stage: {self.game_stage}, RoundBet: ${self.current_bet}")
-            if self.game_stage in ["idle", "starting", "hand_over", "showdown"]: logging.warning(f"Action '{action}' ignored: Invalid game stage ({self.game_stage})."); return
-            if player_id != self.current_player_id: logging.warning(f"Action '{action}' ignored: Player {player_id} acted out of turn (Expected P{self.current_player_id})."); error_to_send = ("Not your turn.", player_id); valid_action = False
-            else:
-                player = self.players.get(player_id)
-                if not player: logging.error(f"Action '{action}' Error: Player {player_id} (current player) not found!"); return
-                player_name = player.name or f"P{player.id}"; player_websocket = player.websocket
-                if not player.can_act(): logging.warning(f"Action '{action}' ignored: {player_name} cannot act (Status: {player.status}, Stack: {player.stack})."); error_to_send = (f"Cannot act (Status: {player.status}).", player_id); valid_action = False; event_to_set = self._player_action_event
-                else:
-                    logging.info(f"Processing action: {player_name} - {action.upper()} {f'${amount}' if amount is not None else ''}")
-                    valid_action = False; error_msg = None; broadcast_payload = {"playerId": player_id, "action": action, "amount": None}
-                    if action == "fold": player.status = "folded"; player.hand = []; player.last_action = "fold"; player.last_hand_rank = None; valid_action = True
-                    elif action == "check":
-                        if player.current_bet == self.current_bet: player.last_action = "check"; valid_action = True
-                        else: error_msg = f"Cannot check. Current bet to match is ${self.current_bet}."
-                    elif action == "call":
-                        call_needed = max(0, self.current_bet - player.current_bet)
-                        if call_needed > 0:
-                            actual_call = min(call_needed, player.stack); player.stack -= actual_call; bet_inc = actual_call
-                            player.current_bet += bet_inc; player.total_bet_this_hand += bet_inc; self.pot += bet_inc
-                            player.last_action = "call"; valid_action = True; broadcast_payload["amount"] = player.current_bet
-                            if player.stack == 0: player.status = "all-in"; logging.info(f"{player_name} is All-in calling.")
-                        else: error_msg = "Cannot call (already matched bet or nothing to call)."
-                    elif action == "bet" or action == "raise":
-                        if amount is None or not isinstance(amount, int) or amount <= 0: error_msg = "Invalid bet/raise amount provided."
-                        else:
-                            total_bet_intended = amount; bet_increase = total_bet_intended - player.current_bet
-                            if bet_increase <= 0: error_msg = f"Bet/Raise amount (${total_bet_intended}) must be greater than your current bet (${player.current_bet})."
-                            elif bet_increase > player.stack: error_msg = f"Insufficient stack ({player.stack}) for bet increase of ${bet_increase} (Total: ${total_bet_intended})."
-                            else:
-                                is_opening_action = (self.current_bet == 0); bb_id = self.active_players_order[self.big_blind_pos] if self.big_blind_pos < len(self.active_players_order) else None
-                                is_bb_preflop_option = (self.game_stage == "preflop" and player.id == bb_id and player.current_bet == self.current_bet)
-                                if action == "bet" and not is_opening_action: error_msg = f"Invalid action: Cannot 'bet' when facing a bet (${self.current_bet}). Use 'call' or 'raise'."
-                                elif action == "raise" and is_opening_action and not is_bb_preflop_option: error_msg = f"Invalid action: Cannot 'raise' when there is no bet to raise. Use 'bet'."
-                                else:
-                                    is_all_in = (bet_increase == player.stack); min_open = BIG_BLIND; prev_bet = self.get_previous_bet_level()
-                                    last_raise_size = self.current_bet - prev_bet; min_raise_delta = max(last_raise_size, BIG_BLIND)
-                                    req_min_raise_total = self.current_bet + min_raise_delta; min_legal_total = min_open if action == "bet" else req_min_raise_total
-                                    if total_bet_intended < min_legal_total and not is_all_in: error_msg = f"Amount too small. Minimum {action} total is ${min_legal_total}."
-                                    else:
-                                        player.stack -= bet_increase; player.current_bet = total_bet_intended; player.total_bet_this_hand += bet_increase
-                                        self.pot += bet_increase; player.last_action = action; valid_action = True; broadcast_payload["amount"] = total_bet_intended
-                                        prev_round_bet = self.current_bet; self.current_bet = total_bet_intended
-                                        is_full_aggro = False
-                                        if action == "bet" and total_bet_intended > 0: is_full_aggro = True
-                                        elif action == "raise" and total_bet_intended >= req_min_raise_total: is_full_aggro = True
-                                        if is_all_in and total_bet_intended < req_min_raise_total and action == "raise": is_full_aggro = False
-                                        if is_full_aggro: self.last_raiser_id = player_id; self.actions_this_round = {player_id}; logging.debug(f" Action by {player_name} (${total_bet_intended}) reopens betting. Reset actions_this_round.")
-                                        else: logging.debug(f" Action by {player_name} (${total_bet_intended}) does not fully reopen betting (MinReq: ${req_min_raise_total}).")
-                                        if player.stack == 0: player.status = "all-in"; logging.info(f"{player_name} is All-in {action}ing ${total_bet_intended}.")
-                    else: error_msg = f"Unknown action type received: {action}"
-                    if valid_action: self.actions_this_round.add(player_id)
-                    final_valid_action = valid_action; final_broadcast_payload = broadcast_payload if final_valid_action else None
-                    if error_to_send is None and error_msg: error_to_send = (error_msg, player_id)
-                    if self._player_action_event: event_to_set = self._player_action_event; self._player_action_event = None
-                    else: logging.warning(f"No action event found for P{player_id} during handle_action post-processing.")
-        if event_to_set: logging.debug(f"Setting action event for P{player_id} outside lock."); event_to_set.set()
-        if final_valid_action:
-            if final_broadcast_payload: await self.broadcast("player_action", final_broadcast_payload)
-            await self.broadcast_game_state()
-            if not await self.check_hand_over_conditions(): await self.check_round_end()
-            else: logging.info("Hand ended immediately after valid action.")
-        else:
-             if error_to_send:
-                  err_msg, err_pid = error_to_send; err_player = self.players.get(err_pid)
-                  if err_player and err_player.websocket in self.connected_websockets_set: await self.send_error(err_player.websocket, err_msg)
-             if player_id == self.current_player_id: logging.info(f"Invalid action by P{player_id}. Re-requesting action."); await self.request_player_action()
+            events = self.act(player_id, action, amount)
+            if events and events[0][0] != "error": self._cancel_turn_timer(); metrics.ACTIONS.inc()
+        await self.run_events(events)
+        metrics.ACTION_SECONDS.observe(time.perf_counter() - start)
+
+    async def broadcast_equity(self, stage: str, contenders: Dict[int, List[int]], board: List[int]):
+        start = time.perf_counter()
+        try: equity = await equity_engine.calculate(contenders, board)
+        except Exception as e: logging.error(f"Equity calculation failed on {stage}: {e}", exc_info=True); return
+        logging.info(f"All-in equity on {stage} for {len(contenders)} players computed in {(time.perf_counter() - start) * 1000:.1f} ms")
+        await self.broadcast("equity", {"stage": stage, "players": equity})
+class TableManager:
+    """Registry of independent tables. Each PokerGame keeps its own lock and game loop task."""
+    def __init__(self, first_table_id: int = 1, table_id_step: int = 1):
+        self.tables: Dict[int, PokerGame] = {}
+        self.next_table_id: int = first_table_id
+        self.table_id_step: int = table_id_step  # workers in a cluster hand out interleaved IDs
+        self.held: Dict[str, PokerGame] = {}  # player name -> restored table holding their seat
+        self.sessions: Dict[str, PokerGame] = {}  # resume token -> table of its seat
+
+    def create_table(self, name: Optional[str] = None, max_players: int = MAX_PLAYERS, action_timeout: Optional[float] = None) -> PokerGame:
+        table = PokerGame(self.next_table_id, name, max_players, action_timeout); table.hand_log = hand_log
+        self.tables[table.table_id] = table; self.next_table_id += self.table_id_step
+        logging.info(f"Created {table.name} (ID: {table.table_id}, seats: {max_players}). Tables open: {len(self.tables)}")
+        return table
+
+    def get_table(self, table_id: int) -> Optional[PokerGame]:
+        return self.tables.get(table_id)
+
+    def find_open_table(self) -> PokerGame:
+        for table in self.tables.values():
+            if not table.closed and not table.restoring and len(table.players) < table.max_players: return table
+        return self.create_table()
+
+    def list_tables(self) -> List[Dict[str, Any]]:
+        return [t.summary() for t in self.tables.values() if not t.closed]
+
+    def directory(self) -> List[Dict[str, Any]]:
+        """list_tables() as published to the other workers: a restored table also names the players whose seats it holds."""
+        return [dict(t.summary(), held=[seat.name for seat in t.held_seats()]) if t.restoring else t.summary() for t in self.tables.values() if not t.closed]
+
+    async def remove_table(self, table_id: int):
+        table = self.tables.get(table_id)
+        if not table: return
+        async with table._action_lock:
+            if table.players or table.spectators: logging.debug(f"Not removing {table.name}: {len(table.players)} player(s) seated, {len(table.spectators)} watching."); return
+            table.closed = True; del self.tables[table_id]
+            if snapshots: snapshots.remove(table_id)
+            task = table.game_loop_task
+        if task and not task.done():
+            task.cancel()
+            try: await task
+            except asyncio.CancelledError: pass
+        logging.info(f"Removed {table.name}. Tables open: {len(self.tables)}")
+
+    def restore(self, states: List[Dict[str, Any]]) -> int:
+        """Rebuilds the tables of a snapshot. Each holds its players' seats until they are all back or
+        RESTORE_GRACE runs out; returns how many tables came back."""
+        restored: List[PokerGame] = []
+        for state in states:
+            if link and not link.is_local(state["id"]): logging.warning(f"Snapshot of table {state['id']} belongs to another worker; dropped."); snapshots.remove(state["id"]); continue
+            table = PokerGame.from_snapshot(state); table.hand_log = hand_log
+            if not table.players: snapshots.remove(table.table_id); continue
+            self.tables[table.table_id] = table; restored.append(table)
+            while self.next_table_id <= table.table_id: self.next_table_id += self.table_id_step
+            for p in table.players.values():
+                self.held[p.name] = table
+                if bankrolls: bankrolls.claim(p.name)
+        if restored: timers.call_later(RESTORE_GRACE, self._restore_deadline, restored)
+        return len(restored)
+
+    async def _restore_deadline(self, restored: List[PokerGame]):
+        for table in restored:
+            if table.restoring and not table.closed: await self.resume_restored(table)
+
+    async def resume_restored(self, table: PokerGame):
+        for seat in await table.resume_restored():
+            self.held.pop(seat.name, None); await self.leave(table, seat)
+        if not table.closed: await table.check_start_game()
+
+    async def reclaim(self, websocket, name: str) -> Optional[Tuple[PokerGame, Player]]:
+        """The table and player of a seat held for `name`, now given back to `websocket`."""
+        table = self.held.pop(name, None)
+        if not table or table.closed: return None
+        token = new_resume_token(table.table_id)
+        player = await table.reclaim_seat(name, websocket, token)
+        if player: self.sessions[token] = table
+        if player and not table.held_seats(): await self.resume_restored(table)
+        return (table, player) if player else None
+
+    async def seat(self, websocket, table: PokerGame, name: Optional[str]) -> Optional[Player]:
+        token = new_resume_token(table.table_id)
+        player = await table.register_player(websocket, token)
+        if player: self.sessions[token] = table
+        if player and name: await table.set_player_name(player.id, name)
+        return player
+
+    async def resume(self, websocket, token: str, version: Optional[int]) -> Optional[Tuple[PokerGame, Player]]:
+        table = self.sessions.get(token)
+        if not table or table.closed: return None
+        player = await table.resume_seat(token, websocket, version)
+        if not player: return None
+        await table.check_start_game()  # the game may have stopped for want of players while they were away
+        return table, player
+
+    async def leave(self, table: PokerGame, websocket, hold: bool = False):
+        """Takes a connection off a table. A dropped connection (`hold`) keeps its seat for
+        SESSION_GRACE seconds, and while a restored table waits for its players every seat is held."""
+        if (table.restoring or (hold and SESSION_GRACE > 0)) and (seat := await table.hold_seat(websocket)):
+            if table.restoring: self.held[seat.name] = table
+            else: timers.call_later(SESSION_GRACE, self._end_hold, table, seat)
+            return
+        session = player.session if (player := table.player_for(websocket)) else None
+        if websocket in table.spectators: await table.remove_spectator(websocket)
+        else: await table.unregister_player(websocket)
+        if session: self.sessions.pop(session, None)
+        if not table.players and not table.spectators: await self.remove_table(table.table_id)
 
-    async def check_hand_over_conditions(self) -> bool:
-        is_over = False; winner_id = None; pot_to_award = 0
-        async with self._action_lock:
-            if self.game_stage == "hand_over": return True
-            contenders = [p for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ["active", "all-in"]]
-            num_contenders = len(contenders); is_over = num_contenders <= 1
-            if is_over:
-                 logging.info(f"CHECK_HAND_OVER: Only {num_contenders} contender(s) remain. Ending hand."); self.game_stage = "hand_over"; self.current_player_id = None
-                 pot_to_award = self.pot; self.pot = 0; winner_id = contenders[0].id if num_contenders == 1 else None
-                 if winner_id is None and num_contenders == 0: logging.warning("Hand ended with 0 contenders? Pot disappears?")
-                 if self._player_action_event: self._player_action_event.set(); self._player_action_event = None; logging.debug("Cleared action event on hand over check.")
-        if is_over: await self.award_pot(winner_id, pot_to_award, is_uncontested=True)
-        logging.debug(f"check_hand_over result: {is_over}")
-        return is_over
-
-    def is_betting_round_complete(self, last_aggressor_id: Optional[int]) -> bool:
-        actionable = [p for pid in self.active_players_order if (p := self.players.get(pid)) and p.can_act()]
-        if not actionable: logging.debug("is_round_complete: No actionable players left. TRUE"); return True
-        all_matched_or_allin = True
-        for p in self.players.values():
-            if p.id not in self.active_players_order or p.status in ["waiting", "folded"]: continue
-            if p.status != "all-in" and p.current_bet < self.current_bet:
-                logging.debug(f"is_round_complete: P{p.id} Bet:${p.current_bet} < RoundBet:${self.current_bet}. FALSE"); all_matched_or_allin = False; break
-        if not all_matched_or_allin: return False
-        is_bb_preflop_option = False
-        if self.game_stage == "preflop" and self.current_player_id is not None and self.big_blind_pos < len(self.active_players_order):
-            bb_player_id = self.active_players_order[self.big_blind_pos]
-            if self.current_player_id == bb_player_id and last_aggressor_id == bb_player_id:
-                 bb_player = self.players.get(bb_player_id)
-                 if bb_player and bb_player.last_action == "blind": is_bb_preflop_option = True
-        if is_bb_preflop_option: logging.debug(f"is_round_complete: BB Preflop Option pending for P{self.current_player_id}. FALSE"); return False
-        if last_aggressor_id is not None:
-            if self.current_player_id == last_aggressor_id: logging.debug(f"is_round_complete: Action back on aggressor P{last_aggressor_id}. TRUE"); return True
-            else: logging.debug(f"is_round_complete: Aggressor P{last_aggressor_id} exists, action not back on them yet (Current: P{self.current_player_id}). FALSE"); return False
-        else:
-            eligible_actor_ids = {pid for pid in self.active_players_order if (p := self.players.get(pid)) and p.status not in ['folded', 'waiting', 'all-in']}
-            if not eligible_actor_ids: logging.debug("is_round_complete: No aggressor and no eligible actors left. TRUE"); return True
-            round_complete_check = self.actions_this_round.issuperset(eligible_actor_ids)
-            logging.debug(f"is_round_complete: No aggressor. Actions taken: {self.actions_this_round}. Eligible actors: {eligible_actor_ids}. Complete? {round_complete_check}")
-            return round_complete_check
-
-    async def check_round_end(self):
-        logging.debug("Entering check_round_end")
-        round_complete = False; current_actor_before_check = self.current_player_id
-        async with self._action_lock:
-            if self.game_stage == "hand_over": logging.debug("check_round_end: Hand is over, exiting."); return
-            round_complete = self.is_betting_round_complete(self.last_raiser_id)
-            logging.debug(f"check_round_end: is_betting_round_complete result = {round_complete}")
-        if round_complete: logging.info(f"Confirmed: Betting round {self.game_stage} ended.")
-        else:
-            logging.debug("check_round_end: Round not complete, advancing turn.")
-            await self.advance_to_next_player()
-            async with self._action_lock:
-                 current_actor_after_advance = self.current_player_id; player_can_still_act = False
-                 if current_actor_after_advance is not None:
-                      player = self.players.get(current_actor_after_advance)
-                      if player: player_can_still_act = player.can_act()
-                 if current_actor_after_advance == current_actor_before_check and player_can_still_act:
-                      logging.warning(f"check_round_end: Advancing turn failed to change player from P{current_actor_before_check}! Still their turn. Possible loop?")
-                      if self._player_action_event: logging.warning("Force setting action event as turn didn't advance."); self._player_action_event.set(); self._player_action_event = None
-
-    async def advance_to_next_player(self):
-        async with self._action_lock:
-            original_player_id = self.current_player_id; logging.debug(f"Attempting to advance turn from P{original_player_id}")
-            num_players_in_order = len(self.active_players_order)
-            if num_players_in_order == 0: logging.warning("Advance Turn Failed: No players in active order."); self.current_player_id = None; return
-            try: start_idx = self.active_players_order.index(original_player_id) if original_player_id is not None else -1
-            except ValueError: logging.error(f"Advance Turn Error: P{original_player_id} not in active order {self.active_players_order}. Starting search."); start_idx = -1
-            next_player_found = False
-            for i in range(1, num_players_in_order + 1):
-                next_idx = (start_idx + i) % num_players_in_order; next_pid = self.active_players_order[next_idx]; player = self.players.get(next_pid)
-                logging.debug(f"Advance check: Pos {next_idx} -> P{next_pid} (Status: {player.status if player else 'N/A'}, Stack: {player.stack if player else 'N/A'})")
-                if player and player.can_act():
-                    self.current_player_id = next_pid; player_name = player.name or f"P{next_pid}"
-                    logging.info(f"Advanced turn from P{original_player_id} -> P{self.current_player_id} ('{player_name}')")
-                    if self._player_action_event: self._player_action_event.set(); self._player_action_event = None; logging.debug("Cleared action event on turn advance.")
-                    next_player_found = True; break
-            if not next_player_found:
-                 logging.warning("Advance Turn Warning: No actionable players found in the loop.")
-                 self.current_player_id = None
-                 if self._player_action_event: self._player_action_event.set(); self._player_action_event = None; logging.debug("Cleared action event on loop end (no next player found).")
-
-    async def deal_community_cards(self, stage: str):
-        logging.info(f"Dealing {stage.upper()}...")
-        error_msg = None; new_cards = []
-        async with self._action_lock:
-            if self.game_stage == "hand_over": logging.debug(f"Skipping deal '{stage}': Hand already over."); return
-            if not self.deck: logging.error(f"Deck empty before dealing {stage}!"); self.game_stage = "hand_over"; error_msg = "Error: Deck ran out of cards!"; return
-            card_count = 0; next_stage = ""
-            if stage == "flop": card_count = 3; next_stage = "flop"
-            elif stage == "turn": card_count = 1; next_stage = "turn"
-            elif stage == "river": card_count = 1; next_stage = "river"
-            else: logging.error(f"Invalid stage '{stage}' provided to deal_community_cards."); return
-            try:
-                if self.deck: burned = self.deck.pop(); logging.debug(f"Burned card: {burned}")
-                else: raise IndexError("Deck empty before burning card")
-                for _ in range(card_count):
-                    if self.deck: new_cards.append(self.deck.pop())
-                    else: raise IndexError(f"Deck empty while dealing {stage}")
-                self.community_cards.extend(new_cards); self.game_stage = next_stage; logging.info(f"Community Cards ({stage}): {self.community_cards}")
-                if self._player_action_event: self._player_action_event.set(); self._player_action_event = None; logging.debug("Cleared action event on new community card deal.")
-            except IndexError as e: logging.error(f"Deck ran out during {stage} deal: {e}"); self.game_stage = "hand_over"; error_msg = "Error: Deck ran out!"; event_to_set = self._player_action_event
-        await self.broadcast_game_state(); await asyncio.sleep(0.5)
-        if error_msg: await self.broadcast("game_message", {"message": error_msg}); return
-        players_can_act = [p for pid in self.active_players_order if (p:=self.players.get(pid)) and p.can_act()]
-        if len(players_can_act) <= 1: logging.info(f"Only {len(players_can_act)} player(s) can act after {stage}. Skipping betting round."); await self.check_hand_over_conditions()
-        else: logging.debug(f"{len(players_can_act)} players can act after {stage}. Proceeding to betting round.")
-
-    async def perform_showdown(self):
-        logging.info("-" * 20 + " Performing Showdown " + "-" * 20)
-        all_hands_data = {}; hand_ranks_data = {}; final_winners_summary = []
-        async with self._action_lock:
-            if self.game_stage == "hand_over": logging.debug("Skipping showdown: Hand already marked as over."); return
-            self.game_stage = "showdown"; self.current_player_id = None
-            if self._player_action_event: self._player_action_event.set(); self._player_action_event = None
-            contenders = sorted([p for pid in self.active_players_order if (p := self.players.get(pid)) and p.status in ["active", "all-in"]], key=lambda p: p.total_bet_this_hand)
-            all_hands_data = {p.id: p.hand for p in contenders if p.hand}
-            if not contenders: logging.error("Showdown Error: No contenders found!"); self.game_stage = "hand_over"; return
-            if len(contenders) == 1: logging.warning("Showdown Warning: Only 1 contender remains (should have ended earlier)."); pass
-            pots = []; player_winnings = defaultdict(int); player_contributions = {p.id: p.total_bet_this_hand for p in self.players.values() if p.total_bet_this_hand > 0}
-            sorted_contributions = sorted([(p.id, p.total_bet_this_hand) for p in contenders], key=lambda item: item[1]); last_contribution_level = 0; all_player_ids_in_pot = list(player_contributions.keys())
-            for p_id, contribution in sorted_contributions:
-                level_contribution = contribution - last_contribution_level
-                if level_contribution <= 0: continue
-                contributors_at_this_level_or_more = [player_id for player_id in all_player_ids_in_pot if player_contributions.get(player_id, 0) >= contribution]
-                pot_amount_at_level = level_contribution * len(contributors_at_this_level_or_more)
-                eligible_winners_for_this_pot = [c.id for c in contenders if c.total_bet_this_hand >= contribution]
-                if pot_amount_at_level > 0 and eligible_winners_for_this_pot:
-                    pots.append({"eligible_players": eligible_winners_for_this_pot, "amount": pot_amount_at_level})
-                    logging.info(f"Pot Slice Calc: Level ${contribution}, Amt ${pot_amount_at_level}, Eligible: {eligible_winners_for_this_pot}")
-                last_contribution_level = contribution
-            total_pot_calculated = sum(p['amount'] for p in pots); logging.info(f"Total pot calculated: ${total_pot_calculated} (Tracked self.pot: ${self.pot})")
-            if total_pot_calculated != self.pot:
-                logging.warning(f"Pot mismatch! Calculated ${total_pot_calculated}, Tracked ${self.pot}. Adjusting last pot slice.");
-                if pots: diff = self.pot - total_pot_calculated; pots[-1]["amount"] += diff; logging.info(f"Adjusted last pot amount by ${diff}. New amount: ${pots[-1]['amount']}")
-                elif self.pot > 0: logging.error("Pot mismatch but no pot slices calculated!"); pots.append({"eligible_players": [c.id for c in contenders], "amount": self.pot})
-            self.pot = 0
-            evaluated_hands = {}
-            for p in contenders:
-                if p.hand:
-                    try:
-                        eval_result = evaluate_hand(p.hand, self.community_cards); evaluated_hands[p.id] = eval_result
-                        hand_ranks_data[p.id] = eval_result[2]; p.last_hand_rank = eval_result[2]
-                    except Exception as e: logging.error(f"Hand evaluation error for Player {p.id}: {e}", exc_info=True); hand_ranks_data[p.id] = "Eval Error"; p.last_hand_rank = "Eval Error"
-            for i, pot_info in enumerate(pots):
-                eligible_ids = pot_info["eligible_players"]; pot_amount = pot_info["amount"]; pot_name = f"Main Pot" if i == 0 else f"Side Pot {i}"
-                logging.info(f"Awarding {pot_name} (${pot_amount}) among eligible players: {eligible_ids}")
-                if not eligible_ids: logging.warning(f"{pot_name} has no eligible players? Skipping."); continue
-                if pot_amount <= 0: logging.debug(f"{pot_name} is empty or negative (${pot_amount}), skipping award."); continue
-                eligible_evaluated_for_pot = []
-                for p_id in eligible_ids:
-                    if p_id in evaluated_hands: score, kicks, name, best5 = evaluated_hands[p_id]; eligible_evaluated_for_pot.append({"id": p_id, "score": score, "kicks": kicks, "name": name, "best5": best5})
-                if not eligible_evaluated_for_pot: logging.warning(f"{pot_name}: No evaluated hands found among eligible players {eligible_ids}? Skipping."); continue
-                eligible_evaluated_for_pot.sort(key=lambda x: (x["score"], x["kicks"]), reverse=True)
-                best_score_in_pot = eligible_evaluated_for_pot[0]["score"]; best_kickers_in_pot = eligible_evaluated_for_pot[0]["kicks"]
-                pot_winners = [h for h in eligible_evaluated_for_pot if h["score"] == best_score_in_pot and h["kicks"] == best_kickers_in_pot]
-                num_winners = len(pot_winners)
-                if num_winners > 0:
-                    win_each = pot_amount // num_winners; remainder = pot_amount % num_winners
-                    if remainder > 0: logging.warning(f"{pot_name} split resulted in ${remainder} remainder, which is ignored.")
-                    for winner in pot_winners:
-                        player_winnings[winner["id"]] += win_each
-                        summary_entry = next((item for item in final_winners_summary if item["playerId"] == winner["id"]), None)
-                        if summary_entry: summary_entry["amount"] += win_each
-                        else: final_winners_summary.append({"playerId": winner["id"], "playerName": self.players.get(winner["id"]).name or f"P{winner['id']}", "amount": win_each, "handRank": winner["name"], "winningHand": winner["best5"]})
-                else: logging.error(f"{pot_name} logic error: No winners found among evaluated hands.")
-            logging.info("Updating player stacks with total winnings from all pots:")
-            for p_id, total_won in player_winnings.items():
-                if total_won > 0:
-                    player = self.players.get(p_id)
-                    if player: player.stack += total_won; logging.info(f" Player P{p_id} ({player.name}) wins total ${total_won}. New Stack: ${player.stack}")
-                    else: logging.error(f"Player P{p_id} not found when trying to award winnings ${total_won}")
-            self.game_stage = "hand_over"
-        await self.broadcast("showdown", {"allHands": all_hands_data, "handRanks": hand_ranks_data})
-        await self.broadcast_game_state(); await asyncio.sleep(1)
-        await self.award_pot(None, 0, is_uncontested=False, winners_data=final_winners_summary)
-
-    async def award_pot(self, winner_id: Optional[int], pot_amount: int, is_uncontested: bool, winners_data: Optional[List[Dict]] = None):
-         logging.info(f"Awarding Pot: Amount=${pot_amount}, Uncontested={is_uncontested}, WinnerID={winner_id}, WinnersData={winners_data}")
-         final_payload = []
-         if is_uncontested:
-             async with self._action_lock:
-                 if winner_id is not None and winner_id in self.players:
-                     winner = self.players.get(winner_id)
-                     if winner:
-                         logging.info(f"Updating stack for uncontested winner P{winner_id} ('{winner.name}') Current: ${winner.stack}, Adding: ${pot_amount}")
-                         winner.stack += pot_amount; winner_name = winner.name or f"P{winner_id}"
-                         final_payload.append({"playerId": winner_id, "playerName": winner_name, "amount": pot_amount})
-                         logging.info(f"Stack updated for P{winner_id}. New stack: ${winner.stack}")
-                     else: logging.warning(f"Uncontested winner P{winner_id} not found during stack update."); final_payload.append({"playerName": f"P{winner_id} (Not Found)", "amount": pot_amount})
-                 else: logging.warning(f"Uncontested pot ${pot_amount} awarded, but winner ID {winner_id} is invalid or player not found."); final_payload.append({"playerName": "Unknown Winner", "amount": pot_amount})
-                 self.game_stage = "hand_over"
-         else:
-             if winners_data: final_payload = winners_data
-             else: logging.error("Pot award called for showdown but no winner data was provided.")
-             async with self._action_lock: self.game_stage = "hand_over"
-         logging.info(f"Broadcasting pot_awarded: {final_payload}")
-         await self.broadcast("pot_awarded", {"winners": final_payload, "isUncontested": is_uncontested})
-         await self.broadcast_game_state()
-
-game = PokerGame()
+    async def _end_hold(self, table: PokerGame, seat: HeldSeat):
+        if table.player_for(seat):  # not resumed in time
+            logging.info(f"{seat.name} did not come back to {table.name} within {SESSION_GRACE:g}s.")
+            await self.leave(table, seat)
+
+    async def send_message(self, websocket, msg_type: str, payload: Any):
+        """Sends outside of any table, e.g. lobby replies to a connection that isn't seated."""
+        box = outbox_for(websocket); box.send(box.codec.encode(msg_type, payload))
+
+    async def send_error(self, websocket, error_message: str):
+        logging.warning(f"SEND_ERR ws={getattr(websocket, 'id', id(websocket))}: {error_message}")
+        await self.send_message(websocket, "error", {"message": error_message})
+
+    async def shutdown(self):
+        for table in list(self.tables.values()):
+            table._stop_flow()
+            if table.game_stage in ("idle", "hand_over") and not table.restoring: table._settle(table.players.values())  # a hand still in play is void
+            if table.game_loop_task and not table.game_loop_task.done():
+                logging.info(f"Cancelling game loop of {table.name}..."); table.game_loop_task.cancel()
+                try: await table.game_loop_task
+                except asyncio.CancelledError: pass
+
+tables = TableManager()
+equity_engine = EquityEngine()
+
+link: Optional[WorkerLink] = None  # set when running as a worker under the supervisor
+hand_log: Optional[HandLog] = None  # opened in main() when HAND_LOG_PATH is set
+bankrolls: Optional[BankrollStore] = None  # opened in main() when BANKROLL_PATH is set
+snapshots: Optional[SnapshotStore] = None  # opened in main() when SNAPSHOT_PATH is set
+
+# Read at scrape time, so the hot paths don't maintain them.
+metrics.Gauge("poker_tables", "Open tables.", lambda: len(tables.tables))
+metrics.Gauge("poker_seated_players", "Players seated, including seats held for players who are away.", lambda: sum(len(t.players) for t in tables.tables.values()))
+metrics.Gauge("poker_send_queue_frames", "Frames waiting in all send queues.", lambda: outbox.stats()["queued_frames"])
+metrics.Gauge("poker_send_queue_max_depth", "Frames waiting in the longest send queue.", lambda: outbox.stats()["max_queue_depth"])
+metrics.Gauge("poker_timers_pending", "Timers pending on the timer wheel.", lambda: timers.pending)
+metrics.Counter("poker_dropped_state_frames_total", "game_state frames held back from slow clients and superseded.", lambda: outbox.stats()["dropped_state_frames"])
+metrics.Counter("poker_slow_client_disconnects_total", "Clients closed for not keeping up.", lambda: outbox.stats()["slow_disconnects"])
+
+class ClientSession:
+    """One client connection, seated at a table on this worker or relayed to a table owned by another worker."""
+    __slots__ = ("websocket", "codec", "table", "player", "name", "remote_table_id", "link_conn_id")
+
+    def __init__(self, websocket):
+        self.websocket = websocket; self.codec = codec_for(websocket)
+        self.table: Optional[PokerGame] = None; self.player: Optional[Player] = None; self.name: Optional[str] = None
+        self.remote_table_id: Optional[int] = None; self.link_conn_id: Optional[int] = None
+
+    @property
+    def ws_id_str(self) -> str:
+        return f"{self.websocket.remote_address}" if hasattr(self.websocket, 'remote_address') else f"UnknownWS({id(self.websocket)})"
+
+    def log_id(self) -> str:
+        if self.table and self.player: return f"P{self.player.id}@T{self.table.table_id}"
+        if self.remote_table_id is not None: return f"{self.ws_id_str}@T{self.remote_table_id}(remote)"
+        return self.ws_id_str
+
+    async def join(self, table: PokerGame) -> bool:
+        self.player = await tables.seat(self.websocket, table, self.name)
+        self.table = table if self.player else None
+        return self.player is not None
+
+    async def join_by_id(self, table_id: Any):
+        if link and isinstance(table_id, int) and not link.is_local(table_id):
+            if table_id == self.remote_table_id: await tables.send_error(self.websocket, "Already seated at this table."); return
+            remote = next((t for t in link.directory if t["tableId"] == table_id), None)
+            if not remote: await tables.send_error(self.websocket, f"Table {table_id} not found."); return
+            if remote["players"] >= remote["maxPlayers"]: await tables.send_error(self.websocket, f"{remote['name']} is full."); return
+            await self.leave()
+            self.remote_table_id = table_id; link.seat_remote(self, table_id, self.name)
+            logging.info(f"Connection {self.ws_id_str} relayed to table {table_id} on worker {link.owner_of(table_id)}")
+            return
+        target = tables.get_table(table_id)
+        if not target or target.closed: await tables.send_error(self.websocket, f"Table {table_id} not found."); return
+        await self.move_to(target)
+
+    async def spectate(self, table_id: Any):
+        if link and isinstance(table_id, int) and not link.is_local(table_id): await tables.send_error(self.websocket, "Spectating tables on another worker is not supported."); return
+        target = tables.get_table(table_id)
+        if not target or target.closed: await tables.send_error(self.websocket, f"Table {table_id} not found."); return
+        if target is self.table: await tables.send_error(self.websocket, "Already at this table."); return
+        await self.leave()
+        if await target.add_spectator(self.websocket): self.table = target
+        else: await tables.send_error(self.websocket, f"Could not watch {target.name}.")
+
+    async def move_to(self, target: PokerGame):
+        if target is self.table: await tables.send_error(self.websocket, "Already seated at this table."); return
+        if len(target.players) >= target.max_players: await tables.send_error(self.websocket, f"{target.name} is full."); return
+        await self.leave()
+        if not await self.join(target): await tables.send_error(self.websocket, f"Could not join {target.name}.")
+
+    async def reclaim_seat(self) -> bool:
+        """Moves a player who reconnects after a restart back to the seat their restored table holds for them.
+        A table restored by another worker is found in the directory, and the connection relayed to it."""
+        name = self.name.strip()[:15]
+        if self.player and self.player.name is not None: return False
+        if name not in tables.held:
+            relayed = isinstance(self.websocket, RemoteSocket)  # already relayed here by its gateway
+            remote = next((t for t in link.directory if name in t.get("held", ()) and not link.is_local(t["tableId"])), None) if link and not relayed else None
+            if remote is None: return False
+            await self.leave()
+            self.remote_table_id = remote["tableId"]; link.seat_remote(self, remote["tableId"], name)
+            logging.info(f"Connection {self.ws_id_str} relayed to the seat held for {name} at table {remote['tableId']} on worker {link.owner_of(remote['tableId'])}")
+            return True
+        await self.leave()
+        reclaimed = await tables.reclaim(self.websocket, name)
+        if reclaimed: self.table, self.player = reclaimed
+        else: await self.join(tables.find_open_table())  # the seat went away meanwhile: carry on as a new player
+        return True
+
+    async def resume(self) -> bool:
+        """Takes back a held seat when the client reconnects with the resumeToken of its assign_id
+        and its last game_state version in the URL: ?resume=TOKEN&version=N."""
+        request = getattr(self.websocket, "request", None)
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(request.path).query) if request else {}
+        token = query.get("resume", [None])[0]
+        if not token: return False
+        try: version = int(query["version"][0]) if "version" in query else None
+        except ValueError: version = None
+        table_id = resume_token_table(token)
+        if link and table_id is not None and not link.is_local(table_id):
+            self.remote_table_id = table_id; link.seat_remote(self, table_id, None, resume=[token, version])
+            logging.info(f"Connection {self.ws_id_str} resuming at table {table_id} on worker {link.owner_of(table_id)}")
+            return True
+        return await self.resume_seat(token, version)
+
+    async def resume_seat(self, token: str, version: Optional[int]) -> bool:
+        resumed = await tables.resume(self.websocket, token, version)
+        if not resumed: logging.info(f"Resume token from {self.ws_id_str} is unknown or expired; joining as a new player."); return False
+        self.table, self.player = resumed; self.name = self.player.name
+        return True
+
+    async def leave(self, hold: bool = False) -> Optional[int]:
+        left_id = None
+        if self.table: left_id = self.table.table_id; await tables.leave(self.table, self.websocket, hold)
+        elif self.remote_table_id is not None: left_id = self.remote_table_id; link.unseat_remote(self, self.remote_table_id, hold)
+        self.table = None; self.player = None; self.remote_table_id = None
+        return left_id
+
+    def remote_unseated(self, rejected: bool = False):
+        logging.info(f"Relayed seat of {self.ws_id_str} at table {self.remote_table_id} ended.")
+        self.remote_table_id = None
+        if rejected:  # a resume token the owner did not know: carry on as a new player, as for a local one
+            logging.info(f"Resume token from {self.ws_id_str} is unknown or expired; joining as a new player.")
+            asyncio.create_task(self.join(tables.find_open_table()))
+
+    def list_tables(self) -> List[Dict[str, Any]]:
+        listing = tables.list_tables()
+        if link: listing += [{k: v for k, v in t.items() if k != "held"} for t in link.directory if not link.is_local(t["tableId"])]
+        return sorted(listing, key=lambda t: t["tableId"])
+
+    async def run(self):
+        async for message in self.websocket:
+            if self.table and self.player:
+                if self.player.id not in self.table.players or self.player.websocket is not self.websocket:  # left, or resumed elsewhere
+                    logging.warning(f"WS {self.ws_id_str} msg but {self.log_id()} no longer exists. Breaking loop."); break
+            if logging.root.isEnabledFor(logging.DEBUG): logging.debug("Raw message received from %s: %s", self.log_id(), message)
+            try: await self.handle_message(message)
+            except DecodeError: logging.warning(f"Invalid {self.codec.label} from {self.log_id()}: {message!r}"); await tables.send_error(self.websocket, f"Invalid {self.codec.label} format.")
+            except websockets.exceptions.ConnectionClosed: logging.info(f"Connection closed for {self.log_id()} while processing message."); break
+            except Exception as e: logging.exception(f"!!! Error processing message from {self.log_id()}: {e} !!!"); await tables.send_error(self.websocket, f"An internal server error occurred.")
+
+    async def handle_message(self, message):
+        websocket = self.websocket
+        data = self.codec.decode(message); msg_type = data.get("type"); payload = data.get("payload")
+        if not msg_type or payload is None: logging.warning(f"Invalid msg format from {self.log_id()}: {message}"); await tables.send_error(websocket, "Invalid message format (missing type or payload)."); return
+        if self.remote_table_id is not None and msg_type in ("set_name", "player_action", "resync"):
+            if msg_type == "set_name" and isinstance(payload.get("name"), str): self.name = payload["name"]
+            link.forward(self, self.remote_table_id, message); return
+        if msg_type == "set_name" and isinstance(payload.get("name"), str):
+            self.name = payload["name"]
+            if await self.reclaim_seat(): return
+            if self.table and self.player: await self.table.set_player_name(self.player.id, self.name)
+        elif msg_type == "player_action" and isinstance(payload.get("action"), str):
+            if not self.table or not self.player: await tables.send_error(websocket, "You are not seated at a table."); return
+            action = payload["action"].lower(); amount = payload.get("amount"); parsed_amount = None
+            if amount is not None:
+                try: parsed_amount = int(amount); assert parsed_amount >= 0
+                except (ValueError, TypeError, AssertionError): logging.warning(f"Invalid amount '{amount}' from {self.log_id()} for '{action}'."); await tables.send_error(websocket, "Invalid action amount provided."); return
+            await self.table.handle_player_action(self.player.id, action, parsed_amount)
+        elif msg_type == "resync":
+            if self.table: await self.table.send_game_state(websocket, full=True)
+        elif msg_type == "list_tables": await tables.send_message(websocket, "table_list", {"tables": self.list_tables()})
+        elif msg_type == "join_table": await self.join_by_id(payload.get("tableId"))
+        elif msg_type == "spectate_table": await self.spectate(payload.get("tableId"))
+        elif msg_type == "create_table":
+            table_name = payload.get("name") if isinstance(payload.get("name"), str) else None
+            timeout = payload.get("actionTimeout"); low, high = ACTION_TIMEOUT_RANGE
+            timeout = min(max(float(timeout), low), high) if isinstance(timeout, (int, float)) and not isinstance(timeout, bool) else None
+            await self.move_to(tables.create_table(table_name.strip()[:30] if table_name else None, action_timeout=timeout))
+        elif msg_type == "leave_table":
+            left_id = await self.leave()
+            if left_id is None: await tables.send_error(websocket, "You are not seated at a table."); return
+            await tables.send_message(websocket, "left_table", {"tableId": left_id})
+        else: logging.warning(f"Unknown msg type '{msg_type}' from {self.log_id()}"); await tables.send_error(websocket, f"Unknown message type received: {msg_type}")
 
 async def handler(websocket):
-    player = None; ws_id_str = f"{websocket.remote_address}" if hasattr(websocket, 'remote_address') else f"UnknownWS({id(websocket)})"
-    logging.info(f"Incoming connection attempt from {ws_id_str}")
+    session = ClientSession(websocket)
+    logging.info(f"Incoming connection attempt from {session.ws_id_str}")
+    metrics.CONNECTIONS.inc()
     try:
-        await game.register_player(websocket)
-        async with game._action_lock:
-             for p_obj in game.players.values():
-                 if p_obj.websocket == websocket: player = p_obj; break
-        if not player: logging.warning(f"Registration failed for {ws_id_str}. Closing handler."); return
-        p_id_str = f"P{player.id}"; logging.info(f"Connection {ws_id_str} successfully registered as {p_id_str}")
-        async for message in websocket:
-            current_pid = player.id if player else None; p_id_log_str = f"P{current_pid}" if current_pid else ws_id_str
-            async with game._action_lock: player_exists = current_pid in game.players
-            if not player_exists: logging.warning(f"WS {ws_id_str} msg but P{current_pid} no longer exists. Breaking loop."); break
-            logging.debug(f"Raw message received from {p_id_log_str}: {message}")
-            try:
-                data = json.loads(message); msg_type = data.get("type"); payload = data.get("payload")
-                if not msg_type or payload is None: logging.warning(f"Invalid msg format from {p_id_log_str}: {message}"); await game.send_error(websocket, "Invalid message format (missing type or payload)."); continue
-                if msg_type == "set_name" and isinstance(payload.get("name"), str): await game.set_player_name(player.id, payload["name"])
-                elif msg_type == "player_action" and isinstance(payload.get("action"), str):
-                    action = payload["action"].lower(); amount = payload.get("amount"); parsed_amount = None
-                    if amount is not None:
-                        try: parsed_amount = int(amount); assert parsed_amount >= 0
-                        except (ValueError, TypeError, AssertionError): logging.warning(f"Invalid amount '{amount}' from {p_id_log_str} for '{action}'."); await game.send_error(websocket, "Invalid action amount provided."); continue
-                    await game.handle_player_action(player.id, action, parsed_amount)
-                else: logging.warning(f"Unknown msg type '{msg_type}' from {p_id_log_str}"); await game.send_error(websocket, f"Unknown message type received: {msg_type}")
-            except json.JSONDecodeError: logging.warning(f"Invalid JSON from {p_id_log_str}: {message}"); await game.send_error(websocket, "Invalid JSON format.")
-            except websockets.exceptions.ConnectionClosed: logging.info(f"Connection closed for {p_id_log_str} while processing message."); break
-            except Exception as e: logging.exception(f"!!! Error processing message from {p_id_log_str}: {e} !!!"); await game.send_error(websocket, f"An internal server error occurred.")
-    except websockets.exceptions.ConnectionClosedOK: logging.info(f"Connection closed normally for {p_id_str if player else ws_id_str}")
-    except websockets.exceptions.ConnectionClosedError as e: logging.info(f"Connection closed with error for {p_id_str if player else ws_id_str}: {e}")
-    except Exception as e: logging.exception(f"!!! Unhandled Error in WebSocket handler for {p_id_str if player else ws_id_str}: {e} !!!")
+        if not await session.resume() and not await session.join(tables.find_open_table()): logging.warning(f"Registration failed for {session.ws_id_str}. Closing handler."); return
+        logging.info(f"Connection {session.ws_id_str} successfully registered as {session.log_id()}")
+        await session.run()
+    except websockets.exceptions.ConnectionClosedOK: logging.info(f"Connection closed normally for {session.log_id()}")
+    except websockets.exceptions.ConnectionClosedError as e: logging.info(f"Connection closed with error for {session.log_id()}: {e}")
+    except Exception as e: logging.exception(f"!!! Unhandled Error in WebSocket handler for {session.log_id()}: {e} !!!")
     finally:
-        ws_id = id(websocket); p_id_final = player.id if player else 'N/A'
+        ws_id = id(websocket); p_id_final = session.player.id if session.player else 'N/A'
         logging.info(f"WebSocket handler finally block executing for ws={ws_id} (Player ID: {p_id_final})")
-        await game.unregister_player(websocket)
+        await session.leave(hold=True); metrics.CONNECTIONS.dec()
         logging.info(f"Unregister player completed for ws={ws_id}")
 
-async def main():
+async def remote_handler(socket: RemoteSocket, table_id: int, name: Optional[str], resume: Optional[List[Any]] = None):
+    """Runs a session for a connection held by another worker that has joined one of our tables, is
+    reclaiming the seat a restored table holds for `name`, or resumes a seat (`resume`: [token, version])."""
+    session = ClientSession(socket); session.name = name; rejected = False
+    try:
+        if resume: rejected = not await session.resume_seat(*resume)
+        elif not (name and await session.reclaim_seat()):
+            table = tables.get_table(table_id)
+            if not table or table.closed or not await session.join(table): await tables.send_error(socket, f"Could not join table {table_id}."); return
+        if not rejected: await session.run()
+    except Exception as e: logging.exception(f"!!! Unhandled Error in relayed session for {session.log_id()}: {e} !!!")
+    finally:
+        await session.leave(hold=socket.hold); link.release(socket, rejected)
+
+async def log_send_stats():
+    """Periodically logs send queue depth and slow-client drops/disconnects when there is anything to report."""
+    while True:
+        await asyncio.sleep(SEND_STATS_INTERVAL)
+        s = outbox.stats()
+        if s["queued_frames"] or s["dropped_state_frames"] or s["slow_disconnects"]:
+            logging.info(f"Send queues: {s['queued_frames']} frames over {s['connections']} connections (max {s['max_queue_depth']}, "
+                         f"{s['backlogged_connections']} backlogged), {s['dropped_state_frames']} state frames dropped, {s['slow_disconnects']} slow clients closed.")
+
+async def checkpoint_tables():
+    """Every SNAPSHOT_INTERVAL, passes the tables that changed to the snapshot store."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        for table in list(tables.tables.values()): table.checkpoint()
+
+def restore_tables() -> int:
+    """Rebuilds the tables in the snapshot file; returns how many."""
+    gc.disable()  # rebuilding allocates many long-lived objects at once; don't let the collector rescan them as it goes
+    try: return tables.restore(snapshots.load())
+    finally: gc.enable()
+
+def save_snapshots():
+    """Checkpoints every table and writes the file one last time, before connections close and empty the tables."""
+    global snapshots
+    if not snapshots: return
+    for table in list(tables.tables.values()): table.checkpoint(); table.hand_to_snapshot()
+    snapshots.close(); logging.info(f"Saved {snapshots.tables} table snapshot(s) to {snapshots.path}"); snapshots = None
+
+async def main(host: str = "0.0.0.0", port: int = 8765, reuse_port: bool = False):
+    global hand_log, bankrolls, snapshots
     loop = asyncio.get_running_loop(); stop_server = loop.create_future()
-    if game.game_loop_task and not game.game_loop_task.done():
-        logging.info("Attempting to cancel existing game loop task..."); game.game_loop_task.cancel()
-        try: await game.game_loop_task
-        except asyncio.CancelledError: pass
-        logging.info("Previous game loop task cancelled."); game.game_loop_task = None
-        
+    if ASYNC_LOGGING: logqueue.start()
+    if HAND_LOG_PATH:
+        hand_log = HandLog(f"{HAND_LOG_PATH}.{link.worker_index}" if link else HAND_LOG_PATH)
+        logging.info(f"Writing hand histories to {hand_log.path}")
+    if BANKROLL_PATH:
+        bankrolls = BankrollStore(BANKROLL_PATH)
+        logging.info(f"Keeping bankrolls in {bankrolls.path}")
+    if SNAPSHOT_PATH:
+        snapshots = SnapshotStore(f"{SNAPSHOT_PATH}.{link.worker_index}" if link else SNAPSHOT_PATH)
+        start = time.perf_counter(); restored = restore_tables()
+        logging.info(f"Restored {restored} table(s) from {snapshots.path} in {(time.perf_counter() - start) * 1000:.0f} ms; holding seats for {len(tables.held)} player(s).")
+    equity_engine.start(); stats_task = asyncio.create_task(log_send_stats()); metrics_server = None
+    if METRICS_PORT is not None:
+        try: metrics_server = await metrics.start_server(METRICS_HOST, METRICS_PORT + (link.worker_index if link else 0))
+        except OSError as e: logging.error(f"Could not serve metrics on {METRICS_HOST}:{METRICS_PORT}: {e}")
+    profile_path = lag_task = None
+    if PROFILE_PATH:
+        profile_path = f"{PROFILE_PATH}.{link.worker_index}" if link else PROFILE_PATH
+        lag_task = asyncio.create_task(profiling.sample_loop_lag()); metrics.PAGES[b"/profile"] = profiling.report
+        loop.add_signal_handler(signal.SIGUSR1, profiling.write_report, profile_path)
+        logging.info(f"Profiling table locks and event loop lag; report goes to {profile_path} at shutdown and on SIGUSR1.")
+    checkpoint_task = asyncio.create_task(checkpoint_tables()) if snapshots else None
+    if link: link.start(tables.directory, remote_handler, lambda: stop_server.done() or stop_server.set_result(None))
+
     CERT_PATH = "cert.pem" 
     KEY_PATH = "key.pem"   
 
@@ -834,28 +901,69 @@ async def main():
         ssl_context = None
         use_ssl = False
         
-    host = "0.0.0.0"; port = 8765; logging.info(f"--- Starting Poker WebSocket Server on wss://{host}:{port} ---")
     protocol = "wss" if use_ssl else "ws"
     logging.info(f"--- Starting Poker WebSocket Server on {protocol}://{host}:{port} ---")
     
     try:
-        async with websockets.serve(handler, host, port, ssl=ssl_context if use_ssl else None) as server:
+        async with websockets.serve(handler, host, port, ssl=ssl_context if use_ssl else None, reuse_port=reuse_port, select_subprotocol=select_subprotocol) as server:
              logging.info(f"Server listening on {server.sockets[0].getsockname()}")
-             await stop_server
+             try: await stop_server
+             finally:
+                 if checkpoint_task: checkpoint_task.cancel()
+                 save_snapshots()
     except asyncio.CancelledError: logging.info("Main server task was cancelled.")
     except OSError as e: logging.error(f"Could not start server on {host}:{port}. Error: {e}. Is the port already in use?")
     except Exception as e: logging.exception(f"An unexpected error occurred in main(): {e}")
     finally:
          logging.info("--- Shutting down server ---")
-         if game.game_loop_task and not game.game_loop_task.done():
-              logging.info("Cancelling active game loop task during shutdown..."); game.game_loop_task.cancel()
-              try: await game.game_loop_task
-              except asyncio.CancelledError: pass
-              logging.info("Game loop task cancelled.")
+         if link: link.stop()
+         stats_task.cancel()
+         if metrics_server: metrics_server.close()
+         await tables.shutdown()
+         if lag_task: lag_task.cancel(); profiling.write_report(profile_path)
+         equity_engine.shutdown()
+         if hand_log: hand_log.close()
+         if bankrolls: bankrolls.close()
          logging.info("Server shutdown complete.")
+         logqueue.stop()
 
-if __name__ == "__main__":
-    try: asyncio.run(main())
-    except KeyboardInterrupt: logging.info("\n--- Server stopped by KeyboardInterrupt (Ctrl+C) ---")
-    except Exception as e: logging.exception(f"--- Server stopped due to unexpected error: {e} ---")
+def run_worker(worker_index: int, num_workers: int, conn, host: str, port: int):
+    global link, tables
+    link = WorkerLink(conn, worker_index, num_workers)
+    tables = TableManager(first_table_id=worker_index + 1, table_id_step=num_workers)
+    equity_engine.max_workers = max(1, (os.cpu_count() or 1) // num_workers)
+    try: asyncio.run(main(host, port, reuse_port=True))
+    except KeyboardInterrupt: pass
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online multiplayer poker server.")
+    parser.add_argument("--host", default="0.0.0.0"); parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the port via SO_REUSEPORT (0 = one per CPU).")
+    parser.add_argument("--slow-clients", choices=outbox.SLOW_CLIENT_POLICIES, default=outbox.SLOW_CLIENT_POLICY,
+                        help="Clients whose send queue backs up: drop their stale game_state frames or disconnect them.")
+    parser.add_argument("--hand-log", help="Append every hand to this binary hand history file (read it with handlog.py).")
+    parser.add_argument("--bankrolls", help="Keep player bankrolls, by name, in this SQLite database.")
+    parser.add_argument("--action-timeout", type=float, default=ACTION_TIMEOUT, help="Seconds a player has to act before their time bank starts.")
+    parser.add_argument("--time-bank", type=float, default=TIME_BANK, help="Extra seconds per player, per session, once their action clock runs out (0 = none).")
+    parser.add_argument("--hand-delay", type=float, default=HAND_END_DELAY, help="Seconds between the end of a hand and the next.")
+    parser.add_argument("--session-grace", type=float, default=SESSION_GRACE, help="Seconds a dropped player's seat is held for them to resume (0 = fold them at once).")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics (workers use PORT + their index).")
+    parser.add_argument("--metrics-host", default=METRICS_HOST, help="Address the metrics port listens on.")
+    parser.add_argument("--profile", metavar="PATH", help="Profile table lock waits and holds per call site and event loop lag; write the report to PATH at shutdown and on SIGUSR1.")
+    parser.add_argument("--async-logging", action="store_true", help="Format and write log lines on a background thread instead of the event loop.")
+    parser.add_argument("--log-json", action="store_true", help="Log JSON lines (ts, level, logger, func, msg, exc) instead of plain text.")
+    parser.add_argument("--snapshots", help="Checkpoint tables to this file and restore them from it on start.")
+    args = parser.parse_args()
+    logqueue.configure(json_lines=args.log_json); ASYNC_LOGGING = args.async_logging
+    outbox.SLOW_CLIENT_POLICY = args.slow_clients; HAND_LOG_PATH = args.hand_log; BANKROLL_PATH = args.bankrolls; SNAPSHOT_PATH = args.snapshots; SESSION_GRACE = args.session_grace
+    METRICS_PORT = args.metrics_port; METRICS_HOST = args.metrics_host; PROFILE_PATH = args.profile
+    ACTION_TIMEOUT = args.action_timeout; TIME_BANK = args.time_bank; HAND_END_DELAY = args.hand_delay
+    num_workers = args.workers or os.cpu_count() or 1
+    if num_workers > 1:
+        logging.info(f"--- Starting supervisor with {num_workers} workers on port {args.port} ---")
+        run_supervisor(num_workers, lambda i, n, conn: run_worker(i, n, conn, args.host, args.port))
+    else:
+        if ASYNC_LOGGING: signal.signal(signal.SIGTERM, _interrupt)  # shut down through main()'s finally, so queued log lines get written
+        try: asyncio.run(main(args.host, args.port))
+        except KeyboardInterrupt: logging.info("\n--- Server stopped by KeyboardInterrupt (Ctrl+C) ---")
+        except Exception as e: logging.exception(f"--- Server stopped due to unexpected error: {e} ---")
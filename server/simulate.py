@@ -0,0 +1,142 @@
+import argparse
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from engine import BIG_BLIND, SMALL_BLIND, STARTING_STACK, Player, TableEngine, log as engine_log
+from evaluator import evaluate
+from handlog import HandLog
+
+Decision = Tuple[str, Optional[int]]  # (action, total bet for bet/raise)
+
+class Agent:
+    """An in-process player. decide() gets the table, its own Player and the player_turn payload
+    a websocket client would get (actions, callAmount, minRaise, maxRaise, ...)."""
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def decide(self, table: TableEngine, player: Player, options: Dict[str, Any]) -> Decision:
+        raise NotImplementedError
+
+class CallingStation(Agent):
+    """Never folds, never raises."""
+    def decide(self, table, player, options) -> Decision:
+        return ("check" if "check" in options["actions"] else "call"), None
+
+class RandomAgent(Agent):
+    """Picks a legal action at random, betting or raising anywhere between the minimum and all-in."""
+    def decide(self, table, player, options) -> Decision:
+        action = self.rng.choice(options["actions"])
+        if action == "fold" and "check" in options["actions"]: action = "check"
+        if action in ("bet", "raise"): return action, self.rng.randint(options["minRaise"], options["maxRaise"])
+        return action, None
+
+class TightAgent(Agent):
+    """Plays pairs and big cards preflop, then bets made hands (a pair or better) and folds to bets without one.
+    Raises at most once a street."""
+    def decide(self, table, player, options) -> Decision:
+        actions = options["actions"]; ranks = sorted((c >> 2 for c in player.hand), reverse=True)
+        if not table.community_cards: strong = ranks[0] == ranks[1] or ranks[1] >= 9  # a pair, or both cards Jack or better
+        else: strong = evaluate([*player.hand, *table.community_cards]) >> 20 >= 2
+        if strong and player.last_action not in ("bet", "raise"):  # once a street, or two of them raise each other for ever
+            for action in ("raise", "bet"):
+                if action in actions: return action, options["minRaise"]
+        if "check" in actions: return "check", None
+        return ("call", None) if strong or options["callAmount"] <= options["bigBlind"] else ("fold", None)
+
+AGENTS = {"call": CallingStation, "random": RandomAgent, "tight": TightAgent}
+
+def _new_stats(name: str) -> Dict[str, Any]:
+    return {"agent": name, "hands": 0, "net": 0, "won": 0, "showdowns": 0, "rebuys": 0, "illegal": 0}
+
+def simulate(agent_names: Sequence[str], hands: int, seed: int = 0, starting_stack: int = STARTING_STACK, hand_log_path: Optional[str] = None,
+             quiet: bool = True) -> Dict[str, Any]:
+    """Plays `hands` hands at one table with an agent per seat, as fast as the engine goes.
+
+    Everything random comes from `seed`, so a run is reproducible. A player who busts buys
+    back in for `starting_stack` before the next hand. Returns per-seat totals (chips are
+    net of buy-ins) plus the elapsed time and the number of actions. With `hand_log_path`, every
+    hand is also written to that hand history file. The engine's log is off unless not `quiet`.
+    """
+    engine_log.disabled = quiet
+    rng = random.Random(seed); table = TableEngine(SMALL_BLIND, BIG_BLIND, rng=random.Random(rng.getrandbits(64)))
+    agents: Dict[int, Agent] = {}; seats: Dict[int, Dict[str, Any]] = {}
+    for seat, name in enumerate(agent_names, start=1):
+        player = Player(seat, None); player.name = f"{name}{seat}"; player.stack = starting_stack
+        table.players[seat] = player; agents[seat] = AGENTS[name](random.Random(rng.getrandbits(64))); seats[seat] = _new_stats(name)
+    if hand_log_path: table.hand_log = HandLog(hand_log_path)
+    actions = 0; start = time.perf_counter()
+    for _ in range(hands):
+        for seat, p in table.players.items():
+            if p.stack == 0: p.stack = starting_stack; seats[seat]["rebuys"] += 1
+        stacks = {seat: p.stack for seat, p in table.players.items()}
+        events = table.start_hand()
+        while events:
+            turn = pause = None
+            for e in events:
+                kind = e[0]
+                if kind == "turn": turn = e
+                elif kind == "pause": pause = e
+                elif kind == "showdown":
+                    for seat in e[1]["allHands"]: seats[seat]["showdowns"] += 1
+                elif kind == "pot_awarded":
+                    for winner in e[1]["winners"]:
+                        if "playerId" in winner: seats[winner["playerId"]]["won"] += 1
+            if pause is not None: events = table.resume(pause[2])
+            elif turn is not None:
+                action, amount = agents[turn[1]].decide(table, table.players[turn[1]], turn[2])
+                events = table.act(turn[1], action, amount); actions += 1
+                if events and events[0][0] == "error":  # an illegal answer folds, as a timeout would
+                    seats[turn[1]]["illegal"] += 1; events = table.act(turn[1], "fold")
+            else: break
+        for seat, p in table.players.items():
+            seats[seat]["hands"] += 1; seats[seat]["net"] += p.stack - stacks[seat]
+    if table.hand_log: table.hand_log.close()
+    return {"hands": hands, "actions": actions, "seconds": time.perf_counter() - start, "seats": seats}
+
+def _merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total = {"hands": 0, "actions": 0, "seconds": 0.0, "seats": {}}
+    for result in results:
+        total["hands"] += result["hands"]; total["actions"] += result["actions"]; total["seconds"] = max(total["seconds"], result["seconds"])
+        for seat, stats in result["seats"].items():
+            merged = total["seats"].setdefault(seat, _new_stats(stats["agent"]))
+            for key in ("hands", "net", "won", "showdowns", "rebuys", "illegal"): merged[key] += stats[key]
+    return total
+
+def run_parallel(agent_names: Sequence[str], hands: int, seed: int = 0, processes: int = 0, hand_log_path: Optional[str] = None) -> Dict[str, Any]:
+    """Splits `hands` over worker processes (one per CPU for 0), each playing its own table from
+    seed + worker index, and adds up the per-seat results. Each worker writes its own hand log
+    (`hand_log_path` plus the worker index)."""
+    processes = processes or os.cpu_count() or 1
+    if processes == 1: return simulate(agent_names, hands, seed, hand_log_path=hand_log_path)
+    shares = [hands // processes + (i < hands % processes) for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(simulate, list(agent_names), share, seed + i, STARTING_STACK, hand_log_path and f"{hand_log_path}.{i}")
+                   for i, share in enumerate(shares) if share]
+        return _merge([f.result() for f in futures])
+
+def report(result: Dict[str, Any]):
+    hands, seconds = result["hands"], result["seconds"]
+    print(f"{hands:,} hands in {seconds:.2f} s ({hands / seconds:,.0f} hands/sec)")
+    print(f"{'seat':<6}{'agent':<8}{'net chips':>12}{'bb/100':>10}{'pots won':>10}{'showdowns':>11}{'rebuys':>8}{'illegal':>9}")
+    for seat, s in sorted(result["seats"].items()):
+        bb_per_100 = s["net"] / BIG_BLIND / max(s["hands"], 1) * 100
+        print(f"{seat:<6}{s['agent']:<8}{s['net']:>12,}{bb_per_100:>10.2f}{s['won']:>10,}{s['showdowns']:>11,}{s['rebuys']:>8,}{s['illegal']:>9,}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless bot-vs-bot simulation on the server's game engine.")
+    parser.add_argument("--agents", nargs="+", choices=sorted(AGENTS), default=["tight", "call", "random"], help="One agent per seat.")
+    parser.add_argument("--hands", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes (0 = one per CPU).")
+    parser.add_argument("--hand-log", help="Write every hand to this binary hand history file (see handlog.py).")
+    args = parser.parse_args()
+    if not 2 <= len(args.agents) <= 8: parser.error("need 2 to 8 agents")
+    logging.getLogger().setLevel(logging.WARNING)
+    report(run_parallel(args.agents, args.hands, args.seed, args.processes, args.hand_log))
+
+if __name__ == "__main__":
+    main()
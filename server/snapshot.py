@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = 1.0  # seconds between checkpoints of changed tables, and between file rewrites
+HEADER = b"pokersnap 2"  # first line of the file; one compact JSON table per line follows
+
+class SnapshotStore:
+    """The latest snapshot of every table, kept as encoded lines and rewritten to `path` by a
+    background thread whenever one changed. The file is written to a temporary name, synced and
+    renamed over the old one, so a crash leaves either the previous file or the new one.
+    """
+    def __init__(self, path: str, interval: float = SNAPSHOT_INTERVAL):
+        self.path = path; self.interval = interval
+        self._lines: Dict[int, bytes] = {}; self._lock = threading.Lock(); self._dirty = False
+        self._wake = threading.Event(); self._closed = False
+        self.writes = 0
+        self._thread = threading.Thread(target=self._write_loop, name="snapshots", daemon=True); self._thread.start()
+
+    def load(self) -> List[Dict[str, Any]]:
+        """The tables in the file left by the previous run. They stay in the store until updated or removed."""
+        if not os.path.exists(self.path): return []
+        with open(self.path, "rb") as f: lines = f.read().split(b"\n")
+        if lines[0] != HEADER: log.error(f"{self.path} is not a table snapshot file; ignoring it."); return []
+        states = []
+        for line in lines[1:]:
+            if not line: continue
+            try: state = json.loads(line)
+            except ValueError: log.error(f"Skipping a corrupt table snapshot in {self.path}."); continue
+            states.append(state)
+            with self._lock: self._lines[state["id"]] = line
+        return states
+
+    def update(self, table_id: int, state: Dict[str, Any]):
+        if self._closed: return
+        line = json.dumps(state, separators=(",", ":")).encode()
+        with self._lock: self._lines[table_id] = line; self._dirty = True
+
+    def remove(self, table_id: int):
+        with self._lock:
+            if self._lines.pop(table_id, None) is not None: self._dirty = True
+
+    @property
+    def tables(self) -> int:
+        return len(self._lines)
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.interval); self._wake.clear()
+            try: self.write()
+            except OSError as e: log.error(f"Could not write table snapshots to {self.path}: {e}")
+
+    def write(self):
+        with self._lock:
+            if not self._dirty: return
+            data = b"\n".join([HEADER, *self._lines.values()]) + b"\n"; self._dirty = False
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "wb") as f: f.write(data); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path); self.writes += 1
+        except OSError: self._dirty = True; raise  # try again next time
+
+    def close(self):
+        """Writes the last changes and stops the writer; later updates are ignored."""
+        if self._closed: return
+        self._closed = True; self._wake.set(); self._thread.join()
+        self.write()
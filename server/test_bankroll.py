@@ -0,0 +1,43 @@
+import asyncio
+import multiprocessing
+import sqlite3
+
+from bankroll import BankrollStore
+
+def _seat_in_another_process(path: str, name: str):
+    # A second worker sharing the database: what does seat() give it?
+    def run(results):
+        async def seat():
+            store = BankrollStore(path)
+            try: results.put(await store.seat(name))
+            finally: store.close()
+        asyncio.run(seat())
+    ctx = multiprocessing.get_context("fork"); results = ctx.Queue()
+    process = ctx.Process(target=run, args=(results,)); process.start()
+    result = results.get(timeout=10); process.join(10)
+    return result
+
+def test_a_name_is_seated_once_across_processes(tmp_path):
+    path = str(tmp_path / "bankrolls.db")
+    async def run():
+        store = BankrollStore(path, starting_stack=500)
+        assert await store.seat("alice") == 500 and await store.seat("alice") is None
+        assert _seat_in_another_process(path, "alice") is None
+        assert _seat_in_another_process(path, "bob") is not None
+        store.release("alice"); store.sync().result(5)
+        assert _seat_in_another_process(path, "alice") == 500
+        assert await store.seat("alice") == 500
+        store.close()
+        assert _seat_in_another_process(path, "alice") == 500  # a closed store lets its names go
+    asyncio.run(run())
+
+def test_claims_of_a_dead_process_are_cleared(tmp_path):
+    path = str(tmp_path / "bankrolls.db")
+    BankrollStore(path).close()
+    ctx = multiprocessing.get_context("fork"); process = ctx.Process(target=lambda: None); process.start(); process.join()
+    db = sqlite3.connect(path); db.execute("INSERT INTO seated (name, pid, since) VALUES ('alice', ?, 0)", (process.pid,)); db.commit(); db.close()
+    async def run():
+        store = BankrollStore(path)
+        try: return await store.seat("alice")
+        finally: store.close()
+    assert asyncio.run(run()) is not None
@@ -0,0 +1,18 @@
+import multiprocessing
+import select
+import threading
+import time
+
+from cluster import PipeWriter
+
+def test_pipe_writer_queues_what_a_full_pipe_cannot_take():
+    ours, theirs = multiprocessing.Pipe(); writer = PipeWriter(ours)
+    messages = [{"op": "deliver", "conn": n, "message": "x" * 100_000} for n in range(50)]  # far more than the socket buffers hold
+    start = time.perf_counter()
+    for msg in messages: writer.send(msg)
+    assert writer.pending and time.perf_counter() - start < 1  # nobody is reading, yet send() came back
+    received = []; reader = threading.Thread(target=lambda: received.extend(theirs.recv() for _ in messages)); reader.start()
+    while writer.pending: select.select([], [writer], [], 1); writer.flush()
+    reader.join(5)
+    assert received == messages
+    writer.close()
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from cards import CARD_STRINGS, cards_to_ints
+from evaluator import describe_hand, evaluate, legacy_evaluate_hand, strength_to_score
+
+def _deals(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [rng.sample(CARD_STRINGS, 7) for _ in range(count)]
+
+def test_evaluate_matches_legacy_evaluator():
+    for deal in _deals(5000):
+        score, kickers, name, _ = legacy_evaluate_hand(deal[:2], deal[2:])
+        ints = cards_to_ints(deal)
+        assert strength_to_score(evaluate(ints)) == (score, kickers), deal
+        assert describe_hand(ints)[:3] == (score, kickers, name), deal
+
+def test_evaluate_orders_hands_like_legacy_evaluator():
+    # Whole tables: the winner ordering the showdown relies on, ties included.
+    rng = random.Random(2)
+    for _ in range(1000):
+        players = rng.randint(2, 8); cards = rng.sample(CARD_STRINGS, 2 * players + 5); board = cards[-5:]
+        hands = [cards[2 * i:2 * i + 2] for i in range(players)]
+        legacy = [tuple(legacy_evaluate_hand(h, board)[:2]) for h in hands]
+        fast = [evaluate(cards_to_ints(h + board)) for h in hands]
+        for i in range(players):
+            for j in range(players):
+                assert (legacy[i] > legacy[j]) == (fast[i] > fast[j]) and (legacy[i] == legacy[j]) == (fast[i] == fast[j])
+
+def test_evaluate_many_matches_evaluate():
+    np = pytest.importorskip("numpy")
+    from evaluator import evaluate_many
+    ints = [cards_to_ints(d) for d in _deals(5000, seed=3)]
+    cards = np.array(ints, dtype=np.int64)
+    strengths = evaluate_many(cards[:, :2], cards[:, 2:])
+    assert [int(s) for s in strengths] == [evaluate(d) for d in ints]
@@ -0,0 +1,77 @@
+import handlog
+from handlog import ABORTED, ACTION, ACTION_CODES, HAND_END, HAND_START, SEAT, HandLog, HandLogReader
+
+def test_hand_ids_continue_after_interleaved_hands(tmp_path):
+    path = str(tmp_path / "hands.log")
+    log = HandLog(path)
+    first, second = log.new_hand(), log.new_hand()
+    log.record(HAND_START, 2, 1, first); log.record(HAND_START, 2, 2, second)
+    log.record(ACTION, ACTION_CODES["fold"], 1, first, 1)
+    log.record(HAND_END, ABORTED, 2, second); log.record(HAND_END, ABORTED, 1, first)  # tables stop in any order
+    log.close()
+    log = HandLog(path); third = log.new_hand()
+    log.record(HAND_START, 2, 2, third); log.record(HAND_END, ABORTED, 2, third); log.close()
+    assert third == 3
+    reader = HandLogReader(path)
+    assert reader.hand_ids() == [1, 2, 3]
+    assert [r.kind for r in reader.hand(first)] == [HAND_START, ACTION, HAND_END]
+    reader.close()
+
+def test_last_hand_id_found_behind_many_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(handlog, "SCAN_BLOCK", 4)
+    path = str(tmp_path / "hands.log")
+    log = HandLog(path)
+    for _ in range(3): hand_id = log.new_hand(); log.record(HAND_START, 2, 1, hand_id)
+    for _ in range(10): log.record(ACTION, ACTION_CODES["call"], 1, hand_id - 1, 1)  # the last hand to start is not the last to write
+    log.close()
+    log = HandLog(path); assert log.new_hand() == 4; log.close()
+
+def test_hands_for_player_by_name_across_tables_and_runs(tmp_path):
+    path = str(tmp_path / "hands.log")
+    for table_id, player_id, name in ((1, 2, "alice"), (7, 1, "bob"), (3, 5, "alice")):  # one hand per run
+        log = HandLog(path); hand_id = log.new_hand()
+        log.record(HAND_START, 2, table_id, hand_id); log.record(SEAT, 0, table_id, hand_id, player_id, 1000, (0, 1), name.encode())
+        log.record(HAND_END, ABORTED, table_id, hand_id); log.close()
+    reader = HandLogReader(path)
+    assert reader.hands_for_player("alice") == [1, 3] and reader.hands_for_player("bob") == [2] and reader.hands_for_player("carol") == []
+    reader.close()
+
+def _play(table, events, stop):
+    # Resumes pauses and checks or calls every prompt until stop() holds.
+    while not stop():
+        pause = next((e for e in events if e[0] == "pause"), None)
+        if pause: events = table.resume(pause[2]); continue
+        turn = next((e for e in events if e[0] == "turn"), None)
+        if turn is None: break
+        events = table.act(turn[1], "check" if "check" in turn[2]["actions"] else "call")
+
+def test_restored_hand_keeps_its_whole_history(tmp_path, monkeypatch):
+    import asyncio
+    import server
+    from engine import Player
+    from snapshot import SnapshotStore
+    log_path = str(tmp_path / "hands.log"); snapshot_path = str(tmp_path / "tables.snap")
+    async def run():
+        monkeypatch.setattr(server, "hand_log", HandLog(log_path)); monkeypatch.setattr(server, "snapshots", SnapshotStore(snapshot_path))
+        monkeypatch.setattr(server, "tables", server.TableManager())
+        table = server.tables.create_table()
+        for pid, name in enumerate(("a", "b", "c"), start=1):
+            player = Player(pid, object()); player.name = name; table.players[pid] = player
+        table.next_player_id = 4
+        _play(table, table.start_hand(), lambda: table.game_stage == "flop" and table.awaiting_action())
+        hand_id = table.hand_id
+        server.save_snapshots(); table.abort_hand(); server.hand_log.close()  # a clean shutdown mid-hand
+        monkeypatch.setattr(server, "hand_log", HandLog(log_path)); monkeypatch.setattr(server, "snapshots", SnapshotStore(snapshot_path))
+        monkeypatch.setattr(server, "tables", server.TableManager())
+        assert server.tables.restore(server.snapshots.load()) == 1
+        table = server.tables.get_table(table.table_id)
+        assert table.hand_id == hand_id
+        _play(table, table.act(table.current_player_id, "check"), lambda: table.game_stage == "hand_over")
+        server.hand_log.close(); server.snapshots.close()
+        return hand_id
+    hand_id = asyncio.run(run())
+    reader = HandLogReader(log_path)
+    records = reader.hand(hand_id)
+    assert records == [r for r in reader if r.hand_id == hand_id]
+    assert [r.kind for r in records].count(HAND_END) == 1 and records[-1].kind == HAND_END and records[-1].code != ABORTED
+    reader.close()
@@ -0,0 +1,110 @@
+import asyncio
+import multiprocessing
+import types
+
+import server
+from cluster import RemoteSocket, WorkerLink
+from codec import JSON
+from engine import Player
+
+class _Socket:
+    """A client connection that accepts whatever it is sent."""
+    def __init__(self):
+        self.remote_address = ("test", id(self))
+
+    async def send(self, message): pass
+
+    async def close(self, code=1000, reason=""): pass
+
+class _Client(_Socket):
+    """A client connection that keeps what it is sent; `path` is the URL it connected to."""
+    def __init__(self, path: str = "/"):
+        super().__init__(); self.request = types.SimpleNamespace(path=path); self.received = []
+
+    async def send(self, message): self.received += JSON.decode_frame(message)
+
+    def payloads(self, msg_type: str) -> list:
+        return [m["payload"] for m in self.received if m["type"] == msg_type]
+
+async def _until(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop(); start = loop.time()
+    while not condition():
+        assert loop.time() - start < timeout; await asyncio.sleep(0.01)
+
+def _heads_up(**clocks) -> server.PokerGame:
+    table = server.PokerGame(**clocks)
+    for pid, name in ((1, "a"), (2, "b")):
+        player = Player(pid, _Socket()); player.name = name; table.players[pid] = player
+    table.next_player_id = 3
+    return table
+
+async def _spam_invalid_raises(table: server.PokerGame, seconds: float) -> float:
+    # Waits for the first prompt, then has that player send illegal raises until their turn ends.
+    loop = asyncio.get_running_loop()
+    await table.run_events(table.start_hand())
+    while not table.awaiting_action(): await asyncio.sleep(0.01)
+    player_id = table.current_player_id; start = loop.time()
+    while table.current_player_id == player_id and loop.time() - start < seconds:
+        await table.handle_player_action(player_id, "raise", 1); await asyncio.sleep(0.02)
+    assert table.current_player_id != player_id and table.players[player_id].status == "folded"
+    return loop.time() - start
+
+def test_invalid_actions_do_not_extend_the_action_clock():
+    elapsed = asyncio.run(_spam_invalid_raises(_heads_up(action_timeout=0.3, time_bank=0, hand_end_delay=0), 3.0))
+    assert elapsed < 0.6
+
+def test_invalid_actions_do_not_reset_a_running_time_bank():
+    table = _heads_up(action_timeout=0.3, time_bank=1.0, hand_end_delay=0)
+    elapsed = asyncio.run(_spam_invalid_raises(table, 3.0))
+    assert 1.2 <= elapsed < 1.6  # the action clock, then the whole time bank (at least a second is needed to use it)
+    assert all(left < 0.1 for left in table.time_banks.values()) and table.time_banks
+
+def _loopback_link(monkeypatch) -> WorkerLink:
+    # One process plays both workers: what the link sends comes straight back to it, as the supervisor
+    # would relay it. The link is worker 0 of 2 and the tables get even IDs, so they belong to worker 1.
+    worker_end, supervisor_end = multiprocessing.Pipe()
+    def relay():
+        while supervisor_end.poll():
+            msg = supervisor_end.recv()
+            if "to" in msg: supervisor_end.send(msg)
+    asyncio.get_running_loop().add_reader(supervisor_end.fileno(), relay)
+    link = WorkerLink(worker_end, 0, 2)
+    monkeypatch.setattr(server, "link", link); monkeypatch.setattr(server, "tables", server.TableManager(first_table_id=2, table_id_step=2))
+    link.start(server.tables.directory, server.remote_handler, lambda: None)
+    return link
+
+def test_resume_token_relayed_to_the_worker_of_its_table(monkeypatch):
+    async def run():
+        link = _loopback_link(monkeypatch)
+        table = server.tables.create_table(); first = _Client()
+        player = await server.tables.seat(first, table, "alice")
+        assert server.resume_token_table(player.session) == table.table_id and not link.is_local(table.table_id)
+        await server.tables.leave(table, first, hold=True); assert player.away
+        again = _Client(f"/?resume={player.session}&version=0"); session = server.ClientSession(again)
+        assert await session.resume() and session.remote_table_id == table.table_id and session.table is None
+        await _until(lambda: again.payloads("assign_id"))
+        assert again.payloads("assign_id")[-1] == {"playerId": player.id, "tableId": table.table_id, "tableName": table.name, "resumeToken": player.session, "resumed": True}
+        assert table.players[player.id] is player and not player.away and isinstance(player.websocket, RemoteSocket)
+        stranger = _Client(f"/?resume={table.table_id}.unknown"); session = server.ClientSession(stranger)
+        assert await session.resume(); await _until(lambda: session.player is not None)  # the owner turns it down: joins as a new player
+        assert session.remote_table_id is None and session.player.id != player.id
+        link.stop()
+    asyncio.run(run())
+
+def test_reclaimed_seat_gets_a_resume_token(monkeypatch):
+    async def run():
+        monkeypatch.setattr(server, "tables", server.TableManager())
+        table = server.tables.create_table()
+        for pid, name in ((1, "alice"), (2, "bob")):  # as restored from a snapshot
+            player = Player(pid, server.HeldSeat(name)); player.name = name; table.players[pid] = player; table.seated[player.websocket] = player
+            server.tables.held[name] = table
+        table.next_player_id = 3; table.restoring = True
+        client = _Client(); session = server.ClientSession(client); session.name = "alice"
+        assert await session.reclaim_seat() and session.player is table.players[1]
+        await _until(lambda: client.payloads("assign_id"))
+        token = client.payloads("assign_id")[-1]["resumeToken"]
+        assert table.players[1].session == token and server.tables.sessions[token] is table
+        await server.tables.leave(table, client, hold=True)
+        again = _Client(f"/?resume={token}"); session = server.ClientSession(again)
+        assert await session.resume() and session.player is table.players[1]
+    asyncio.run(run())
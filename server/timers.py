@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+TICK = 0.02  # seconds per wheel slot; deadlines are rounded up to a tick
+WHEEL_BITS = (8, 6)  # slots per level: 256 ticks (5.12 s) in the inner wheel, 64 * 5.12 s (~5.5 min) in the outer
+
+class Timer:
+    """A scheduled callback. cancel() is O(1) and safe to call more than once, or after it fired."""
+    __slots__ = ("deadline", "expires", "callback", "args", "_wheel", "_slot")
+
+    def __init__(self, wheel: "TimerWheel", deadline: float, expires: int, callback: Callable, args: tuple):
+        self.deadline = deadline; self.expires = expires; self.callback = callback; self.args = args
+        self._wheel = wheel; self._slot: Optional[Dict["Timer", None]] = None
+
+    def remaining(self) -> float:
+        """Seconds until it fires (0 once it has fired or been cancelled)."""
+        if self._slot is None: return 0.0
+        return max(0.0, self.deadline - self._wheel._loop.time())
+
+    def active(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self):
+        if self._slot is None: return
+        del self._slot[self]; self._slot = None; self._wheel.pending -= 1
+
+class TimerWheel:
+    """Every timeout of the process (turn clocks, pauses between streets and hands, held seats) on
+    one hierarchical timing wheel driven by a single event loop callback per tick.
+
+    Inserting and cancelling a timer is a dict insert or delete in its slot. The inner wheel holds
+    what is due within one revolution; timers further out wait in the outer wheel and drop into
+    the inner one as its revolution comes round, and the rare timer beyond the outer wheel goes
+    round again. The wheel only ticks while a timer is pending, and catches up on ticks missed
+    while the loop was busy. A callback that returns a coroutine has it run as a task.
+    """
+    def __init__(self, tick: float = TICK):
+        self.tick = tick
+        self._inner_size = 1 << WHEEL_BITS[0]; self._outer_size = 1 << WHEEL_BITS[1]
+        self._inner: List[Dict[Timer, None]] = [{} for _ in range(self._inner_size)]
+        self._outer: List[Dict[Timer, None]] = [{} for _ in range(self._outer_size)]
+        self._loop: Optional[asyncio.AbstractEventLoop] = None; self._handle: Optional[asyncio.TimerHandle] = None
+        self._now = 0  # the next tick to process
+        self.pending = 0; self.fired = 0
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> Timer:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop: self._reset(loop)
+        deadline = loop.time() + max(0.0, delay)
+        if not self.pending: self._now = int(loop.time() / self.tick)  # idle: pick up the clock again
+        timer = Timer(self, deadline, max(math.ceil(deadline / self.tick), self._now), callback, args)
+        self._place(timer); self.pending += 1
+        if self._handle is None: self._arm()
+        return timer
+
+    async def sleep(self, delay: float):
+        """asyncio.sleep() on the wheel."""
+        future = asyncio.get_running_loop().create_future()
+        timer = self.call_later(delay, lambda: future.done() or future.set_result(None))
+        try: await future
+        finally: timer.cancel()
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        # A new event loop (asyncio.run() again, e.g. in benchmarks): timers of the old one can never fire.
+        for slot in self._inner + self._outer:
+            for timer in slot: timer._slot = None
+            slot.clear()
+        self._loop = loop; self._handle = None; self.pending = 0
+
+    def _place(self, timer: Timer):
+        ahead = timer.expires - self._now
+        if ahead < self._inner_size: slot = self._inner[timer.expires % self._inner_size]
+        else:
+            block = timer.expires // self._inner_size
+            if ahead >= self._inner_size * self._outer_size: block = self._now // self._inner_size + self._outer_size - 1  # round again
+            slot = self._outer[block % self._outer_size]
+        slot[timer] = None; timer._slot = slot
+
+    def _arm(self):
+        self._handle = self._loop.call_at(self._now * self.tick, self._run)
+
+    def _run(self):
+        # The loop may run a handle up to its clock resolution early; don't let that skip the tick.
+        self._handle = None; now = int(self._loop.time() / self.tick + 0.001)
+        while self._now <= now and self.pending:
+            if self._now % self._inner_size == 0:  # a new inner revolution: bring its timers in from the outer wheel
+                outer = self._outer[(self._now // self._inner_size) % self._outer_size]
+                for timer in list(outer): del outer[timer]; self._place(timer)
+            slot = self._inner[self._now % self._inner_size]
+            while slot:
+                timer = next(iter(slot)); del slot[timer]; timer._slot = None; self.pending -= 1; self.fired += 1
+                try:
+                    result = timer.callback(*timer.args)
+                    if asyncio.iscoroutine(result): asyncio.ensure_future(result)
+                except Exception: log.exception(f"Timer callback {timer.callback!r} failed.")
+            self._now += 1
+        if self.pending: self._arm()
+
+timers = TimerWheel()  # the process's wheel